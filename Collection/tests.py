@@ -1,3 +1,167 @@
+from datetime import date, datetime, timedelta
+
+import jwt
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from app1.models import AccLedgers, AccMaster, Collection, CollectionLedgerMatch
+
+
+CLIENT_ID = "test-client"
+
+
+def make_token(username="alice", role="User", client_id=CLIENT_ID):
+    return jwt.encode({
+        "user_id": username,
+        "username": username,
+        "client_id": client_id,
+        "role": role,
+        "accountcode": "",
+        "exp": datetime.utcnow() + timedelta(hours=1),
+        "iat": datetime.utcnow(),
+    }, settings.SECRET_KEY, algorithm="HS256")
+
+
+class CollectionsBatchUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        AccMaster.objects.create(code="C001", name="Corner Shop", place="North", client_id=CLIENT_ID)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token()}")
+
+    def upload(self, receipts):
+        return self.api.post("/api/collection/create/batch/", {"collections": receipts}, format="json")
+
+    def receipt(self, client_uuid, **fields):
+        return dict({"client_uuid": client_uuid, "code": "C001", "amount": "500.00", "type": "cash"}, **fields)
+
+    def test_receipts_are_stored_with_the_account_details(self):
+        response = self.upload([self.receipt("r-1"), self.receipt("r-2", amount="250.00")])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["created", "created"])
+        stored = Collection.objects.get(client_uuid="r-1")
+        self.assertEqual((stored.name, stored.place, stored.created_by), ("Corner Shop", "North", "alice"))
+
+    def test_replayed_batch_stores_nothing_twice(self):
+        first = self.upload([self.receipt("r-1")]).json()
+        replay = self.upload([self.receipt("r-1"), self.receipt("r-1")]).json()
+
+        self.assertEqual([r["status"] for r in replay["results"]], ["duplicate", "duplicate"])
+        self.assertEqual({r["id"] for r in replay["results"]}, {first["results"][0]["id"]})
+        self.assertEqual(Collection.objects.filter(client_id=CLIENT_ID).count(), 1)
+
+    def test_invalid_receipts_are_reported_and_the_rest_stored(self):
+        response = self.upload([
+            self.receipt("r-1", code="C999"),
+            self.receipt("r-2", amount="lots"),
+            self.receipt("r-3"),
+        ]).json()
+
+        self.assertEqual([r["status"] for r in response["results"]], ["error", "error", "created"])
+        self.assertEqual(response["results"][0]["errors"], [{"field": "code", "error": "Unknown account code"}])
+        self.assertEqual(response["results"][1]["errors"][0]["field"], "amount")
+        self.assertEqual(Collection.objects.filter(client_id=CLIENT_ID).count(), 1)
+
+    def test_client_uuid_is_unique_per_tenant(self):
+        self.upload([self.receipt("r-1")])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Collection.objects.create(
+                code="C001", name="Corner Shop", amount=1, type="cash", client_id=CLIENT_ID, client_uuid="r-1"
+            )
+        # Other tenants may reuse the id
+        Collection.objects.create(
+            code="C001", name="Corner Shop", amount=1, type="cash", client_id="other-client", client_uuid="r-1"
+        )
+
+
+class CollectionStatusTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token()}")
+        self.collection = Collection.objects.create(
+            code="C001", name="Corner Shop", amount=500, type="cash", client_id=CLIENT_ID,
+        )
+
+    def test_completing_records_who_uploaded_it(self):
+        response = self.api.post("/api/collection/complete/", {"id": self.collection.id, "status": "completed"})
+
+        self.assertEqual(response.status_code, 200)
+        self.collection.refresh_from_db()
+        self.assertEqual((self.collection.status, self.collection.uploaded_username), ("completed", "alice"))
+
+    def test_unknown_status_is_refused(self):
+        single = self.api.post("/api/collection/complete/", {"id": self.collection.id, "status": "archived"})
+        bulk = self.api.post(
+            "/api/collection/complete/bulk/", {"ids": [self.collection.id], "status": "archived"}, format="json"
+        )
+
+        self.assertEqual((single.status_code, bulk.status_code), (400, 400))
+        self.collection.refresh_from_db()
+        self.assertEqual(self.collection.status, "uploaded to server")
+
+
+class ReconcileTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token('boss', role='Admin')}")
+        self.collection = Collection.objects.create(
+            code="C001", name="Corner Shop", amount=500, type="cash", client_id=CLIENT_ID,
+            status="completed", ref_no="R-77",
+        )
+
+    def add_credit(self, **fields):
+        values = dict(code="C001", credit=500, entry_date=date.today(), particulars="Receipt", client_id=CLIENT_ID)
+        values.update(fields)
+        return AccLedgers.objects.create(**values)
+
+    def reconcile(self):
+        return self.api.post("/api/collection/reconcile/")
+
+    def test_reference_is_preferred_over_the_earlier_credit(self):
+        self.add_credit()
+        credit = self.add_credit(entry_date=date.today() + timedelta(days=1), narration="ref r-77")
+
+        body = self.reconcile().json()
+
+        self.assertEqual((body["matched"], body["reference"]), (1, 1))
+        self.assertEqual(self.collection.ledger_match.ledger_id, credit.id)
+
+    def test_reference_must_match_a_whole_word(self):
+        self.collection.ref_no = "12"
+        self.collection.save()
+        earlier = self.add_credit(narration="cheque 123456")
+        self.add_credit(entry_date=date.today() + timedelta(days=1), narration="cheque 912")
+
+        body = self.reconcile().json()
+
+        # No credit mentions "12" itself: paired by date instead
+        self.assertEqual((body["matched"], body["reference"]), (1, 0))
+        self.assertEqual(self.collection.ledger_match.ledger_id, earlier.id)
+
+    def test_match_of_a_deleted_ledger_row_is_redone(self):
+        gone = self.add_credit()
+        self.reconcile()
+        # The ERP sync replaces the ledger row under a new id
+        gone.delete()
+        credit = self.add_credit()
+
+        body = self.reconcile().json()
+
+        self.assertEqual((body["pruned"], body["matched"]), (1, 1))
+        self.assertEqual(
+            list(CollectionLedgerMatch.objects.filter(client_id=CLIENT_ID).values_list("ledger_id", flat=True)),
+            [credit.id],
+        )
+
+    def test_only_admins_may_reconcile(self):
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token()}")
 
-# Create your tests here.
+        self.assertEqual(self.reconcile().status_code, 403)
@@ -1,8 +1,16 @@
 from django.urls import path
-from .views import complete_collection, create_collection, list_collections
+from .views import (
+    collections_summary, complete_collection, complete_collections_bulk, create_collection,
+    create_collections_batch, list_collections, reconcile, unmatched_report,
+)
 
 urlpatterns = [
     path('create/', create_collection),
+    path('create/batch/', create_collections_batch),
     path('list/', list_collections),
+    path('summary/', collections_summary),
     path('complete/', complete_collection),  # ✅ NEW
+    path('complete/bulk/', complete_collections_bulk),
+    path('reconcile/', reconcile),
+    path('unmatched/', unmatched_report),
 ]
@@ -1,44 +1,25 @@
-from django.shortcuts import render
-
-# Create your views here.
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.conf import settings
-import jwt
-
-from app1.models import Collection
+from app1.auth import token_claims
 
 from django.utils import timezone
+from django.db import connection
 
-import jwt
-from django.conf import settings
-from rest_framework.decorators import api_view
-from rest_framework.response import Response
-from django.utils import timezone
-from app1.models import Collection
-import jwt
-from django.conf import settings
-
-
-def get_user_from_token(request):
-    auth_header = request.META.get('HTTP_AUTHORIZATION')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None, None
-
-    token = auth_header.split(' ')[1]
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-        return payload.get('client_id'), payload.get('username')
-    except:
-        return None, None
+from app1.models import AccMaster, Collection
+from app1.documents import clean_value
+from app1.pagination import decode_cursor, encode_cursor, get_page_size, parse_date_range
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
 
 
 @api_view(['POST'])
 def create_collection(request):
 
-    client_id, username = get_user_from_token(request)
-    if not client_id:
+    payload, _ = token_claims(request)
+    if not payload:
         return Response({'success': False, 'error': 'Invalid token'}, status=401)
+    client_id, username = payload['client_id'], payload.get('username')
 
     data = request.data
 
@@ -73,75 +54,473 @@ def create_collection(request):
 
 
 
+MAX_BATCH_COLLECTIONS = 500
+
+# field -> required in every receipt of a batch
+BATCH_FIELDS = {
+    'client_uuid': True,
+    'code': True,
+    'amount': True,
+    'type': True,
+    'name': False,
+    'place': False,
+    'phone': False,
+    'cheque_no': False,
+    'ref_no': False,
+    'remark': False,
+}
+
+
+def _clean_receipt(receipt):
+    """(values, errors) for one receipt of a batch, checked like the columns"""
+    if not isinstance(receipt, dict):
+        return None, [{'field': None, 'error': 'Collection must be an object'}]
+
+    values, errors = {}, []
+    for name, required in BATCH_FIELDS.items():
+        value = receipt.get(name)
+        if value in (None, ''):
+            if required:
+                errors.append({'field': name, 'error': f'{name} is required'})
+            else:
+                values[name] = None
+            continue
+        try:
+            values[name] = clean_value(Collection._meta.get_field(name), value)
+        except ValidationError as e:
+            errors.append({'field': name, 'error': ' '.join(e.messages)})
+    return values, errors
+
+
+def _stored_receipts(client_id, client_uuids):
+    """{client_uuid: id} of the receipts already stored for the tenant"""
+    return dict(
+        Collection.objects.filter(client_id=client_id, client_uuid__in=client_uuids)
+        .values_list('client_uuid', 'id')
+    )
+
+
+@api_view(['POST'])
+def create_collections_batch(request):
+    """
+    Store many offline receipts in one request:
+    { "collections": [{"client_uuid": "...", "code": "C001", "amount": 500,
+                       "type": "cash", ...}, ...] }
+
+    Codes are resolved against acc_master in one query (name / place /
+    phone default to the account's); valid receipts are inserted with one
+    bulk_create in a transaction. client_uuid makes a replay safe: a
+    receipt already stored is reported as duplicate with its id. One
+    result per receipt, in request order.
+    """
+    payload, _ = token_claims(request)
+    if not payload:
+        return Response({'success': False, 'error': 'Invalid token'}, status=401)
+    client_id, username = payload['client_id'], payload.get('username')
+
+    receipts = request.data.get('collections')
+    if not isinstance(receipts, list) or not receipts:
+        return Response({'success': False, 'error': 'collections must be a non-empty list'}, status=400)
+    if len(receipts) > MAX_BATCH_COLLECTIONS:
+        return Response({'success': False, 'error': f'At most {MAX_BATCH_COLLECTIONS} collections per request'}, status=400)
+
+    cleaned = [_clean_receipt(receipt) for receipt in receipts]
+
+    # ✅ All codes in ONE query
+    codes = {values['code'] for values, errors in cleaned if not errors}
+    accounts = {
+        code: (name, place, phone)
+        for code, name, place, phone in AccMaster.objects.filter(
+            client_id=client_id, code__in=codes
+        ).values_list('code', 'name', 'place', 'phone')
+    }
+
+    results = [None] * len(receipts)
+    pending = {}      # client_uuid -> (index, values) to insert
+    first_index = {}  # client_uuid -> index of its first receipt
+    for index, (values, errors) in enumerate(cleaned):
+        if not errors and values['code'] not in accounts:
+            errors = [{'field': 'code', 'error': 'Unknown account code'}]
+        if errors:
+            client_uuid = receipts[index].get('client_uuid') if isinstance(receipts[index], dict) else None
+            results[index] = {'index': index, 'client_uuid': client_uuid, 'status': 'error', 'errors': errors}
+            continue
+
+        name, place, phone = accounts[values['code']]
+        values['name'] = values['name'] or name or ''
+        values['place'] = values['place'] or place
+        values['phone'] = values['phone'] or phone
+        first_index.setdefault(values['client_uuid'], index)
+        pending.setdefault(values['client_uuid'], (index, values))
+
+    # A concurrent replay of the same receipts may commit first: take out
+    # what it stored and try once more
+    for attempt in range(2):
+        for client_uuid, stored_id in _stored_receipts(client_id, list(pending)).items():
+            index, _ = pending.pop(client_uuid)
+            results[index] = {'index': index, 'client_uuid': client_uuid, 'status': 'duplicate', 'id': stored_id}
+        try:
+            with transaction.atomic():
+                created = Collection.objects.bulk_create([
+                    Collection(
+                        **values,
+                        client_id=client_id,
+                        created_by=username,
+                        status='uploaded to server'
+                    )
+                    for _, values in pending.values()
+                ])
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+
+    for (index, _), collection in zip(pending.values(), created):
+        results[index] = {'index': index, 'client_uuid': collection.client_uuid, 'status': 'created', 'id': collection.id}
+
+    # Repeats of a client_uuid inside the batch share the first one's result
+    for index, (values, _) in enumerate(cleaned):
+        if results[index] is None:
+            first = results[first_index[values['client_uuid']]]
+            results[index] = dict(first, index=index, status='duplicate')
+
+    return Response({
+        'success': True,
+        'total_created': sum(1 for r in results if r['status'] == 'created'),
+        'total_duplicates': sum(1 for r in results if r['status'] == 'duplicate'),
+        'total_errors': sum(1 for r in results if r['status'] == 'error'),
+        'results': results
+    }, status=200)
+
+
+COLLECTION_COLUMNS = [
+    'id',
+    'code',
+    'name',
+    'place',
+    'phone',
+    'amount',
+    'type',
+    'cheque_no',
+    'ref_no',
+    'remark',
+    'status',
+    'created_by',
+    'created_date',
+    'created_time',
+    'uploaded_username',
+    'uploaded_date',
+    'uploaded_time'
+]
+
+
+def _collection_filters(request, client_id):
+    """
+    Queryset of the tenant's collections matching the query string:
+    ?status= (default 'uploaded to server', 'all' for every status)
+    ?created_by= ?type= ?start_date=YYYY-MM-DD ?end_date=YYYY-MM-DD
+    Raises ValueError on bad input.
+    """
+    start, end = parse_date_range(request)
+
+    collections = Collection.objects.filter(client_id=client_id)
+
+    status_value = request.GET.get('status') or 'uploaded to server'
+    if status_value != 'all':
+        if status_value not in COLLECTION_STATUSES:
+            raise ValueError(f"Invalid status. Allowed: {COLLECTION_STATUSES + ['all']}")
+        collections = collections.filter(status=status_value)
+
+    if request.GET.get('created_by'):
+        collections = collections.filter(created_by=request.GET['created_by'])
+    if request.GET.get('type'):
+        collections = collections.filter(type=request.GET['type'])
+
+    # created_date is a local date; [start, end) are local midnights
+    if start:
+        collections = collections.filter(created_date__gte=start.date())
+    if end:
+        collections = collections.filter(created_date__lt=end.date())
+
+    return collections
+
+
 @api_view(['GET'])
 def list_collections(request):
-    client_id, username = get_user_from_token(request)
-    if not client_id:
+    """
+    Collections newest first, one page per request (keyset on id).
+    Filters as in _collection_filters, plus ?limit= ?cursor=
+    """
+    payload, _ = token_claims(request)
+    if not payload:
         return Response(
             {'success': False, 'error': 'Invalid token'},
             status=401
         )
+    client_id, username = payload['client_id'], payload.get('username')
 
-    collections = Collection.objects.filter(
-        client_id=client_id,
-        status='uploaded to server'   # ✅ IMPORTANT FILTER
-    ).values(
-        'id',
-        'code',
-        'name',
-        'place',
-        'phone',
-        'amount',
-        'type',
-        'cheque_no',
-        'ref_no',
-        'remark',
-        'status',
-        'created_by',
-        'created_date',
-        'created_time',
-        'uploaded_username',
-        'uploaded_date',
-        'uploaded_time'
+    try:
+        collections = _collection_filters(request, client_id)
+        limit = get_page_size(request)
+        cursor = request.GET.get('cursor')
+        if cursor:
+            (before_id,) = decode_cursor(cursor, 1)
+            if not isinstance(before_id, int):
+                raise ValueError("Invalid cursor")
+            collections = collections.filter(id__lt=before_id)
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
+    # ✅ One query: fetch one row more than the page to know if there is a next one
+    rows = list(collections.order_by('-id').values(*COLLECTION_COLUMNS)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return Response({
+        'success': True,
+        'count': len(rows),
+        'data': rows,
+        'next_cursor': encode_cursor(rows[-1]['id']) if has_more else None,
+        'has_more': has_more
+    }, status=200)
+
+
+@api_view(['GET'])
+def collections_summary(request):
+    """
+    Count and amount per (created_by, type, day), aggregated in SQL, with
+    totals per type. Same filters as the list (pending by default).
+    """
+    payload, _ = token_claims(request)
+    if not payload:
+        return Response({'success': False, 'error': 'Invalid token'}, status=401)
+    client_id, username = payload['client_id'], payload.get('username')
+
+    try:
+        collections = _collection_filters(request, client_id)
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
+    # ✅ One GROUP BY query (index-only on pending rows)
+    rows = list(
+        collections
+        .values('created_by', 'type', 'created_date')
+        .annotate(count=Count('id'), amount=Sum('amount'))
+        .order_by('created_date', 'created_by', 'type')
     )
 
+    totals = {}
+    for row in rows:
+        total = totals.setdefault(row['type'], {'type': row['type'], 'count': 0, 'amount': 0})
+        total['count'] += row['count']
+        total['amount'] += row['amount']
+
     return Response({
         'success': True,
-        'count': collections.count(),
-        'data': list(collections)
+        'rows': rows,
+        'totals': sorted(totals.values(), key=lambda total: total['type']),
+        'total_count': sum(row['count'] for row in rows),
+        'total_amount': sum(row['amount'] for row in rows)
     }, status=200)
 
 
+MAX_BULK_COLLECTIONS = 500
+MAX_COLLECTION_ID = 2 ** 63 - 1
+COLLECTION_STATUSES = [choice for choice, _ in Collection.STATUS_CHOICES]
+
+
+def _set_collection_status(client_id, username, collection_ids, status_value):
+    """
+    Set the status of the tenant's collections with ONE UPDATE ... RETURNING.
+    The uploaded_* fields are filled only for rows that were not completed
+    yet. Returns the set of ids that were found; raises ValueError for a
+    status that is not one of COLLECTION_STATUSES.
+    """
+    if status_value not in COLLECTION_STATUSES:
+        raise ValueError(f"Invalid status. Allowed: {COLLECTION_STATUSES}")
+    now = timezone.localtime()
+    sql_query = f"""
+    UPDATE {Collection._meta.db_table}
+    SET uploaded_date = CASE WHEN %s = 'completed' AND status <> 'completed'
+                             THEN %s ELSE uploaded_date END,
+        uploaded_time = CASE WHEN %s = 'completed' AND status <> 'completed'
+                             THEN %s ELSE uploaded_time END,
+        uploaded_username = CASE WHEN %s = 'completed' AND status <> 'completed'
+                                 THEN %s ELSE uploaded_username END,
+        status = %s
+    WHERE client_id = %s AND id = ANY(%s)
+    RETURNING id
+    """
+    params = [
+        status_value, now.date(),
+        status_value, now.time(),
+        status_value, username,
+        status_value, client_id, list(collection_ids),
+    ]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
 @api_view(['POST'])
 def complete_collection(request):
 
-    client_id, username = get_user_from_token(request)
-    if not client_id:
+    payload, _ = token_claims(request)
+    if not payload:
         return Response({'success': False, 'error': 'Invalid token'}, status=401)
+    client_id, username = payload['client_id'], payload.get('username')
 
     collection_id = request.data.get('id')
     status_value = request.data.get('status')
 
     if not collection_id or not status_value:
         return Response({'success': False, 'error': 'id and status required'}, status=400)
+    if status_value not in COLLECTION_STATUSES:
+        return Response({'success': False, 'error': f'Invalid status. Allowed: {COLLECTION_STATUSES}'}, status=400)
 
     try:
-        collection = Collection.objects.get(id=collection_id, client_id=client_id)
-    except Collection.DoesNotExist:
+        collection_id = int(collection_id)
+    except (TypeError, ValueError):
+        return Response({'success': False, 'error': 'Collection not found'}, status=404)
+    if not 0 < collection_id <= MAX_COLLECTION_ID:
         return Response({'success': False, 'error': 'Collection not found'}, status=404)
 
-    # ✅ When status changes → auto fill uploaded details
-    if status_value == 'completed' and collection.status != 'completed':
-        now = timezone.localtime()   # ✅ FIX
-        collection.uploaded_date = now.date()
-        collection.uploaded_time = now.time()
-        collection.uploaded_username = username
-
-    collection.status = status_value
-    collection.save()
+    # ✅ When status changes → auto fill uploaded details (one UPDATE)
+    if collection_id not in _set_collection_status(client_id, username, [collection_id], status_value):
+        return Response({'success': False, 'error': 'Collection not found'}, status=404)
 
     return Response({
         'success': True,
         'message': 'Status updated',
-        'status': collection.status
+        'status': status_value
+    })
+
+
+@api_view(['POST'])
+def complete_collections_bulk(request):
+    """
+    Set one status on many collections with a single UPDATE ... RETURNING:
+    { "ids": [12, 13, 14], "status": "completed" }
+
+    As in complete_collection, the uploaded_* fields are filled only for
+    rows that were not completed yet. One result per id, in request order.
+    """
+    payload, _ = token_claims(request)
+    if not payload:
+        return Response({'success': False, 'error': 'Invalid token'}, status=401)
+    client_id, username = payload['client_id'], payload.get('username')
+
+    ids = request.data.get('ids')
+    status_value = request.data.get('status')
+
+    if status_value not in COLLECTION_STATUSES:
+        return Response({'success': False, 'error': f'Invalid status. Allowed: {COLLECTION_STATUSES}'}, status=400)
+
+    if not isinstance(ids, list) or not ids:
+        return Response({'success': False, 'error': 'ids must be a non-empty list'}, status=400)
+    if len(ids) > MAX_BULK_COLLECTIONS:
+        return Response({'success': False, 'error': f'At most {MAX_BULK_COLLECTIONS} ids per request'}, status=400)
+
+    parsed = []
+    for raw_id in ids:
+        try:
+            parsed.append((raw_id, int(raw_id)))
+        except (TypeError, ValueError):
+            parsed.append((raw_id, None))
+    valid_ids = [
+        collection_id for _, collection_id in parsed
+        if collection_id is not None and 0 < collection_id <= MAX_COLLECTION_ID
+    ]
+
+    updated = _set_collection_status(client_id, username, valid_ids, status_value)
+
+    results = []
+    for raw_id, collection_id in parsed:
+        if collection_id is None or not 0 < collection_id <= MAX_COLLECTION_ID:
+            results.append({'id': raw_id, 'updated': False, 'error': 'Invalid id'})
+        elif collection_id in updated:
+            results.append({'id': collection_id, 'updated': True})
+        else:
+            results.append({'id': collection_id, 'updated': False, 'error': 'Collection not found'})
+
+    return Response({
+        'success': True,
+        'status': status_value,
+        'total_updated': len(updated),
+        'results': results
     })
+
+
+# --------------------------------------------------
+# RECONCILIATION WITH ACC_LEDGERS
+# --------------------------------------------------
+from app1.reconciliation import reconcile_collections, unmatched_collections, unmatched_ledger_credits
+
+LEDGER_COLUMNS = ['id', 'code', 'particulars', 'credit', 'entry_mode', 'entry_date', 'voucher_no', 'narration']
+
+
+@api_view(['POST'])
+def reconcile(request):
+    """Match the tenant's completed collections to ledger credits now (Admin only)"""
+    payload, _ = token_claims(request)
+    if not payload:
+        return Response({'success': False, 'error': 'Invalid token'}, status=401)
+    client_id, username = payload['client_id'], payload.get('username')
+    if payload.get('role') != 'Admin':
+        return Response({'success': False, 'error': 'Permission denied. Level 3 access required.'}, status=403)
+
+    summary = reconcile_collections(client_id)
+    return Response({'success': True, **summary})
+
+
+@api_view(['GET'])
+def unmatched_report(request):
+    """
+    What reconciliation could not match, newest first (keyset on id):
+    ?side=collection (default, completed collections with no ledger
+    credit) or ?side=ledger (credits with no collection).
+    ?start_date= ?end_date= ?limit= ?cursor=
+    """
+    payload, _ = token_claims(request)
+    if not payload:
+        return Response({'success': False, 'error': 'Invalid token'}, status=401)
+    client_id, username = payload['client_id'], payload.get('username')
+
+    side = request.GET.get('side') or 'collection'
+    if side == 'collection':
+        rows, columns, date_field = unmatched_collections(client_id), COLLECTION_COLUMNS, 'created_date'
+    elif side == 'ledger':
+        rows, columns, date_field = unmatched_ledger_credits(client_id), LEDGER_COLUMNS, 'entry_date'
+    else:
+        return Response({'success': False, 'error': "side must be 'collection' or 'ledger'"}, status=400)
+
+    try:
+        start, end = parse_date_range(request)
+        limit = get_page_size(request)
+        cursor = request.GET.get('cursor')
+        if cursor:
+            (before_id,) = decode_cursor(cursor, 1)
+            if not isinstance(before_id, int):
+                raise ValueError("Invalid cursor")
+            rows = rows.filter(id__lt=before_id)
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
+    if start:
+        rows = rows.filter(**{f'{date_field}__gte': start.date()})
+    if end:
+        rows = rows.filter(**{f'{date_field}__lt': end.date()})
+
+    rows = list(rows.order_by('-id').values(*columns)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return Response({
+        'success': True,
+        'side': side,
+        'count': len(rows),
+        'data': rows,
+        'next_cursor': encode_cursor(rows[-1]['id']) if has_more else None,
+        'has_more': has_more
+    }, status=200)
@@ -1,10 +1,7 @@
-from django.shortcuts import render
-
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from app1.models import AccMaster
-import jwt
-from django.conf import settings
+from app1.auth import authenticate
 
 
 @api_view(['GET'])
@@ -20,8 +17,7 @@ def get_debtors_list(request):
                 status=401
             )
 
-        token = auth_header.split(' ')[1]
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+        payload = authenticate(request).claims
         client_id = payload.get('client_id')
 
         if not client_id:
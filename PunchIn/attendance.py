@@ -0,0 +1,169 @@
+"""
+Attendance / work-hours report engine over PunchIn.
+
+Per user and local day it computes first punch-in, last punch-out, total
+visit hours, visit count and mismatch-location count in one SQL pass.
+One time zone is used for everything a report does - the day bounds,
+the day bucketing in SQL, "today" and the formatted times - the one
+punch rows are dated in everywhere else (punchin_time__date, punch
+status): the active time zone, settings.TIME_ZONE by default. Monthly
+rollups are summed from the daily rows.
+
+Finished days (before today) never change, so their rows are cached per
+tenant and day. Only today and uncached days hit the database. Late
+writes into a past day (a punch-out of an old visit) must call
+invalidate_attendance_day().
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .models import PunchIn
+from .punch_status import local_day_bounds
+
+
+MISMATCH_STATUS = "Mismatch Location"
+DAY_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # a week; finished days are immutable
+MAX_REPORT_DAYS = 366
+
+
+def _day_key(client_id, day, tz=None):
+    tz = tz or timezone.get_current_timezone()
+    return f"attendance_day:{client_id}:{tz}:{day.isoformat()}"
+
+
+def invalidate_attendance_day(client_id, day):
+    """Forget the cached rows of one finished day"""
+    cache.delete(_day_key(client_id, day))
+
+
+def _query_days(client_id, first_day, last_day, tz):
+    """Daily rows for every user of the tenant in [first_day, last_day] of tz"""
+    start, _ = local_day_bounds(first_day, tz)
+    _, end = local_day_bounds(last_day, tz)
+    tz_name = str(tz)
+
+    sql_query = f"""
+    SELECT
+        p.created_by AS username,
+        (p.punchin_time AT TIME ZONE %s)::date AS day,
+        MIN(p.punchin_time) AS first_punchin,
+        MAX(p.punchout_time) AS last_punchout,
+        COALESCE(
+            SUM(EXTRACT(EPOCH FROM (p.punchout_time - p.punchin_time)))
+                FILTER (WHERE p.punchout_time IS NOT NULL),
+            0
+        ) AS visit_seconds,
+        COUNT(*) AS visit_count,
+        COUNT(*) FILTER (WHERE p.punchin_status = %s) AS mismatch_count,
+        COUNT(*) FILTER (WHERE p.punchout_time IS NULL) AS open_visits
+    FROM {PunchIn._meta.db_table} p
+    WHERE p.client_id = %s
+      AND p.punchin_time >= %s
+      AND p.punchin_time < %s
+    GROUP BY 1, 2
+    ORDER BY 2, 1
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, [tz_name, MISMATCH_STATUS, client_id, start, end])
+        columns = [desc[0] for desc in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    by_day = {}
+    for row in rows:
+        row['visit_seconds'] = float(row['visit_seconds'])
+        by_day.setdefault(row['day'], []).append(row)
+    return by_day
+
+
+def daily_attendance(client_id, first_day, last_day, username=None):
+    """
+    Per-user per-day attendance rows for [first_day, last_day], ordered by
+    day then user. Finished days come from the cache when possible.
+    """
+    tz = timezone.get_current_timezone()
+    today = timezone.localdate(timezone=tz)
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+
+    finished = [d for d in days if d < today]
+    keys = {d: _day_key(client_id, d, tz) for d in days}
+    cached = cache.get_many([keys[d] for d in finished])
+    result = {d: cached[keys[d]] for d in finished if keys[d] in cached}
+
+    missing = [d for d in days if d not in result]
+    if missing:
+        # One query over the span of the missing days
+        fresh = _query_days(client_id, missing[0], missing[-1], tz)
+        to_cache = {}
+        for d in missing:
+            result[d] = fresh.get(d, [])
+            if d < today:
+                to_cache[keys[d]] = result[d]
+        if to_cache:
+            cache.set_many(to_cache, DAY_CACHE_TIMEOUT)
+
+    rows = []
+    for d in days:
+        for row in result[d]:
+            if username is None or row['username'] == username:
+                rows.append(row)
+    return rows
+
+
+def monthly_attendance(daily_rows):
+    """Roll daily rows up to one row per (user, month)"""
+    months = {}
+    for row in daily_rows:
+        month = row['day'].replace(day=1)
+        key = (month, row['username'])
+        total = months.get(key)
+        if total is None:
+            total = months[key] = {
+                'username': row['username'],
+                'month': month,
+                'days_present': 0,
+                'visit_seconds': 0.0,
+                'visit_count': 0,
+                'mismatch_count': 0,
+                'open_visits': 0,
+            }
+        total['days_present'] += 1
+        total['visit_seconds'] += row['visit_seconds']
+        total['visit_count'] += row['visit_count']
+        total['mismatch_count'] += row['mismatch_count']
+        total['open_visits'] += row['open_visits']
+
+    return [months[k] for k in sorted(months)]
+
+
+def _iso_local(value):
+    return timezone.localtime(value).isoformat() if value else None
+
+
+def format_daily_row(row):
+    return {
+        'username': row['username'],
+        'date': row['day'].isoformat(),
+        'first_punchin': _iso_local(row['first_punchin']),
+        'last_punchout': _iso_local(row['last_punchout']),
+        'visit_hours': round(row['visit_seconds'] / 3600, 2),
+        'visit_count': row['visit_count'],
+        'mismatch_count': row['mismatch_count'],
+        'open_visits': row['open_visits'],
+    }
+
+
+def format_monthly_row(row):
+    return {
+        'username': row['username'],
+        'month': row['month'].strftime('%Y-%m'),
+        'days_present': row['days_present'],
+        'visit_hours': round(row['visit_seconds'] / 3600, 2),
+        'visit_count': row['visit_count'],
+        'mismatch_count': row['mismatch_count'],
+        'open_visits': row['open_visits'],
+    }
+
@@ -0,0 +1,37 @@
+"""
+Location check shared by the single and batched punch-in paths.
+"""
+import math
+
+
+MATCH_RADIUS_METERS = 100
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Haversine distance in meters"""
+    R = 6371000
+    lat1, lon1, lat2, lon2 = map(math.radians, map(float, [lat1, lon1, lat2, lon2]))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return R * c
+
+
+def punchin_location_status(current_location, shop_location, fallback):
+    """
+    "Correct Location" / "Mismatch Location" from two "lat,lng" strings.
+    Keeps the client supplied status if either location can't be parsed.
+    """
+    try:
+        cur_lat, cur_lon = current_location.split(',')
+        shop_lat, shop_lon = shop_location.split(',')
+
+        distance = calculate_distance(cur_lat, cur_lon, shop_lat, shop_lon)
+
+        if distance > MATCH_RADIUS_METERS:
+            return "Mismatch Location"
+        return "Correct Location"
+
+    except Exception:
+        return fallback
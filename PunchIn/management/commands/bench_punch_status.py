@@ -0,0 +1,83 @@
+"""
+Benchmark the punch-status lookup.
+
+    python manage.py bench_punch_status --client-id SYSMAC --username ARUN
+
+Compares the old lookup (up to four ORM queries with __date / __iexact
+filters) with the single-query fast path, uncached and cached.
+Read-only: it only runs SELECTs against existing data.
+"""
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app1.models import AccMaster
+from PunchIn.models import PunchIn
+from PunchIn.punch_status import (
+    build_punch_status, fetch_today_punch, get_today_punch, invalidate_punch_status
+)
+
+
+def legacy_status(client_id, username):
+    """The pre fast-path lookup, kept here only as the benchmark baseline"""
+    today = timezone.localdate()
+    active = (
+        PunchIn.objects
+        .filter(client_id=client_id, created_by__iexact=username,
+                punchin_time__date=today, punchout_time__isnull=True)
+        .order_by('-punchin_time')
+        .first()
+    )
+    if active:
+        return AccMaster.objects.filter(code=active.firm_id, client_id=client_id).first()
+
+    completed = (
+        PunchIn.objects
+        .filter(client_id=client_id, created_by__iexact=username,
+                punchin_time__date=today, punchout_time__isnull=False)
+        .order_by('-punchout_time')
+        .first()
+    )
+    if completed:
+        return AccMaster.objects.filter(code=completed.firm_id, client_id=client_id).first()
+    return None
+
+
+class Command(BaseCommand):
+    help = "Measure punch-status calls per second before and after the fast path"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client-id', required=True)
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        client_id = options['client_id']
+        username = options['username']
+        iterations = options['iterations']
+
+        def fast_uncached():
+            build_punch_status(fetch_today_punch(client_id, username, timezone.localdate()))
+
+        def fast_cached():
+            build_punch_status(get_today_punch(client_id, username))
+
+        invalidate_punch_status(client_id)
+        runs = [
+            ('legacy (4 queries)', lambda: legacy_status(client_id, username)),
+            ('fast path, no cache', fast_uncached),
+            ('fast path, cached', fast_cached),
+        ]
+
+        for label, func in runs:
+            func()  # warm up connection / cache
+            started = time.perf_counter()
+            for _ in range(iterations):
+                func()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{label:<22} {iterations / elapsed:>10.0f} calls/s")
+
+        invalidate_punch_status(client_id)
+        cache.close()
@@ -0,0 +1,36 @@
+"""
+Rebuild the precomputed user -> firm membership (user_firms).
+
+    python manage.py rebuild_user_firms                 # every tenant
+    python manage.py rebuild_user_firms --client-id SYSMAC
+
+Normally not needed: update_area rebuilds one user and acc_master changes
+mark the tenant stale for a rebuild on its next firm lookup. Use it after bulk
+imports done with triggers disabled, or to warm the table after deploying.
+"""
+from django.core.management.base import BaseCommand
+
+from PunchIn.membership import rebuild_user_firms
+from PunchIn.models import UserAreas, UserFirmsStale
+
+
+class Command(BaseCommand):
+    help = "Rebuild user_firms for one tenant or for all tenants"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client-id', help='Only rebuild this tenant')
+
+    def handle(self, *args, **options):
+        if options['client_id']:
+            client_ids = [options['client_id']]
+        else:
+            client_ids = sorted(
+                UserAreas.objects.values_list('client_id', flat=True).distinct()
+            )
+
+        for client_id in client_ids:
+            rows = rebuild_user_firms(client_id)
+            UserFirmsStale.objects.filter(client_id=client_id).delete()
+            self.stdout.write(f"{client_id}: {rows} memberships")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(client_ids)} tenant(s)"))
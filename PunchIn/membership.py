@@ -0,0 +1,91 @@
+"""
+Maintenance of the precomputed user -> firm membership (user_firms).
+
+A non-admin user sees the firms whose name or area contains one of their
+assigned area codes (case-insensitive, like the old icontains OR chain).
+Instead of evaluating that per request, the matches are materialized in
+user_firms and rebuilt with one INSERT ... SELECT:
+
+- for one user, whenever update_area changes their UserAreas
+- for a whole tenant, when acc_master changed. Triggers on acc_master
+  mark the tenant in user_firms_stale (migration 0013 marks every tenant
+  once), and the next get_firms call for that tenant rebuilds it before
+  reading (rebuild_if_stale). Concurrent lookups of the same tenant wait
+  on an advisory lock for that one rebuild instead of reading a stale or
+  empty membership; the rows are replaced in one transaction, so other
+  readers switch from the old membership to the new one at its commit.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from app1.models import AccMaster
+from .models import UserAreas, UserFirm, UserFirmsStale
+
+
+REBUILD_STATEMENT_TIMEOUT = "5min"  # a big tenant takes longer than a request may
+
+
+# Area code escaped for LIKE, the same way Django escapes icontains values
+_LIKE_AREA = (
+    r"'%%' || UPPER(replace(replace(replace(ua.area_code, '\', '\\'), '%%', '\%%'), '_', '\_')) || '%%'"
+)
+
+
+def rebuild_user_firms(client_id, user_id=None):
+    """Recompute user_firms for a tenant, or for one user of it"""
+    user_firms = UserFirm._meta.db_table
+    user_areas = UserAreas._meta.db_table
+    firm_table = AccMaster._meta.db_table
+
+    user_filter = ""
+    params = [client_id]
+    if user_id is not None:
+        user_filter = "AND user_id = %s"
+        params.append(user_id)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {user_firms} WHERE client_id = %s {user_filter}",
+            params
+        )
+        cursor.execute(f"""
+            INSERT INTO {user_firms} (client_id, user_id, firm_code)
+            SELECT DISTINCT ua.client_id, ua.user_id, m.code
+            FROM {user_areas} ua
+            JOIN {firm_table} m
+              ON m.client_id = ua.client_id
+             AND (UPPER(m.name) LIKE {_LIKE_AREA}
+                  OR UPPER(m.area) LIKE {_LIKE_AREA})
+            WHERE ua.client_id = %s {user_filter.replace('user_id', 'ua.user_id')}
+        """, params)
+        return cursor.rowcount
+
+
+def mark_stale(client_id):
+    """Flag a tenant for a full rebuild on its next firm lookup"""
+    UserFirmsStale.objects.get_or_create(
+        client_id=client_id, defaults={'marked_at': timezone.now()}
+    )
+
+
+def rebuild_if_stale(client_id):
+    """
+    Rebuild the tenant's memberships now if acc_master changed since the
+    last build, or if none were ever built; returns whether it did. A
+    second caller for the same tenant waits for the first and then finds
+    nothing left to do.
+    """
+    if (not UserFirmsStale.objects.filter(client_id=client_id).exists()
+            and UserFirm.objects.filter(client_id=client_id).exists()):
+        return False
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET LOCAL statement_timeout = %s", [REBUILD_STATEMENT_TIMEOUT])
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(hashtext('user_firms'), hashtext(%s))", [client_id]
+        )
+        deleted, _ = UserFirmsStale.objects.filter(client_id=client_id).delete()
+        if not deleted and UserFirm.objects.filter(client_id=client_id).exists():
+            return False
+        rebuild_user_firms(client_id)
+    return True
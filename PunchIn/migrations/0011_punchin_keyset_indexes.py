@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PunchIn', '0010_alter_punchin_photo'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='punchin',
+            name='idx_punchin_client_user',
+        ),
+        migrations.AddIndex(
+            model_name='punchin',
+            index=models.Index(fields=['client_id', '-punchin_time'], name='idx_punchin_client_time'),
+        ),
+        migrations.AddIndex(
+            model_name='punchin',
+            index=models.Index(fields=['client_id', 'created_by', '-punchin_time'], name='idx_punchin_client_user_time'),
+        ),
+    ]
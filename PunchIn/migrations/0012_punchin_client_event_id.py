@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PunchIn', '0011_punchin_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='punchin',
+            name='client_event_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='punchin',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_event_id__isnull', False)), fields=('client_id', 'client_event_id'), name='uniq_punchin_client_event'),
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.0.2 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+LATEST_SHOP_LOCATION_VIEW = """
+CREATE OR REPLACE VIEW latest_shop_location AS
+SELECT DISTINCT ON (client_id, firm_code)
+    client_id, firm_code, latitude, longitude, created_at
+FROM shop_location
+ORDER BY client_id, firm_code, created_at DESC;
+"""
+
+# acc_master is owned by the ERP sync and has no Django migrations, so the
+# triggers are only installed where the table exists.
+ACC_MASTER_TRIGGERS = """
+CREATE OR REPLACE FUNCTION mark_user_firms_stale() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO user_firms_stale (client_id, marked_at)
+        SELECT DISTINCT client_id, now() FROM old_rows WHERE client_id IS NOT NULL
+        ON CONFLICT (client_id) DO NOTHING;
+    ELSIF TG_LEVEL = 'STATEMENT' THEN
+        INSERT INTO user_firms_stale (client_id, marked_at)
+        SELECT DISTINCT client_id, now() FROM new_rows WHERE client_id IS NOT NULL
+        ON CONFLICT (client_id) DO NOTHING;
+    ELSE
+        INSERT INTO user_firms_stale (client_id, marked_at)
+        VALUES (NEW.client_id, now())
+        ON CONFLICT (client_id) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF to_regclass('acc_master') IS NOT NULL THEN
+        CREATE TRIGGER acc_master_user_firms_insert
+            AFTER INSERT ON acc_master
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION mark_user_firms_stale();
+
+        CREATE TRIGGER acc_master_user_firms_delete
+            AFTER DELETE ON acc_master
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION mark_user_firms_stale();
+
+        -- balance updates are frequent; only name / area affect membership
+        CREATE TRIGGER acc_master_user_firms_update
+            AFTER UPDATE OF name, area, code, client_id ON acc_master
+            FOR EACH ROW
+            WHEN (OLD.name IS DISTINCT FROM NEW.name
+                  OR OLD.area IS DISTINCT FROM NEW.area
+                  OR OLD.code IS DISTINCT FROM NEW.code
+                  OR OLD.client_id IS DISTINCT FROM NEW.client_id)
+            EXECUTE FUNCTION mark_user_firms_stale();
+    END IF;
+END
+$$;
+"""
+
+DROP_ACC_MASTER_TRIGGERS = """
+DO $$
+BEGIN
+    IF to_regclass('acc_master') IS NOT NULL THEN
+        DROP TRIGGER IF EXISTS acc_master_user_firms_insert ON acc_master;
+        DROP TRIGGER IF EXISTS acc_master_user_firms_delete ON acc_master;
+        DROP TRIGGER IF EXISTS acc_master_user_firms_update ON acc_master;
+    END IF;
+END
+$$;
+DROP FUNCTION IF EXISTS mark_user_firms_stale();
+"""
+
+# Every tenant with assigned areas gets built on its first firm lookup
+MARK_ALL_STALE = """
+INSERT INTO user_firms_stale (client_id, marked_at)
+SELECT DISTINCT client_id, now() FROM user_areas
+ON CONFLICT (client_id) DO NOTHING;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PunchIn', '0012_punchin_client_event_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFirm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=64)),
+                ('user_id', models.CharField(max_length=64)),
+                ('firm_code', models.CharField(max_length=30)),
+            ],
+            options={
+                'db_table': 'user_firms',
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'user_id', 'firm_code'), name='uniq_user_firm')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserFirmsStale',
+            fields=[
+                ('client_id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('marked_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'user_firms_stale',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shoplocation',
+            index=models.Index(fields=['client_id', 'firm', '-created_at'], name='idx_shop_client_firm_latest'),
+        ),
+        migrations.RunSQL(LATEST_SHOP_LOCATION_VIEW, "DROP VIEW IF EXISTS latest_shop_location;"),
+        migrations.RunSQL(ACC_MASTER_TRIGGERS, DROP_ACC_MASTER_TRIGGERS),
+        migrations.RunSQL(MARK_ALL_STALE, migrations.RunSQL.noop),
+    ]
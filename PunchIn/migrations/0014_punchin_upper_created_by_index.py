@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 18:20
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PunchIn', '0013_user_firms_latest_shop_location'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='punchin',
+            index=models.Index(models.F('client_id'), django.db.models.functions.text.Upper('created_by'), models.OrderBy(models.F('punchin_time'), descending=True), name='idx_punchin_client_uuser_time'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.2 on 2026-10-19 18:25
+
+from django.db import migrations, models
+
+
+# The fields were added to the model without a migration; databases set up
+# by hand may have the columns already, so they are only added when missing.
+ADD_COLUMNS = """
+ALTER TABLE punchin
+    ADD COLUMN IF NOT EXISTS current_location text NOT NULL DEFAULT '',
+    ADD COLUMN IF NOT EXISTS shop_location text NOT NULL DEFAULT '',
+    ADD COLUMN IF NOT EXISTS punchin_status varchar(50) NOT NULL DEFAULT '';
+ALTER TABLE punchin
+    ALTER COLUMN current_location DROP DEFAULT,
+    ALTER COLUMN shop_location DROP DEFAULT,
+    ALTER COLUMN punchin_status DROP DEFAULT;
+"""
+
+DROP_COLUMNS = """
+ALTER TABLE punchin
+    DROP COLUMN IF EXISTS current_location,
+    DROP COLUMN IF EXISTS shop_location,
+    DROP COLUMN IF EXISTS punchin_status;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PunchIn', '0014_punchin_upper_created_by_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(ADD_COLUMNS, DROP_COLUMNS)],
+            state_operations=[
+                migrations.AddField(
+                    model_name='punchin',
+                    name='current_location',
+                    field=models.TextField(default=''),
+                    preserve_default=False,
+                ),
+                migrations.AddField(
+                    model_name='punchin',
+                    name='shop_location',
+                    field=models.TextField(default=''),
+                    preserve_default=False,
+                ),
+                migrations.AddField(
+                    model_name='punchin',
+                    name='punchin_status',
+                    field=models.CharField(default='', max_length=50),
+                    preserve_default=False,
+                ),
+            ],
+        ),
+    ]
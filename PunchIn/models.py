@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Upper
 from app1.models import Misel,AccMaster,AccUser  # import Misel model from your main app
 import uuid
 import time
@@ -56,6 +58,8 @@ class ShopLocation(models.Model):
         indexes = [
             models.Index(fields=["firm", "client_id"], name="idx_shop_firm_client"),
             models.Index(fields=["created_at"], name="idx_shop_created_at"),
+            # Backs the latest_shop_location DISTINCT ON view
+            models.Index(fields=["client_id", "firm", "-created_at"], name="idx_shop_client_firm_latest"),
         ]
 
 
@@ -106,12 +110,32 @@ class PunchIn(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)  # useful for audits
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Client generated id of an offline punch-in event (batch upload idempotency)
+    client_event_id = models.CharField(max_length=64, null=True, blank=True)
+
     class Meta:
         db_table = "punchin"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["client_id", "client_event_id"],
+                condition=models.Q(client_event_id__isnull=False),
+                name="uniq_punchin_client_event",
+            ),
+        ]
         indexes = [
             models.Index(fields=["firm", "client_id"], name="idx_punchin_firm_client"),
             models.Index(fields=["punchin_time"], name="idx_punchin_time"),
-            models.Index(fields=["client_id", "created_by"], name="idx_punchin_client_user"),
+            # Keyset pagination of punchin_table (admin / per-user views)
+            models.Index(fields=["client_id", "-punchin_time"], name="idx_punchin_client_time"),
+            models.Index(
+                fields=["client_id", "created_by", "-punchin_time"],
+                name="idx_punchin_client_user_time",
+            ),
+            # punch-status matches created_by case-insensitively
+            models.Index(
+                F("client_id"), Upper("created_by"), F("punchin_time").desc(),
+                name="idx_punchin_client_uuser_time",
+            ),
         ]
         ordering = ["-punchin_time"]  # newest first
 
@@ -136,4 +160,36 @@ class UserAreas(models.Model):
         db_table= "user_areas"
         constraints = [
             models.UniqueConstraint(fields=["user", "area_code"], name="uniq_user_area"),
-        ]
\ No newline at end of file
+        ]
+
+
+
+class UserFirm(models.Model):
+    """
+    Precomputed user -> firm membership: the acc_master rows whose name or
+    area contains one of the user's assigned area codes. Rebuilt by
+    PunchIn.membership when UserAreas or acc_master change.
+    """
+    client_id = models.CharField(max_length=64)
+    user_id = models.CharField(max_length=64)
+    firm_code = models.CharField(max_length=30)
+
+    class Meta:
+        db_table = "user_firms"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["client_id", "user_id", "firm_code"], name="uniq_user_firm"
+            ),
+        ]
+
+
+class UserFirmsStale(models.Model):
+    """
+    Tenants whose user_firms rows are out of date. Filled by triggers on
+    acc_master (see migration 0013), drained by PunchIn.membership.
+    """
+    client_id = models.CharField(max_length=64, primary_key=True)
+    marked_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "user_firms_stale"
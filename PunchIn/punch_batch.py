@@ -0,0 +1,318 @@
+"""
+Batched upload of punch events queued offline by the app.
+
+A batch is an ordered list of events, each with a client generated
+event_id and the original timestamp:
+
+    {"event_id": "…", "type": "punchin", "timestamp": "2026-10-19T09:12:00+05:30",
+     "customerCode": "…", "latitude": …, "longitude": …,
+     "current_location": "lat,lng", "shop_location": "lat,lng",
+     "punchin_status": "…", "address": "…", "notes": "…"}
+
+    {"event_id": "…", "type": "punchout", "timestamp": "…",
+     "punchin_event_id": "…"  (or "punchin_id": <server id>), "notes": "…"}
+
+All firms are validated in one query, the punch-ins are inserted with one
+bulk_create and the punch-outs applied with one bulk_update, all in a
+single transaction. Replaying a batch is safe: punch-ins already stored
+under the same (client_id, event_id) are reported as duplicates and
+punch-outs of already closed visits are no-ops.
+
+Inside the transaction the events are applied in batch order against the
+user's open visits (locked with select_for_update, plus an advisory lock
+per user so two batches of the same user run one after the other): as
+with a single punch-in, a punch-in is refused while the user still has a
+visit of that day open.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app1.models import AccMaster
+from .attendance import invalidate_attendance_day
+from .geo import punchin_location_status
+from .models import PunchIn
+from .punch_status import invalidate_punch_status
+
+
+MAX_BATCH_EVENTS = 500
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+MAX_IMAGE_SIZE = 5 * 1024 * 1024
+ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/jpg', 'image/png']
+
+
+class BatchEventError(Exception):
+    """A single event is invalid; the rest of the batch still goes through"""
+
+
+def _text(event, field, required=False):
+    """The event's string field ('' when absent); raises BatchEventError"""
+    value = event.get(field)
+    if value is None or value == '':
+        if required:
+            raise BatchEventError(f'{field} is required')
+        return ''
+    if not isinstance(value, str):
+        raise BatchEventError(f'{field} must be a string')
+    return value
+
+
+def _punchin_ref(event):
+    """('event', punchin_event_id) or ('id', punchin_id) a punch-out targets"""
+    event_ref = event.get('punchin_event_id')
+    if event_ref:
+        if not isinstance(event_ref, str):
+            raise BatchEventError('punchin_event_id must be a string')
+        return ('event', event_ref)
+    punchin_id = event.get('punchin_id')
+    if isinstance(punchin_id, bool) or not isinstance(punchin_id, (int, str)):
+        raise BatchEventError('No punch-in found for this punch-out')
+    try:
+        return ('id', int(punchin_id))
+    except ValueError:
+        raise BatchEventError('No punch-in found for this punch-out')
+
+
+def _started(record):
+    """Punch-in time of a stored record or of one about to be inserted"""
+    return getattr(record, 'original_punchin_time', None) or record.punchin_time
+
+
+def _event_time(event, now):
+    raw = event.get('timestamp')
+    moment = parse_datetime(raw) if isinstance(raw, str) else None
+    if moment is None:
+        raise BatchEventError('timestamp must be an ISO 8601 datetime')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    if moment > now + MAX_CLOCK_SKEW:
+        raise BatchEventError('timestamp is in the future')
+    return moment
+
+
+def _coordinate(value, low, high):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise BatchEventError('Invalid coordinate format')
+    if not (low <= number <= high):
+        raise BatchEventError('Invalid coordinate values')
+    return number
+
+
+def _check_image(image_file):
+    if image_file is None:
+        return None
+    if image_file.size > MAX_IMAGE_SIZE:
+        raise BatchEventError('Image size must be less than 5MB')
+    if image_file.content_type not in ALLOWED_IMAGE_TYPES:
+        raise BatchEventError('Only JPG, JPEG, and PNG images are allowed')
+    return image_file
+
+
+def _prepare_punchin(event, firms, client_id, username, now, files):
+    for field in ('customerCode', 'current_location', 'shop_location', 'punchin_status'):
+        _text(event, field, required=True)
+
+    firm = firms.get(event['customerCode'])
+    if firm is None:
+        raise BatchEventError('Invalid firm code for this client')
+
+    punchin_time = _event_time(event, now)
+    record = PunchIn(
+        firm=firm,
+        client_id=client_id,
+        latitude=_coordinate(event.get('latitude'), -90, 90),
+        longitude=_coordinate(event.get('longitude'), -180, 180),
+        current_location=event['current_location'],
+        shop_location=event['shop_location'],
+        punchin_status=punchin_location_status(
+            event['current_location'], event['shop_location'], event['punchin_status']
+        ),
+        photo=_check_image(files.get(f"image_{event['event_id']}")),
+        address=_text(event, 'address'),
+        notes=_text(event, 'notes'),
+        created_by=username,
+        status='pending',
+        client_event_id=event['event_id'],
+    )
+    # auto_now_add overwrites punchin_time on insert, keep the original aside
+    record.original_punchin_time = punchin_time
+    return record
+
+
+def _apply_batch(events, client_id, username, files):
+    now = timezone.now()
+    results = [None] * len(events)
+
+    punchins, punchouts = [], []
+    for index, event in enumerate(events):
+        event_id = event.get('event_id') if isinstance(event, dict) else None
+        event_type = event.get('type') if isinstance(event, dict) else None
+        results[index] = {'event_id': event_id, 'type': event_type}
+
+        if not event_id or not isinstance(event_id, str) or len(event_id) > 64:
+            results[index].update(status='error', error='event_id is required (max 64 chars)')
+        elif event_type == 'punchin':
+            punchins.append(index)
+        elif event_type == 'punchout':
+            punchouts.append(index)
+        else:
+            results[index].update(status='error', error='type must be punchin or punchout')
+
+    # ---- one query for every firm, one for already stored events ----
+    firm_codes = {
+        code for code in (events[i].get('customerCode') for i in punchins)
+        if code and isinstance(code, str)
+    }
+    firms = {
+        firm.code: firm
+        for firm in AccMaster.objects.filter(client_id=client_id, code__in=firm_codes)
+    }
+    event_ids = [events[i]['event_id'] for i in punchins]
+    existing = dict(
+        PunchIn.objects
+        .filter(client_id=client_id, client_event_id__in=event_ids)
+        .values_list('client_event_id', 'id')
+    )
+
+    # ---- validate every event before the transaction ----
+    prepared, seen = {}, set()
+    for index in punchins:
+        event = events[index]
+        event_id = event['event_id']
+        if event_id in existing:
+            results[index].update(status='duplicate', punchin_id=existing[event_id])
+            continue
+        if event_id in seen:
+            results[index].update(status='error', error='event_id repeated in batch')
+            continue
+        try:
+            prepared[index] = _prepare_punchin(event, firms, client_id, username, now, files)
+        except BatchEventError as e:
+            results[index].update(status='error', error=str(e))
+            continue
+        seen.add(event_id)
+
+    refs = {}
+    for index in punchouts:
+        try:
+            refs[index] = _punchin_ref(events[index])
+            _text(events[index], 'notes')
+        except BatchEventError as e:
+            results[index].update(status='error', error=str(e))
+
+    touched_days = set()
+    with transaction.atomic():
+        # Batches of the same user are applied one after the other
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext('punch_batch'), hashtext(%s))",
+                [f"{client_id}:{username}"]
+            )
+
+        # ---- the user's open visits and every punch-out target, locked ----
+        target_ids = {key for kind, key in refs.values() if kind == 'id'}
+        target_events = {key for kind, key in refs.values() if kind == 'event'}
+        records = {}
+        for record in PunchIn.objects.select_for_update().filter(
+            Q(punchout_time__isnull=True) | Q(id__in=target_ids) | Q(client_event_id__in=target_events),
+            client_id=client_id,
+            created_by=username,
+        ):
+            records[('id', record.id)] = record
+            if record.client_event_id:
+                records[('event', record.client_event_id)] = record
+        # A list: the punch-ins of this batch are unsaved, so unhashable
+        open_visits = [
+            record for key, record in records.items() if key[0] == 'id' and record.punchout_time is None
+        ]
+
+        # ---- apply the events in batch order ----
+        new_records, closed, pending_results = [], {}, []
+        for index in sorted(prepared.keys() | refs.keys()):
+            event = events[index]
+
+            if index in prepared:
+                record = prepared[index]
+                day = timezone.localtime(record.original_punchin_time).date()
+                if any(timezone.localtime(_started(visit)).date() == day for visit in open_visits):
+                    results[index].update(
+                        status='error', error='An active punch-in already exists; punch out first'
+                    )
+                    continue
+                new_records.append(record)
+                open_visits.append(record)
+                records[('event', event['event_id'])] = record
+                pending_results.append((index, record))
+                results[index].update(status='created')
+                continue
+
+            record = records.get(refs[index])
+            if record is None:
+                results[index].update(status='error', error='No punch-in found for this punch-out')
+                continue
+
+            if record.punchout_time is not None:
+                results[index].update(status='duplicate', punchout_time=record.punchout_time.isoformat())
+                pending_results.append((index, record))
+                continue
+
+            try:
+                punchout_time = _event_time(event, now)
+            except BatchEventError as e:
+                results[index].update(status='error', error=str(e))
+                continue
+            if punchout_time < _started(record):
+                results[index].update(status='error', error='punch-out is before punch-in')
+                continue
+
+            record.punchout_time = punchout_time
+            notes = _text(event, 'notes')
+            if notes:
+                record.notes = f"{record.notes or ''}\nPunch-out notes: {notes}".strip()
+            open_visits = [visit for visit in open_visits if visit is not record]
+            if record.pk is not None:
+                closed[record.id] = record
+            touched_days.add(timezone.localtime(_started(record)).date())
+            results[index].update(status='applied', punchout_time=punchout_time.isoformat())
+            pending_results.append((index, record))
+
+        if new_records:
+            PunchIn.objects.bulk_create(new_records)
+            for record in new_records:
+                # auto_now_add overwrote it on insert
+                record.punchin_time = record.original_punchin_time
+                touched_days.add(timezone.localtime(record.punchin_time).date())
+            PunchIn.objects.bulk_update(new_records, ['punchin_time'])
+
+        if closed:
+            PunchIn.objects.bulk_update(list(closed.values()), ['punchout_time', 'notes'])
+
+        # Punch-ins of this batch only have an id now
+        for index, record in pending_results:
+            results[index]['punchin_id'] = record.id
+
+    invalidate_punch_status(client_id)
+    today = timezone.localdate()
+    for day in touched_days:
+        if day < today:
+            invalidate_attendance_day(client_id, day)
+
+    return results
+
+
+def apply_punch_batch(events, client_id, username, files):
+    """
+    Store a batch of offline punch events, returning one result per event
+    in input order. A concurrent replay of the same batch can hit the
+    unique (client_id, client_event_id) index, in which case the batch is
+    re-run once and the already stored events come back as duplicates.
+    """
+    try:
+        return _apply_batch(events, client_id, username, files)
+    except IntegrityError:
+        return _apply_batch(events, client_id, username, files)
@@ -0,0 +1,194 @@
+"""
+Fast path for the punch-status endpoint.
+
+The app polls punch-status constantly, so the lookup is a single indexed
+query (today's punch-ins for one user joined to acc_master) and its result
+is cached per user. A cached status costs no query at all: the key carries
+a per-tenant version kept in the cache itself, which punchin / punchout /
+verification updates move up through invalidate_punch_status().
+
+With a shared cache backend (CACHE_BACKEND) that retires the status in
+every worker at once. With the default per-process LocMemCache another
+worker keeps its own copy, so entries only live STATUS_CACHE_TIMEOUT:
+that is how long such a worker may show the previous status.
+"""
+import time as clock
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from app1.models import AccMaster
+from app1.versions import bump as bump_data_version
+from .models import PunchIn
+
+
+STATUS_CACHE_TIMEOUT = 30  # seconds; bounds staleness across LocMem workers
+
+
+def _cache_key(client_id, username, day, version):
+    # created_by is matched case-insensitively, so is the key
+    return f"punch_status:{client_id}:{username.lower()}:{day.isoformat()}:{version}"
+
+
+def _version_key(client_id):
+    return f"punch_status_version:{client_id}"
+
+
+def _status_version(client_id):
+    """The tenant's punch-status version, from the cache"""
+    version = cache.get(_version_key(client_id))
+    if version is None:
+        # Started from the clock, so a lost counter never repeats an old one
+        cache.add(_version_key(client_id), clock.time_ns(), None)
+        version = cache.get(_version_key(client_id))
+    return version
+
+
+def local_day_bounds(day, tz=None):
+    """Aware [start, end) datetimes of a calendar day in tz (default: current)"""
+    tz = tz or timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    # The next midnight, not start + 24 h: a day across a DST change is not 24 h
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def photo_url_from_path(photo_path):
+    """Public R2 url for a stored photo path (same rule as punchin_table)"""
+    if photo_path and not photo_path.startswith('http'):
+        return f"{settings.CLOUDFLARE_R2_PUBLIC_URL}/{photo_path}"
+    return photo_path or None
+
+
+def fetch_today_punch(client_id, username, day):
+    """
+    Latest punch-in of the day for one user in ONE query.
+
+    An open punch-in wins over completed ones; among completed ones the
+    latest punch-out wins. The day is a punchin_time range and created_by is
+    matched case-insensitively (as the app always did), so the query walks
+    idx_punchin_client_uuser_time instead of casting every row to a date.
+    """
+    start, end = local_day_bounds(day)
+    punchin_table = PunchIn._meta.db_table
+    firm_table = AccMaster._meta.db_table
+
+    sql_query = f"""
+    SELECT
+        p.id,
+        p.punchin_time,
+        p.punchout_time,
+        p.photo,
+        p.address,
+        p.status,
+        p.created_by,
+        a.code AS firm_code,
+        a.name AS firm_name
+    FROM {punchin_table} p
+    LEFT JOIN {firm_table} a
+        ON p.firm_code = a.code AND p.client_id = a.client_id
+    WHERE p.client_id = %s
+      AND UPPER(p.created_by) = UPPER(%s)
+      AND p.punchin_time >= %s
+      AND p.punchin_time < %s
+    ORDER BY (p.punchout_time IS NULL) DESC,
+             COALESCE(p.punchout_time, p.punchin_time) DESC
+    LIMIT 1
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, [client_id, username, start, end])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        columns = [desc[0] for desc in cursor.description]
+
+    return dict(zip(columns, row))
+
+
+def get_today_punch(client_id, username):
+    """Cached wrapper around fetch_today_punch() for the current local day"""
+    day = timezone.localdate()
+    key = _cache_key(client_id, username, day, _status_version(client_id))
+
+    cached = cache.get(key)
+    if cached is not None:
+        return cached['row']
+
+    row = fetch_today_punch(client_id, username, day)
+    # Wrap the row so "no punch today" is cached too
+    cache.set(key, {'row': row}, STATUS_CACHE_TIMEOUT)
+    return row
+
+
+def invalidate_punch_status(client_id):
+    """
+    Retire the tenant's cached statuses after a punch-in / punch-out /
+    status change; also moves its "punches" data version up for clients
+    polling app1.versions
+    """
+    if not client_id:
+        return
+
+    def retire():
+        try:
+            cache.incr(_version_key(client_id))
+        except ValueError:
+            cache.set(_version_key(client_id), clock.time_ns(), None)
+
+    # After the commit, or a poll in between would cache the old status
+    # under the new version
+    transaction.on_commit(retire)
+    bump_data_version(client_id, "punches")
+
+
+def build_punch_status(row):
+    """Response body of the punch-status endpoint for a fetched row"""
+    if row is None:
+        return {
+            'success': True,
+            'is_punched_in': False,
+            'completed_today': False,
+            'data': None
+        }
+
+    firm_name = row['firm_name'] or 'Unknown Store'
+    status_value = row['status'] or 'pending'
+
+    if row['punchout_time'] is None:
+        work_duration = timezone.now() - row['punchin_time']
+        return {
+            'success': True,
+            'is_punched_in': True,
+            'data': {
+                'punchin_id': row['id'],
+                'firm_name': firm_name,
+                'firm_code': row['firm_code'],
+                'punchin_time': row['punchin_time'].isoformat(),
+                'current_work_hours': round(work_duration.total_seconds() / 3600, 2),
+                'seconds': int(work_duration.total_seconds()),
+                'photo_url': photo_url_from_path(row['photo']),
+                'address': row['address'] or '',
+                'status': status_value,
+                'created_by': row['created_by']
+            }
+        }
+
+    work_duration = row['punchout_time'] - row['punchin_time']
+    return {
+        'success': True,
+        'is_punched_in': False,
+        'completed_today': True,
+        'data': {
+            'punchin_id': row['id'],
+            'firm_name': firm_name,
+            'firm_code': row['firm_code'],
+            'punchin_time': row['punchin_time'].isoformat(),
+            'punchout_time': row['punchout_time'].isoformat(),
+            'total_work_hours': round(work_duration.total_seconds() / 3600, 2),
+            'status': status_value
+        }
+    }
@@ -1,3 +1,265 @@
+from datetime import datetime, timedelta
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from app1.models import AccMaster
+from .membership import rebuild_if_stale, rebuild_user_firms
+from .models import PunchIn, UserAreas, UserFirm, UserFirmsStale
+from .punch_status import get_today_punch, invalidate_punch_status
+
+
+CLIENT_ID = "test-client"
+
+
+def make_token(username="alice", role="User", client_id=CLIENT_ID, **claims):
+    payload = {
+        "user_id": username,
+        "username": username,
+        "client_id": client_id,
+        "role": role,
+        "accountcode": "",
+        "exp": datetime.utcnow() + timedelta(hours=1),
+        "iat": datetime.utcnow(),
+    }
+    payload.update(claims)
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+
+
+def create_punchin(firm, username, **fields):
+    return PunchIn.objects.create(
+        firm=firm, client_id=CLIENT_ID, current_location="here", shop_location="there",
+        punchin_status="Location Matched", created_by=username, **fields
+    )
+
+
+class PunchStatusTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.firm = AccMaster.objects.create(code="F001", name="Corner Shop", client_id=CLIENT_ID)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token('alice')}")
+
+    def test_created_by_matches_case_insensitively(self):
+        punch = create_punchin(self.firm, "Alice")
+
+        row = get_today_punch(CLIENT_ID, "alice")
+
+        self.assertEqual(row["id"], punch.id)
+        self.assertEqual(row["firm_name"], "Corner Shop")
+
+    def test_cached_status_costs_no_query(self):
+        get_today_punch(CLIENT_ID, "alice")
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_today_punch(CLIENT_ID, "alice"))
+
+    def test_punch_moves_the_version_so_cached_status_is_not_served(self):
+        self.assertIsNone(get_today_punch(CLIENT_ID, "alice"))
+
+        punch = create_punchin(self.firm, "alice")
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_punch_status(CLIENT_ID)
+
+        self.assertEqual(get_today_punch(CLIENT_ID, "alice")["id"], punch.id)
+
+    def test_status_endpoint_follows_punch_out(self):
+        punch = create_punchin(self.firm, "alice")
+        response = self.api.get("/api/punch-status/")
+        self.assertTrue(response.json()["is_punched_in"])
+
+        PunchIn.objects.filter(id=punch.id).update(punchout_time=timezone.now())
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_punch_status(CLIENT_ID)
+
+        body = self.api.get("/api/punch-status/").json()
+        self.assertFalse(body["is_punched_in"])
+        self.assertTrue(body["completed_today"])
+
+    def test_status_endpoint_requires_a_token(self):
+        response = APIClient().get("/api/punch-status/")
+        self.assertEqual(response.status_code, 401)
+
+
+class PunchBatchUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.firm = AccMaster.objects.create(code="F001", name="Corner Shop", client_id=CLIENT_ID)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token('alice')}")
+        started = timezone.now() - timedelta(hours=2)
+        self.events = [
+            {
+                "event_id": "ev-in-1", "type": "punchin", "timestamp": started.isoformat(),
+                "customerCode": "F001", "latitude": 10.0, "longitude": 76.0,
+                "current_location": "10.0,76.0", "shop_location": "10.0,76.0",
+                "punchin_status": "Location Matched",
+            },
+            {
+                "event_id": "ev-out-1", "type": "punchout",
+                "timestamp": (started + timedelta(hours=1)).isoformat(),
+                "punchin_event_id": "ev-in-1",
+            },
+        ]
+
+    def upload(self, events):
+        return self.api.post("/api/punch-in/batch/", {"events": events}, format="json")
+
+    def test_batch_applies_punch_in_and_out(self):
+        response = self.upload(self.events)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["created", "applied"])
+        punch = PunchIn.objects.get(client_event_id="ev-in-1")
+        self.assertEqual(punch.punchout_time - punch.punchin_time, timedelta(hours=1))
+
+    def test_replayed_batch_stores_nothing_twice(self):
+        self.upload(self.events)
+        response = self.upload(self.events)
+
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["duplicate", "duplicate"])
+        self.assertEqual(PunchIn.objects.filter(client_id=CLIENT_ID).count(), 1)
+
+    def test_punch_in_is_refused_while_a_visit_is_open(self):
+        visit = create_punchin(self.firm, "alice")
+        now = timezone.now().isoformat()
+        punchin = dict(self.events[0], event_id="ev-in-2", timestamp=now)
+
+        refused = self.upload([punchin]).json()["results"]
+        accepted = self.upload([
+            {"event_id": "ev-out-2", "type": "punchout", "timestamp": now, "punchin_id": visit.id},
+            punchin,
+        ]).json()["results"]
+
+        self.assertEqual(refused[0]["status"], "error")
+        self.assertEqual([r["status"] for r in accepted], ["applied", "created"])
+        self.assertEqual(PunchIn.objects.filter(client_id=CLIENT_ID, punchout_time__isnull=True).count(), 1)
+
+    def test_wrongly_typed_fields_fail_only_their_event(self):
+        events = [
+            dict(self.events[0], event_id="ev-bad-1", customerCode=["F001"]),
+            dict(self.events[0], event_id="ev-bad-2", notes={"text": "hi"}),
+            dict(self.events[1], event_id="ev-bad-3", punchin_event_id={"id": 1}),
+        ] + self.events
+
+        response = self.upload(events)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], ["error", "error", "error", "created", "applied"])
+        self.assertEqual(results[0]["error"], "customerCode must be a string")
+
+    def test_event_id_is_unique_per_tenant(self):
+        create_punchin(self.firm, "alice", client_event_id="ev-in-1")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create_punchin(self.firm, "alice", client_event_id="ev-in-1")
+        # Other tenants may reuse the id
+        PunchIn.objects.create(
+            firm=self.firm, client_id="other-client", current_location="here", shop_location="there",
+            punchin_status="Location Matched", created_by="alice", client_event_id="ev-in-1",
+        )
+
+
+class UserFirmsMembershipTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        AccMaster.objects.create(code="F001", name="North Traders", area="NORTH", client_id=CLIENT_ID)
+        AccMaster.objects.create(code="F002", name="South Stores", area="SOUTH", client_id=CLIENT_ID)
+        UserAreas.objects.create(user_id="alice", client_id=CLIENT_ID, area_code="north")
+        rebuild_user_firms(CLIENT_ID)
+        UserFirmsStale.objects.all().delete()
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token('alice')}")
+
+    def firm_codes(self):
+        return sorted(firm["id"] for firm in self.api.get("/api/shop-location/firms/").json()["firms"])
+
+    def test_acc_master_write_marks_the_tenant_stale(self):
+        AccMaster.objects.create(code="F003", name="Northside Mart", client_id=CLIENT_ID)
+
+        self.assertTrue(UserFirmsStale.objects.filter(client_id=CLIENT_ID).exists())
+
+    def test_stale_tenant_is_rebuilt_before_the_lookup(self):
+        AccMaster.objects.create(code="F003", name="Northside Mart", client_id=CLIENT_ID)
+
+        self.assertEqual(self.firm_codes(), ["F001", "F003"])
+        self.assertFalse(UserFirmsStale.objects.filter(client_id=CLIENT_ID).exists())
+        self.assertFalse(rebuild_if_stale(CLIENT_ID))
+
+    def test_tenant_without_memberships_is_built_before_the_lookup(self):
+        # As after migration 0013, before the first rebuild
+        UserFirm.objects.all().delete()
+
+        self.assertEqual(self.firm_codes(), ["F001"])
+
+    def test_firms_are_listed_by_name(self):
+        AccMaster.objects.create(code="F000", name="Zeta North", client_id=CLIENT_ID)
+        AccMaster.objects.create(code="F004", name="Alpha North", client_id=CLIENT_ID)
+
+        firms = self.api.get("/api/shop-location/firms/").json()["firms"]
+
+        self.assertEqual([firm["firm_name"] for firm in firms], ["Alpha North", "North Traders", "Zeta North"])
+
+    def test_rebuild_matches_areas_case_insensitively(self):
+        self.assertEqual(
+            list(UserFirm.objects.filter(client_id=CLIENT_ID, user_id="alice").values_list("firm_code", flat=True)),
+            ["F001"],
+        )
+
+
+class AttendanceReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.firm = AccMaster.objects.create(code="F001", name="Corner Shop", client_id=CLIENT_ID)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token('alice')}")
+
+    def test_visit_hours_of_the_day(self):
+        punch = create_punchin(self.firm, "alice")
+        PunchIn.objects.filter(id=punch.id).update(punchout_time=punch.punchin_time + timedelta(minutes=90))
+        day = timezone.localdate().isoformat()
+
+        body = self.api.get(f"/api/punch-in/attendance/?start_date={day}&end_date={day}").json()
+
+        (row,) = body["data"]
+        self.assertEqual(row["username"], "alice")
+        self.assertEqual(row["visit_count"], 1)
+        self.assertEqual(row["visit_hours"], 1.5)
+
+    def test_visits_are_dated_in_the_local_time_zone(self):
+        # 00:30 in Asia/Kolkata is still the previous day in UTC
+        punch = create_punchin(self.firm, "alice")
+        local_start = timezone.make_aware(datetime(2026, 3, 10, 0, 30))
+        PunchIn.objects.filter(id=punch.id).update(
+            punchin_time=local_start, punchout_time=local_start + timedelta(hours=1)
+        )
+
+        body = self.api.get("/api/punch-in/attendance/?start_date=2026-03-09&end_date=2026-03-10").json()
+
+        self.assertEqual([row["date"] for row in body["data"]], ["2026-03-10"])
+        self.assertEqual(body["data"][0]["first_punchin"], "2026-03-10T00:30:00+05:30")
+
+    def test_invalid_calendar_date_is_a_bad_request(self):
+        response = self.api.get("/api/punch-in/attendance/?start_date=2026-02-30")
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 400)
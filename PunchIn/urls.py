@@ -2,7 +2,8 @@ from django.urls import path
 from .views import (
     shop_location, get_firms, get_table_data, update_location_status,
     upload_image_to_r2, punchin, punchout, get_active_punchin,punchin_table,
-    get_areas, update_area, get_user_areas,update_punchin_verification
+    get_areas, update_area, get_user_areas,update_punchin_verification,
+    attendance_report, attendance_export, punch_batch_upload
 )
 
 urlpatterns = [    
@@ -16,9 +17,13 @@ urlpatterns = [
     path("punch-in/upload-image/", upload_image_to_r2, name="upload-image"),
     path("punch-in/", punchin, name="punchin"),
     path("punch-out/<int:id>/", punchout, name="punchout"),
+    path("punch-in/batch/", punch_batch_upload, name="punch_batch_upload"),
     path("punch-status/", get_active_punchin, name="punch-status"),
     path("punch-in/table/",punchin_table,name='punchin_table'),
     path("punch-in/updateStatus", update_punchin_verification , name="update_verification"),
+    #Attendance reports
+    path("punch-in/attendance/", attendance_report, name="attendance_report"),
+    path("punch-in/attendance/export/", attendance_export, name="attendance_export"),
     #Area management
     path("get-areas/", get_areas, name="get-areas"),
     path("get-user-area", get_user_areas, name="get_user_area"),
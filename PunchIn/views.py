@@ -3,54 +3,36 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
 from django.db import transaction, DatabaseError,connection
-from django.db.models import OuterRef, Subquery
-from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
+from django.core.exceptions import MultipleObjectsReturned
 from decimal import Decimal, InvalidOperation
-from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
-import jwt
+import json
+from app1.auth import token_claims
+from app1.versions import bump as bump_data_version
 import logging
 
-from .models import ShopLocation, PunchIn, UserAreas
+from .models import ShopLocation, PunchIn, UserAreas, UserFirm
+from .membership import rebuild_user_firms, rebuild_if_stale
 from .serializers import ShopLocationSerializer
-from app1.models import Misel, AccMaster, AccUser
+from .geo import punchin_location_status
+from .punch_batch import MAX_BATCH_EVENTS, apply_punch_batch
+from .punch_status import get_today_punch, build_punch_status, invalidate_punch_status
+from .attendance import (
+    MAX_REPORT_DAYS, daily_attendance, monthly_attendance, format_daily_row,
+    format_monthly_row, invalidate_attendance_day
+)
+from app1.exports import csv_lines
+from app1.models import AccMaster, AccUser
+from app1.pagination import (
+    get_page_size, encode_cursor, decode_cursor, cursor_datetime, parse_date_range
+)
 
 logger = logging.getLogger(__name__)
 
 
-# ============================================================================
-# UTILITY FUNCTIONS - JWT & AUTHENTICATION
-# ============================================================================
-
-def decode_jwt_token(request):
-    """Decode JWT token from Authorization header"""
-    auth_header = request.META.get("HTTP_AUTHORIZATION")
-    
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return None
-    
-    token = auth_header.split(' ')[1]
-
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-        return payload
-    except Exception:
-        return None
-
-
-def get_client_id_from_token(request):
-    """Get client_id from JWT token"""
-    auth_header = request.META.get('HTTP_AUTHORIZATION')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    token = auth_header.split(' ')[1]
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-        return payload.get('client_id')
-    except Exception:
-        return None
-
-
 # ============================================================================
 # SHOP LOCATION FEATURES
 # ============================================================================
@@ -60,7 +42,7 @@ def get_client_id_from_token(request):
 def shop_location(request):
     """Create or update shop location"""
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Invalid or missing token'}, status=401)
 
@@ -124,7 +106,7 @@ def shop_location(request):
 def get_firms(request):
     """Get all firms with their latest shop location coordinates"""
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Invalid or missing token'}, status=401)
 
@@ -135,60 +117,62 @@ def get_firms(request):
         if not client_id:
             return Response({'error': 'Invalid or missing token'}, status=401)
 
-        # Prepare subquery for latest shop location
-        latest_shop = ShopLocation.objects.filter(
-            firm=OuterRef('pk'),
-            client_id=client_id
-        ).order_by('-created_at')
-
-        # ---- ADMIN LOGIC ----
-        if role == "Admin":
-            firms = (
-                AccMaster.objects.filter(client_id=client_id)
-                .annotate(
-                    latitude=Subquery(latest_shop.values('latitude')[:1]),
-                    longitude=Subquery(latest_shop.values('longitude')[:1]),
-                )
-            )
+        firm_table = AccMaster._meta.db_table
+        user_firms = UserFirm._meta.db_table
+
+        # Latest coordinates come from the latest_shop_location view
+        # (DISTINCT ON over idx_shop_client_firm_latest)
+        select_sql = f"""
+            SELECT m.code, m.name, m.area, l.latitude, l.longitude
+            FROM {{source}}
+            LEFT JOIN latest_shop_location l
+                ON l.client_id = m.client_id AND l.firm_code = m.code
+            WHERE {{condition}}
+            ORDER BY m.name, m.code
+        """
 
         # ---- NON-ADMIN LOGIC ----
+        # Firms matching the user's areas are precomputed in user_firms
+        # (rebuilt here first when acc_master changed since the last build).
+        # A user without any assigned area sees every firm, as before.
+        is_admin = role == "Admin"
+        if not is_admin:
+            has_areas = UserAreas.objects.filter(client_id=client_id, user=username).exists()
+            if has_areas:
+                rebuild_if_stale(client_id)
+
+        if is_admin or not has_areas:
+            sql_query = select_sql.format(
+                source=f"{firm_table} m",
+                condition="m.client_id = %s"
+            )
+            query_params = [client_id]
         else:
-            # Get areas assigned to this user
-            user_areas = UserAreas.objects.filter(
-                client_id=client_id,
-                user=username
-            ).values_list('area_code', flat=True)
-
-            from django.db.models import Q
-            area_filter = Q()
-
-            # Build LIKE filters: name__icontains or area__icontains
-            for area in user_areas:
-                area_filter |= Q(name__icontains=area) | Q(area__icontains=area)
-
-            # Apply dynamic filters
-            firms = (
-                AccMaster.objects.filter(client_id=client_id)
-                .filter(area_filter)
-                .annotate(
-                    latitude=Subquery(latest_shop.values('latitude')[:1]),
-                    longitude=Subquery(latest_shop.values('longitude')[:1]),
-                )
+            sql_query = select_sql.format(
+                source=f"""{user_firms} uf
+            JOIN {firm_table} m
+                ON m.client_id = uf.client_id AND m.code = uf.firm_code""",
+                condition="uf.client_id = %s AND uf.user_id = %s"
             )
+            query_params = [client_id, username]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql_query, query_params)
+            firms = cursor.fetchall()
 
         # ---- RESPONSE ----
-        if not firms.exists():
+        if not firms:
             return Response({'success': True, 'firms': [], 'message': 'No firms found'}, status=200)
 
         data = [
             {
-                'id': firm.code,
-                'firm_name': firm.name,
-                'area': firm.area,
-                'latitude': float(firm.latitude) if firm.latitude is not None else None,
-                'longitude': float(firm.longitude) if firm.longitude is not None else None,
+                'id': code,
+                'firm_name': name,
+                'area': area,
+                'latitude': float(latitude) if latitude is not None else None,
+                'longitude': float(longitude) if longitude is not None else None,
             }
-            for firm in firms
+            for code, name, area, latitude, longitude in firms
         ]
 
         return Response({'success': True, 'firms': data}, status=200)
@@ -205,7 +189,7 @@ def get_firms(request):
 def get_table_data(request):
     """Get shop location data for authenticated client using optimized raw SQL"""
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Invalid or missing token'}, status=401)
 
@@ -338,7 +322,7 @@ def get_table_data(request):
 def update_location_status(request):
     """Update the status of a shop location"""
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Invalid or missing token'}, status=401)
         
@@ -363,6 +347,9 @@ def update_location_status(request):
             if updated_count == 0:
                 return Response({'error': 'Shop not found or unauthorized'}, status=404)
 
+            # update() sends no signals
+            bump_data_version(client_id, 'shop_locations')
+
         return Response({'success': True, 'updated_count': updated_count}, status=200)
 
     except MultipleObjectsReturned:
@@ -380,7 +367,7 @@ def update_location_status(request):
 def update_punchin_verification(request):
     """Update the status of a shop location"""
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Invalid or missing token'}, status=401)
         
@@ -413,6 +400,8 @@ def update_punchin_verification(request):
             if updated_count == 0:
                 return Response({'error': 'Shop not found or unauthorized'}, status=404)
 
+        invalidate_punch_status(client_id)
+
         return Response({'success': True, 'updated_count': updated_count}, status=200)
 
     except MultipleObjectsReturned:
@@ -438,7 +427,7 @@ def punchin(request):
     """
     try:
         # ✅ Authenticate user
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Authentication required'}, status=401)
         
@@ -505,34 +494,8 @@ def punchin(request):
         except AccMaster.DoesNotExist:
             return Response({'error': 'Invalid firm code for this client'}, status=404)
 
-        # ============================
-        # ✅ ONLY CHANGE: LOCATION CHECK
-        # ============================
-        import math
-
-        def calculate_distance(lat1, lon1, lat2, lon2):
-            R = 6371000
-            lat1, lon1, lat2, lon2 = map(math.radians, map(float, [lat1, lon1, lat2, lon2]))
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-            return R * c
-
-        try:
-            cur_lat, cur_lon = current_location.split(',')
-            shop_lat, shop_lon = shop_location.split(',')
-
-            distance = calculate_distance(cur_lat, cur_lon, shop_lat, shop_lon)
-
-            if distance > 100:
-                punchin_status = "Mismatch Location"
-            else:
-                punchin_status = "Correct Location"
-
-        except Exception:
-            # fallback (keep original value if something fails)
-            punchin_status = punchin_status
+        # ✅ LOCATION CHECK
+        punchin_status = punchin_location_status(current_location, shop_location, punchin_status)
 
         # 🕒 Existing punch-in check (unchanged)
         from django.utils import timezone
@@ -567,6 +530,8 @@ def punchin(request):
 
             logger.info(f"Punch-in created successfully for user {username}, ID: {punchin_record.id}")
 
+        invalidate_punch_status(client_id)
+
         # ✅ Response (unchanged)
         photo_url = punchin_record.photo.url if punchin_record.photo else None
         
@@ -607,7 +572,7 @@ def punchout(request, id):
     Handle punch-out functionality
     """
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response(
                 {'error': 'Authentication required'},
@@ -686,6 +651,13 @@ def punchout(request, id):
 
             active_punchin.save(update_fields=['punchout_time', 'notes'])
 
+        invalidate_punch_status(client_id)
+
+        # Punching out an old visit changes a finished (cached) attendance day
+        punchin_day = timezone.localtime(active_punchin.punchin_time).date()
+        if punchin_day < timezone.localdate():
+            invalidate_attendance_day(client_id, punchin_day)
+
         # Get firm only for same client_id
         firm = AccMaster.objects.filter(
             code=active_punchin.firm_id,
@@ -745,135 +717,85 @@ def punchout(request, id):
         )
 
 
-@api_view(['GET'])
-def get_active_punchin(request):
+@api_view(['POST'])
+def punch_batch_upload(request):
     """
-    Get current punch status for authenticated user
+    Sync punch events queued offline in one round-trip.
+    Expects: { "events": [ {event_id, type, timestamp, ...}, ... ] }
+    (multipart is accepted too: "events" as a JSON string and the photo of a
+    punch-in event as file "image_<event_id>"). See punch_batch.py.
     """
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
-            return Response(
-                {'error': 'Authentication required'},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
+            return Response({'error': 'Authentication required'}, status=401)
 
         client_id = payload.get('client_id')
         username = payload.get('username')
 
         if not client_id or not username:
-            return Response(
-                {'error': 'Invalid token payload'},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
+            return Response({'error': 'Invalid token payload'}, status=401)
 
-        from django.utils import timezone
-        today = timezone.now().date()
+        events = request.data.get('events')
+        if isinstance(events, str):
+            try:
+                events = json.loads(events)
+            except ValueError:
+                return Response({'error': 'events must be a JSON array'}, status=400)
 
-        logger.info(
-            f"Punch status request | client_id={client_id} | username={username}"
-        )
+        if not isinstance(events, list) or not events:
+            return Response({'error': 'events must be a non-empty array'}, status=400)
 
-        # Find latest active punch-in for this client + user only
-        active_punchin = (
-            PunchIn.objects
-            .filter(
-                client_id=client_id,
-                created_by__iexact=username,
-                punchin_time__date=today,
-                punchout_time__isnull=True
-            )
-            .order_by('-punchin_time')
-            .first()
-        )
+        if len(events) > MAX_BATCH_EVENTS:
+            return Response({'error': f'At most {MAX_BATCH_EVENTS} events per batch'}, status=400)
 
-        if active_punchin:
-            work_duration = timezone.now() - active_punchin.punchin_time
-            hours = round(work_duration.total_seconds() / 3600, 2)
+        results = apply_punch_batch(events, client_id, username, request.FILES)
 
-            # Get correct firm only from this client_id
-            firm = AccMaster.objects.filter(
-                code=active_punchin.firm_id,
-                client_id=client_id
-            ).first()
+        summary = {}
+        for result in results:
+            summary[result['status']] = summary.get(result['status'], 0) + 1
 
-            logger.info(
-                f"Active punch found | punchin_id={active_punchin.id} | "
-                f"firm_id={active_punchin.firm_id} | "
-                f"firm_name={firm.name if firm else 'None'}"
-            )
+        logger.info(f"Punch batch for user {username}: {summary}")
 
-            # Safe photo url
-            photo_url = None
-            try:
-                if active_punchin.photo:
-                    photo_url = active_punchin.photo.url
-            except Exception as photo_error:
-                logger.warning(
-                    f"Photo URL error for punchin {active_punchin.id}: {photo_error}"
-                )
+        return Response({
+            'success': True,
+            'summary': summary,
+            'results': results
+        }, status=200)
 
-            return Response(
-                {
-                    'success': True,
-                    'is_punched_in': True,
-                    'data': {
-                        'punchin_id': active_punchin.id,
-                        'firm_name': firm.name if firm else 'Unknown Store',
-                        'firm_code': firm.code if firm else None,
-                        'punchin_time': active_punchin.punchin_time.isoformat(),
-                        'current_work_hours': hours,
-                        'seconds': int(work_duration.total_seconds()),
-                        'photo_url': photo_url,
-                        'address': active_punchin.address or '',
-                        'status': active_punchin.status or 'pending',
-                        'created_by': active_punchin.created_by
-                    }
-                },
-                status=status.HTTP_200_OK
-            )
+    except DatabaseError as e:
+        logger.error(f"Database error in punch_batch_upload: {str(e)}")
+        return Response({'error': 'Database operation failed'}, status=500)
+    except Exception as e:
+        logger.exception("Unexpected error in punch_batch_upload")
+        return Response({'error': 'Punch batch upload failed'}, status=500)
 
-        # If no active punch-in, check completed punch today
-        completed_today = (
-            PunchIn.objects
-            .filter(
-                client_id=client_id,
-                created_by__iexact=username,
-                punchin_time__date=today,
-                punchout_time__isnull=False
+
+@api_view(['GET'])
+def get_active_punchin(request):
+    """
+    Get current punch status for authenticated user
+    (single query + short per-user cache, see punch_status.py)
+    """
+    try:
+        payload, _ = token_claims(request)
+        if not payload:
+            return Response(
+                {'error': 'Authentication required'},
+                status=status.HTTP_401_UNAUTHORIZED
             )
-            .order_by('-punchout_time')
-            .first()
-        )
 
-        response_data = {
-            'success': True,
-            'is_punched_in': False,
-            'completed_today': completed_today is not None,
-            'data': None
-        }
+        client_id = payload.get('client_id')
+        username = payload.get('username')
 
-        if completed_today:
-            work_duration = completed_today.punchout_time - completed_today.punchin_time
-            hours = round(work_duration.total_seconds() / 3600, 2)
-
-            # Get correct firm only from same client_id
-            firm = AccMaster.objects.filter(
-                code=completed_today.firm_id,
-                client_id=client_id
-            ).first()
-
-            response_data['data'] = {
-                'punchin_id': completed_today.id,
-                'firm_name': firm.name if firm else 'Unknown Store',
-                'firm_code': firm.code if firm else None,
-                'punchin_time': completed_today.punchin_time.isoformat(),
-                'punchout_time': completed_today.punchout_time.isoformat(),
-                'total_work_hours': hours,
-                'status': completed_today.status or 'pending'
-            }
+        if not client_id or not username:
+            return Response(
+                {'error': 'Invalid token payload'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
 
-        return Response(response_data, status=status.HTTP_200_OK)
+        row = get_today_punch(client_id, username)
+        return Response(build_punch_status(row), status=status.HTTP_200_OK)
 
     except DatabaseError as e:
         logger.exception(
@@ -904,9 +826,15 @@ def get_active_punchin(request):
 
 @api_view(['GET'])
 def punchin_table(request):
-    """Get punch-in table data for authenticated client with role-based filtering"""
+    """
+    Get punch-in table data for authenticated client with role-based filtering.
+
+    Results are keyset-paginated on (punchin_time, id), newest first.
+    Query params: start_date / end_date (YYYY-MM-DD, inclusive),
+    limit (default 100, max 500) and cursor (the next_cursor of the previous page).
+    """
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Invalid or missing token'}, status=401)
 
@@ -916,98 +844,93 @@ def punchin_table(request):
         
         user_role = payload.get('role')
         username = payload.get('username')
-        startDate = request.GET.get('start_date')
-        endDate = request.GET.get('end_date')
+        is_admin = bool(user_role and user_role.lower() == 'admin')
 
-        if startDate and endDate:
-            date_filter = f"AND p.created_at >= '{startDate}' AND p.created_at < '{endDate}'::date + INTERVAL '1 day'"
-        else:
-            date_filter = ""
-
-        from django.db import connection
+        try:
+            start_at, end_at = parse_date_range(request)
+            page_size = get_page_size(request)
+            cursor_token = request.GET.get('cursor')
+            after = None
+            if cursor_token:
+                after_time, after_id = decode_cursor(cursor_token, 2)
+                after = (cursor_datetime(after_time), int(after_id))
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e) or 'Invalid query parameters'}, status=400)
 
         punchin_table = PunchIn._meta.db_table
         firm_table = AccMaster._meta.db_table
 
-        # ================= ADMIN QUERY =================
-        if user_role and user_role.lower() == 'admin':
-            sql_query = f"""
-            SELECT 
-                p.id,
-                p.latitude,
-                p.longitude,
-
-                -- ✅ ADDED FIELDS
-                p.current_location,
-                p.shop_location,
-                p.punchin_status,
-
-                p.punchin_time,
-                p.punchout_time,
-                p.photo,
-                p.address,
-                p.notes,
-                p.status,
-                p.created_by,
-                p.created_at,
-                p.updated_at,
-                p.client_id,
-                a.code as firm_code,
-                COALESCE(a.name, 'Unknown Store') as firm_name,
-                COALESCE(a.place, 'No address') as firm_place
-            FROM {punchin_table} p
-            LEFT JOIN {firm_table} a 
-                ON p.firm_code = a.code AND p.client_id = a.client_id
-            WHERE p.client_id = %s {date_filter}
-            ORDER BY p.punchin_time DESC
-            """
-            query_params = [client_id]
-
-        # ================= USER QUERY =================
-        else:
-            sql_query = f"""
-            SELECT 
-                p.id,
-                p.latitude,
-                p.longitude,
-
-                -- ✅ ADDED FIELDS
-                p.current_location,
-                p.shop_location,
-                p.punchin_status,
-
-                p.punchin_time,
-                p.punchout_time,
-                p.photo,
-                p.address,
-                p.notes,
-                p.status,
-                p.created_by,
-                p.created_at,
-                p.updated_at,
-                p.client_id,
-                a.code as firm_code,
-                COALESCE(a.name, 'Unknown Store') as firm_name,
-                COALESCE(a.place, 'No address') as firm_place
-            FROM {punchin_table} p
-            LEFT JOIN {firm_table} a 
-                ON p.firm_code = a.code AND p.client_id = a.client_id
-            WHERE p.client_id = %s AND p.created_by = %s {date_filter}
-            ORDER BY p.punchin_time DESC
-            """
-            query_params = [client_id, username]
+        # Every filter is a bound parameter so Postgres can reuse the plan.
+        # Admins walk idx_punchin_client_time, users idx_punchin_client_user_time.
+        conditions = ["p.client_id = %s"]
+        query_params = [client_id]
+
+        if not is_admin:
+            conditions.append("p.created_by = %s")
+            query_params.append(username)
+
+        if start_at:
+            conditions.append("p.punchin_time >= %s")
+            query_params.append(start_at)
+
+        if end_at:
+            conditions.append("p.punchin_time < %s")
+            query_params.append(end_at)
+
+        if after:
+            conditions.append("(p.punchin_time, p.id) < (%s, %s)")
+            query_params.extend(after)
+
+        sql_query = f"""
+        SELECT 
+            p.id,
+            p.latitude,
+            p.longitude,
+
+            -- ✅ ADDED FIELDS
+            p.current_location,
+            p.shop_location,
+            p.punchin_status,
+
+            p.punchin_time,
+            p.punchout_time,
+            p.photo,
+            p.address,
+            p.notes,
+            p.status,
+            p.created_by,
+            p.created_at,
+            p.updated_at,
+            p.client_id,
+            a.code as firm_code,
+            COALESCE(a.name, 'Unknown Store') as firm_name,
+            COALESCE(a.place, 'No address') as firm_place
+        FROM {punchin_table} p
+        LEFT JOIN {firm_table} a 
+            ON p.firm_code = a.code AND p.client_id = a.client_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY p.punchin_time DESC, p.id DESC
+        LIMIT %s
+        """
+        # One extra row tells us whether another page exists
+        query_params.append(page_size + 1)
 
         with connection.cursor() as cursor:
             cursor.execute(sql_query, query_params)
             rows = cursor.fetchall()
             columns = [desc[0] for desc in cursor.description]
 
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
         if not rows:
             return Response({
                 'success': True,
                 'data': [],
                 'message': 'No punch-in records found',
-                'count': 0
+                'count': 0,
+                'next_cursor': None,
+                'has_more': False
             }, status=200)
 
         data = []
@@ -1064,13 +987,18 @@ def punchin_table(request):
 
             data.append(record)
 
+        last = dict(zip(columns, rows[-1]))
+        next_cursor = encode_cursor(last['punchin_time'], last['id']) if has_more else None
+
         return Response({
             'success': True,
             'data': data,
             'count': len(data),
             'message': f'Punch-in records retrieved successfully ({len(data)} records)',
             'user_role': user_role,
-            'is_admin_view': user_role and user_role.lower() == 'admin'
+            'is_admin_view': is_admin,
+            'next_cursor': next_cursor,
+            'has_more': has_more
         }, status=200)
 
     except DatabaseError as e:
@@ -1082,6 +1010,136 @@ def punchin_table(request):
 
 
 
+# ============================================================================
+# ATTENDANCE REPORTS
+# ============================================================================
+
+def _attendance_request(request):
+    """
+    Common auth + params of the attendance endpoints.
+    Returns (client_id, first_day, last_day, username, group) or an error Response.
+    """
+    payload, _ = token_claims(request)
+    if not payload:
+        return Response({'error': 'Invalid or missing token'}, status=401)
+
+    client_id = payload.get('client_id')
+    if not client_id:
+        return Response({'error': 'Invalid token payload'}, status=401)
+
+    role = payload.get('role')
+    is_admin = bool(role and role.lower() == 'admin')
+
+    today = timezone.localdate()
+    first_day, last_day = today.replace(day=1), today
+    try:
+        if request.GET.get('start_date'):
+            first_day = parse_date(request.GET['start_date'])
+        if request.GET.get('end_date'):
+            last_day = parse_date(request.GET['end_date'])
+    except ValueError:
+        # Well formed but not a real date (2026-02-30)
+        first_day = None
+    if first_day is None or last_day is None:
+        return Response({'error': 'start_date / end_date must be YYYY-MM-DD'}, status=400)
+
+    if last_day < first_day:
+        return Response({'error': 'end_date must not be before start_date'}, status=400)
+
+    if (last_day - first_day).days >= MAX_REPORT_DAYS:
+        return Response({'error': f'Date range is limited to {MAX_REPORT_DAYS} days'}, status=400)
+
+    group = request.GET.get('group', 'day')
+    if group not in ('day', 'month'):
+        return Response({'error': 'group must be day or month'}, status=400)
+
+    # Users only ever see their own attendance
+    username = (request.GET.get('user') or None) if is_admin else payload.get('username')
+
+    return client_id, first_day, last_day, username, group
+
+
+@api_view(['GET'])
+def attendance_report(request):
+    """
+    Per-user attendance (first punch-in, last punch-out, visit hours,
+    visit count, mismatch-location count) per day or per month.
+    Query params: start_date / end_date (YYYY-MM-DD, default this month),
+    group=day|month, user (admin only)
+    """
+    try:
+        params = _attendance_request(request)
+        if isinstance(params, Response):
+            return params
+        client_id, first_day, last_day, username, group = params
+
+        rows = daily_attendance(client_id, first_day, last_day, username)
+        if group == 'month':
+            data = [format_monthly_row(r) for r in monthly_attendance(rows)]
+        else:
+            data = [format_daily_row(r) for r in rows]
+
+        return Response({
+            'success': True,
+            'start_date': first_day.isoformat(),
+            'end_date': last_day.isoformat(),
+            'group': group,
+            'count': len(data),
+            'data': data
+        }, status=200)
+
+    except (TypeError, ValueError) as e:
+        return Response({'error': f'Invalid date: {e}'}, status=400)
+    except DatabaseError as e:
+        logger.error(f"Database error in attendance_report: {str(e)}")
+        return Response({'error': 'Database error'}, status=500)
+    except Exception as e:
+        logger.exception("Unexpected error in attendance_report")
+        return Response({'error': 'Failed to build attendance report'}, status=500)
+
+
+ATTENDANCE_DAY_COLUMNS = [
+    'username', 'date', 'first_punchin', 'last_punchout',
+    'visit_hours', 'visit_count', 'mismatch_count', 'open_visits',
+]
+ATTENDANCE_MONTH_COLUMNS = [
+    'username', 'month', 'days_present',
+    'visit_hours', 'visit_count', 'mismatch_count', 'open_visits',
+]
+
+
+@api_view(['GET'])
+def attendance_export(request):
+    """Same report as attendance_report, streamed as CSV for payroll"""
+    try:
+        params = _attendance_request(request)
+        if isinstance(params, Response):
+            return params
+        client_id, first_day, last_day, username, group = params
+
+        rows = daily_attendance(client_id, first_day, last_day, username)
+        if group == 'month':
+            columns = ATTENDANCE_MONTH_COLUMNS
+            data = (format_monthly_row(r) for r in monthly_attendance(rows))
+        else:
+            columns = ATTENDANCE_DAY_COLUMNS
+            data = (format_daily_row(r) for r in rows)
+
+        response = StreamingHttpResponse(csv_lines(columns, data), content_type='text/csv')
+        filename = f"attendance_{client_id}_{first_day.isoformat()}_{last_day.isoformat()}.csv"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    except (TypeError, ValueError) as e:
+        return Response({'error': f'Invalid date: {e}'}, status=400)
+    except DatabaseError as e:
+        logger.error(f"Database error in attendance_export: {str(e)}")
+        return Response({'error': 'Database error'}, status=500)
+    except Exception as e:
+        logger.exception("Unexpected error in attendance_export")
+        return Response({'error': 'Failed to export attendance'}, status=500)
+
+
 # ============================================================================
 # AREA MANAGEMENT FEATURES
 # ============================================================================
@@ -1089,7 +1147,7 @@ def punchin_table(request):
 @api_view(['GET'])
 def get_areas(request):
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Invalid or missing token'}, status=401)
 
@@ -1116,7 +1174,7 @@ def get_user_areas(request):
     """
     try:
         # ✅ Authenticate user
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Authentication required'}, status=401)
         
@@ -1169,7 +1227,7 @@ def update_area(request):
     """
     try:
         # ✅ Authenticate admin/manager
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Authentication required'}, status=401)
         
@@ -1220,11 +1278,16 @@ def update_area(request):
             # Bulk create new areas
             if new_areas:
                 UserAreas.objects.bulk_create(new_areas, ignore_conflicts=True)
+                # bulk_create sends no signals
+                bump_data_version(client_id, 'areas')
             
             # Get updated areas
             updated_areas = list(
                 UserAreas.objects.filter(user=user).values_list('area_code', flat=True)
             )
+
+            # Refresh the precomputed firm list of this user
+            rebuild_user_firms(client_id, user_id)
         
         logger.info(f"Areas updated for user {user_id} by {admin_username}. Removed: {deleted_count}, Added: {len(new_areas)}")
         
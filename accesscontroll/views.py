@@ -1,6 +1,5 @@
-from django.shortcuts import render
-from django.conf import settings
-import jwt
+from app1.auth import token_claims
+from app1.menus import menu_version, stored_menu_ids
 from rest_framework.response import Response
 from .models import AllowedMenu
 from rest_framework.decorators import api_view
@@ -23,26 +22,10 @@ from rest_framework import status
     # "settings-options"
 
 
-def decode_jwt_token(request):
-    """Decode JWT token from Authorization header"""
-    auth_header = request.META.get("HTTP_AUTHORIZATION")
-    
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return None
-    
-    token = auth_header.split(' ')[1]
-
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-        return payload
-    except Exception:
-        return None
-    
-
 @api_view(["POST"])
 def update_user_menu(request):
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Invalid or missing token'}, status=401)
         
@@ -82,7 +65,7 @@ def update_user_menu(request):
 @api_view(['GET'])
 def get_user_menus(request):
     try:
-        payload = decode_jwt_token(request)
+        payload, _ = token_claims(request)
         if not payload:
             return Response({'error': 'Invalid or missing token'}, status=401)
         
@@ -97,13 +80,12 @@ def get_user_menus(request):
         client_id = payload.get("client_id")
         username = request.GET.get("user_id")
 
-        records = AllowedMenu.objects.filter(
-            user_id=username,
-            client_id=client_id
-        ).first()
+        # Cached per tenant menu version; one version lookup on repeat calls
+        version = menu_version(client_id)
+        allowed = stored_menu_ids(username, client_id, version)
 
         # ✅ FIXED DEFAULT MENUS (ONLY CHANGE)
-        if not records:
+        if allowed is None:
             return Response({
                 "success": True,
                 "user": username,
@@ -111,13 +93,15 @@ def get_user_menus(request):
                     "settings",
                     "company",
                     "settings-options"
-                ]
+                ],
+                "menu_version": version
             }, status=200)
 
         return Response({
             "success": True,
             "user": username,
-            "allowedMenuIds": records.allowedMenuIds
+            "allowedMenuIds": allowed,
+            "menu_version": version
         }, status=200)
 
     except Exception as e:
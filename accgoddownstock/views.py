@@ -1,10 +1,7 @@
-from django.shortcuts import render
-
-# Create your views here.
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.conf import settings
 import jwt
+from app1.auth import authenticate
 
 from app1.models import AccGoddownStock, AccProduct, AccGoddown
 
@@ -20,10 +17,8 @@ def get_goddown_stock(request):
                 'error': 'Missing or invalid authorization header'
             }, status=401)
 
-        token = auth_header.split(' ')[1]
-
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = authenticate(request).claims
             client_id = payload.get('client_id')
 
             if not client_id:
@@ -0,0 +1,182 @@
+"""
+JWT authentication shared by every app.
+
+Tokens are issued by app1.views.login: HS256 with SECRET_KEY, claims
+user_id / username / client_id / role / accountcode / exp / iat.
+
+decode_token() verifies a token and keeps it in a small LRU of verified
+tokens (keyed by the whole token string, signature included), so the
+tokens of active devices skip the HMAC check and JSON parsing on later
+requests; exp is still checked on every call.
+
+authenticate(request) decodes the Bearer token of a request once and
+remembers the outcome on the request, so the DRF class, the middleware
+and token_claims() all share one decode. The principal is a TokenUser,
+set as request.user by:
+
+    JWTAuthentication          DRF authentication class (REST_FRAMEWORK)
+    JWTAuthenticationMiddleware  the same for plain Django views
+
+Neither rejects a request by itself: without a valid token request.user
+stays anonymous and each view answers 401 in its own format, as before.
+Views that report why a token was refused use token_claims(request).
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import jwt
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from rest_framework.authentication import BaseAuthentication
+
+
+TOKEN_CACHE_SIZE = 1024
+JWT_ALGORITHMS = ["HS256"]
+
+_verified_tokens = OrderedDict()  # token -> claims
+_verified_lock = threading.Lock()
+
+
+def decode_token(token):
+    """
+    Claims of a valid token. Raises jwt.ExpiredSignatureError or
+    jwt.InvalidTokenError like jwt.decode.
+    """
+    with _verified_lock:
+        claims = _verified_tokens.get(token)
+        if claims is not None:
+            _verified_tokens.move_to_end(token)
+
+    if claims is None:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=JWT_ALGORITHMS)
+        with _verified_lock:
+            _verified_tokens[token] = claims
+            if len(_verified_tokens) > TOKEN_CACHE_SIZE:
+                _verified_tokens.popitem(last=False)
+    elif "exp" in claims and claims["exp"] <= time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+
+    return dict(claims)
+
+
+def clear_token_cache():
+    """Forget every verified token (e.g. after changing SECRET_KEY)"""
+    with _verified_lock:
+        _verified_tokens.clear()
+
+
+@dataclass(frozen=True)
+class TokenUser:
+    """The tenant user a request was made by"""
+
+    client_id: str
+    username: str
+    user_id: str
+    role: str
+    accountcode: str
+    claims: dict = field(repr=False, compare=False)
+
+    is_authenticated = True
+    is_anonymous = False
+
+    @classmethod
+    def from_claims(cls, claims):
+        return cls(
+            client_id=claims.get("client_id"),
+            username=claims.get("username"),
+            user_id=claims.get("user_id"),
+            role=claims.get("role"),
+            accountcode=claims.get("accountcode"),
+            claims=claims,
+        )
+
+    @property
+    def is_admin(self):
+        return (self.role or "").lower() == "admin"
+
+
+def bearer_token(request):
+    """The token of an "Authorization: Bearer <token>" header, or None"""
+    auth_header = request.META.get("HTTP_AUTHORIZATION")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    return auth_header.split(" ", 1)[1]
+
+
+def authenticate(request):
+    """
+    TokenUser of the request's Bearer token, None without a Bearer
+    header. Raises jwt.ExpiredSignatureError / jwt.InvalidTokenError for
+    a bad token, an empty one ("Bearer ") included. Works with Django
+    and DRF requests; decodes once per request.
+    """
+    http_request = getattr(request, "_request", request)
+    outcome = getattr(http_request, "_token_auth", None)
+    if outcome is None:
+        token = bearer_token(http_request)
+        try:
+            if token is None:
+                outcome = (None, None)
+            elif not token.strip():
+                raise jwt.InvalidTokenError("Empty token")
+            else:
+                outcome = (TokenUser.from_claims(decode_token(token)), None)
+        except jwt.InvalidTokenError as e:
+            outcome = (None, e)
+        http_request._token_auth = outcome
+
+    user, error = outcome
+    if error is not None:
+        raise error
+    return user
+
+
+def token_claims(request):
+    """
+    (claims, None) for the request's valid Bearer token, else (None, reason)
+    with reason "Missing or invalid authorization header", "Token expired"
+    or "Invalid token" (a token without a client_id included).
+    """
+    try:
+        user = authenticate(request)
+    except jwt.ExpiredSignatureError:
+        return None, "Token expired"
+    except jwt.InvalidTokenError:
+        return None, "Invalid token"
+    if user is None:
+        return None, "Missing or invalid authorization header"
+    if not user.client_id:
+        return None, "Invalid token"
+    return user.claims, None
+
+
+def _token_user(request):
+    try:
+        return authenticate(request)
+    except jwt.InvalidTokenError:
+        return None
+
+
+class JWTAuthentication(BaseAuthentication):
+    """DRF: request.user is the TokenUser of a valid Bearer token"""
+
+    def authenticate(self, request):
+        user = _token_user(request)
+        return (user, user.claims) if user else None
+
+    def authenticate_header(self, request):
+        return "Bearer"
+
+
+class JWTAuthenticationMiddleware:
+    """Plain Django: request.user is the TokenUser of a valid Bearer token"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        previous = getattr(request, "user", None)
+        request.user = SimpleLazyObject(lambda: _token_user(request) or previous)
+        return self.get_response(request)
@@ -0,0 +1,173 @@
+"""
+Everything the app loads at launch, in one request.
+
+Each section is what one startup endpoint returns today:
+
+    misel       get-misel-data
+    settings    settings/options
+    branding    settings/logo + settings/bank-qr
+    areas       area/list
+    user_areas  get-user-area (for the logged-in user)
+    menus       the menus login returns
+    products    product/get-product-details
+
+The sections are small indexed reads, run in the request's own thread
+on its persistent connection - except the product catalog, the one
+heavy read, which is started first on a worker thread of the request
+and overlaps the others. Each section is returned with a version stamp.
+The app sends the stamps back (?settings=7&products=...) and gets
+{"version", "unchanged": true} instead of the data for sections that did
+not change. Every section but misel has a real version - settings and
+branding the settings_version, the others their data versions
+(app1.versions) - so an unchanged one is not even built; misel is
+stamped with a hash of its content, which saves the transfer but not
+the reads.
+"""
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from PunchIn.models import UserAreas
+from product_details_api.views import product_catalog
+from settings_options.bundle import get_settings_bundle, settings_version
+from settings_options.models import SettingsOptions
+from .models import AccMaster, Misel
+from .menus import allowed_menu_ids, menu_version
+from .versions import version_tag
+
+
+logger = logging.getLogger(__name__)
+
+
+
+def _settings_version(payload):
+    return str(settings_version(payload["client_id"]))
+
+
+def _misel(payload):
+    return list(Misel.objects.filter(client_id=payload["client_id"]).values())
+
+
+def _settings(payload):
+    client_id = payload["client_id"]
+    bundle, complete = get_settings_bundle(client_id, settings_version(client_id))
+    if not complete:
+        # Stamped with the version, the app would keep the gaps until the
+        # next settings change; an error makes it ask again
+        raise RuntimeError("settings bundle is incomplete")
+    return bundle
+
+
+def _branding(payload):
+    options, _ = SettingsOptions.objects.get_or_create(client_id=payload["client_id"])
+    return {
+        "logo_url": options.logo.url if options.logo else None,
+        "bank_qr_url": options.bank_qr.url if options.bank_qr else None,
+    }
+
+
+def _areas(payload):
+    return list(
+        AccMaster.objects
+        .filter(client_id=payload["client_id"])
+        .exclude(area__isnull=True)
+        .exclude(area__exact='')
+        .values_list('area', flat=True)
+        .distinct()
+    )
+
+
+def _user_areas(payload):
+    return list(
+        UserAreas.objects.filter(client_id=payload["client_id"], user=payload.get("username"))
+        .values_list('area_code', flat=True)
+    )
+
+
+def _menus_version(payload):
+    # The menus also depend on the role, which is fixed per token
+    return f"{payload.get('role')}-{menu_version(payload['client_id'])}"
+
+
+def _versions_of(*entities):
+    """Version function for a section built only from these entities"""
+    return lambda payload: version_tag(payload["client_id"], *entities)
+
+
+def _menus(payload):
+    return allowed_menu_ids(payload.get("username"), payload["client_id"], payload.get("role"))
+
+
+def _products(payload):
+    return product_catalog(payload["client_id"])
+
+
+# section -> (cheap version function or None, builder)
+SECTIONS = {
+    "misel": (None, _misel),
+    "settings": (_settings_version, _settings),
+    "branding": (_settings_version, _branding),
+    "areas": (_versions_of("acc_master"), _areas),
+    "user_areas": (_versions_of("areas"), _user_areas),
+    "menus": (_menus_version, _menus),
+    "products": (_versions_of("products", "stock", "settings"), _products),
+}
+
+# Sections worth a thread (and a database connection) of their own
+HEAVY_SECTIONS = {"products"}
+
+
+def content_version(data):
+    """Stamp of a section without a version of its own"""
+    raw = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _load_section(name, payload, known_version):
+    try:
+        version_function, build = SECTIONS[name]
+        version = version_function(payload) if version_function else None
+        if version is not None and version == known_version:
+            return {"version": version, "unchanged": True}
+
+        data = build(payload)
+        if version is None:
+            version = content_version(data)
+            if version == known_version:
+                return {"version": version, "unchanged": True}
+        return {"version": version, "data": data}
+    except Exception:
+        logger.exception("bootstrap section %s failed for %s", name, payload.get("client_id"))
+        return {"error": f"Failed to load {name}"}
+
+
+def _load_in_worker(name, payload, known_version):
+    try:
+        return _load_section(name, payload, known_version)
+    finally:
+        # The worker's connection ends with its thread
+        connections.close_all()
+
+
+def load_bootstrap(payload, names, known_versions):
+    """{section: {"version", "data" | "unchanged" | "error"}} for names"""
+    heavy = [name for name in names if name in HEAVY_SECTIONS]
+    if not heavy:
+        return {name: _load_section(name, payload, known_versions.get(name)) for name in names}
+
+    # A pool per request: one slow tenant never queues another's bootstrap
+    with ThreadPoolExecutor(max_workers=len(heavy), thread_name_prefix="bootstrap") as executor:
+        futures = {
+            name: executor.submit(_load_in_worker, name, payload, known_versions.get(name))
+            for name in heavy
+        }
+        sections = {
+            name: _load_section(name, payload, known_versions.get(name))
+            for name in names if name not in futures
+        }
+        sections.update((name, future.result()) for name, future in futures.items())
+    return {name: sections[name] for name in names}
@@ -0,0 +1,199 @@
+"""
+Change feed of mobile transactions for the ERP pull.
+
+Every new item order, sales, sales return and collection, and every
+status change of one, appends a row to change_feed (database triggers,
+see migration 0009). The feed id is the cursor: the ERP asks for the
+events after the last id it has, gets them as NDJSON together with the
+current document, and acknowledges the last id it stored. Reading costs
+O(new events) instead of re-listing every document.
+
+Stream format, one JSON object per line:
+    {"seq": 41, "entity": "item_order", "key": "ORD-...", "action": "created",
+     "status": "uploaded to server", "at": "...", "document": {...}}
+    ...
+    {"end": true, "last_seq": 41, "has_more": false}
+
+"document" is the row as it is now (null if it was deleted since).
+
+A consumer's acks belong to the user that first acknowledged for it;
+other users cannot read from or move its cursor.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+from .document_lists import documents_by_id
+from .models import ChangeFeedAck, Collection
+
+
+DEFAULT_FEED_LIMIT = 1000
+MAX_FEED_LIMIT = 5000
+FEED_CHUNK = 500
+DEFAULT_CONSUMER = "erp"
+
+COLLECTION_COLUMNS = [
+    'id', 'code', 'name', 'place', 'phone', 'amount', 'type', 'cheque_no',
+    'ref_no', 'remark', 'status', 'created_by', 'created_date', 'created_time',
+    'uploaded_username', 'uploaded_date', 'uploaded_time',
+]
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets clients send Accept: application/x-ndjson; errors render as one line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder) + "\n"
+
+
+def _document_loaders():
+    """entity -> function(ids) returning {id: document}"""
+    # The column lists belong to each app's views; imported here to keep
+    # the feed documents identical to what the list endpoints return.
+    from item_orders.views import ORDER_COLUMNS, ORDER_ITEM_COLUMNS
+    from sales.views import SALES_COLUMNS, SALES_ITEM_COLUMNS
+    from sales_return.views import RETURN_COLUMNS, RETURN_ITEM_COLUMNS
+    from .models import ItemOrderHeader, ItemOrders
+    from sales.models import Sales, SalesHeader
+    from sales_return.models import SalesReturn, SalesReturnHeader
+
+    def headers(header_model, line_model, header_columns, line_columns):
+        return lambda ids: documents_by_id(header_model, line_model, ids, header_columns, line_columns)
+
+    def collections(ids):
+        return {
+            row['id']: row
+            for row in Collection.objects.filter(id__in=ids).values(*COLLECTION_COLUMNS)
+        }
+
+    return {
+        'item_order': headers(ItemOrderHeader, ItemOrders, ORDER_COLUMNS + ["status"], ORDER_ITEM_COLUMNS),
+        'sales': headers(SalesHeader, Sales, SALES_COLUMNS + ["status"], SALES_ITEM_COLUMNS),
+        'sales_return': headers(SalesReturnHeader, SalesReturn, RETURN_COLUMNS, RETURN_ITEM_COLUMNS),
+        'collection': collections,
+    }
+
+
+class AckError(ValueError):
+    """The acknowledgement is refused (behind the stored ack or past the feed)"""
+
+
+class ConsumerNotOwned(Exception):
+    """The consumer's acks belong to another user"""
+
+
+def check_owner(client_id, consumer, username):
+    """Raise ConsumerNotOwned unless the consumer is unclaimed or the user's"""
+    owner = (
+        ChangeFeedAck.objects.filter(client_id=client_id, consumer=consumer)
+        .values_list('owner', flat=True).first()
+    )
+    if owner and owner != username:
+        raise ConsumerNotOwned(f"Consumer {consumer} belongs to another user")
+
+
+def acked_id(client_id, consumer):
+    """Last id the consumer acknowledged, 0 before its first ack"""
+    ack = ChangeFeedAck.objects.filter(client_id=client_id, consumer=consumer).first()
+    return ack.acked_id if ack else 0
+
+
+def acknowledge(client_id, consumer, last_id, username):
+    """
+    Record that the consumer has stored everything up to last_id; the
+    first ack claims the consumer for username. Returns the acknowledged
+    id. Raises ConsumerNotOwned for another user's consumer and AckError
+    for an id behind the stored ack or past the end of the tenant's feed.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM change_feed WHERE client_id = %s",
+                [client_id]
+            )
+            (latest,) = cursor.fetchone()
+        if last_id > latest:
+            raise AckError(f"seq {last_id} is past the end of the feed ({latest})")
+
+        ack, created = ChangeFeedAck.objects.select_for_update().get_or_create(
+            client_id=client_id, consumer=consumer,
+            defaults={'owner': username, 'acked_id': last_id, 'acked_at': timezone.now()}
+        )
+        if created:
+            return ack.acked_id
+        if ack.owner and ack.owner != username:
+            raise ConsumerNotOwned(f"Consumer {consumer} belongs to another user")
+        if last_id < ack.acked_id:
+            raise AckError(f"seq {last_id} is behind the acknowledged seq {ack.acked_id}")
+
+        ack.owner = username
+        ack.acked_id = last_id
+        ack.acked_at = timezone.now()
+        ack.save(update_fields=['owner', 'acked_id', 'acked_at'])
+        return ack.acked_id
+
+
+def _read_events(client_id, after_id, count):
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT id, entity, entity_id, entity_key, action, status, created_at
+            FROM change_feed
+            WHERE client_id = %s AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """, [client_id, after_id, count])
+        return cursor.fetchall()
+
+
+def stream_changes(client_id, after_id, limit):
+    """
+    Yield NDJSON lines for up to `limit` events after after_id, read and
+    joined to their documents FEED_CHUNK events at a time, then the end
+    line with the cursor to continue from.
+    """
+    loaders = _document_loaders()
+    last_id = after_id
+    remaining = limit
+
+    while remaining > 0:
+        requested = min(FEED_CHUNK, remaining)
+        events = _read_events(client_id, last_id, requested)
+        if not events:
+            break
+
+        wanted = {}
+        for _, entity, entity_id, *_ in events:
+            wanted.setdefault(entity, set()).add(entity_id)
+        documents = {
+            entity: loaders[entity](ids) for entity, ids in wanted.items()
+        }
+
+        for seq, entity, entity_id, entity_key, action, status, created_at in events:
+            yield json.dumps({
+                'seq': seq,
+                'entity': entity,
+                'key': entity_key,
+                'action': action,
+                'status': status,
+                'at': created_at,
+                'document': documents[entity].get(entity_id),
+            }, cls=DjangoJSONEncoder) + "\n"
+
+        last_id = events[-1][0]
+        remaining -= len(events)
+        if len(events) < requested:
+            break
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM change_feed WHERE client_id = %s AND id > %s)",
+            [client_id, last_id]
+        )
+        (has_more,) = cursor.fetchone()
+
+    yield json.dumps({'end': True, 'last_seq': last_id, 'has_more': has_more}) + "\n"
@@ -0,0 +1,159 @@
+"""
+Paginated document lists (item orders, sales, sales returns) built in SQL.
+
+One query returns a page of documents: the newest matching header ids are
+picked first (keyset on id, so page N costs the same as page 1), then each
+header is joined to its lines and the lines are folded into a JSON array
+with GROUP BY h.id / json_agg. Nothing is regrouped in Python.
+
+Query string filters shared by every list:
+    ?status=  ?start_date=YYYY-MM-DD  ?end_date=YYYY-MM-DD
+    ?username=  ?customer_code=  ?limit=  ?cursor=  ?with_total=1
+
+document_count() gives the number of documents matching the filters over
+every page (the lists' total_orders / total_sales / total). It costs a
+scan of every matching header, so it is only run on ?with_total=1 and is
+null otherwise.
+"""
+from django.db import connection
+
+from .documents import DOCUMENT_STATUSES
+from .pagination import decode_cursor, encode_cursor, get_page_size, parse_date_range
+
+
+# Line columns sent as decimal strings ("2.00"), the way JsonResponse sent
+# the ORM's Decimal before the lists were built in SQL; the other numeric
+# columns are JSON numbers
+DECIMAL_TEXT_COLUMNS = {"quantity"}
+
+
+def document_filters(request):
+    """Read the list filters from the query string; raises ValueError"""
+    start, end = parse_date_range(request)
+
+    status_value = request.GET.get('status') or None
+    if status_value and status_value not in DOCUMENT_STATUSES:
+        raise ValueError(f"Invalid status. Allowed: {DOCUMENT_STATUSES}")
+
+    before_id = None
+    cursor = request.GET.get('cursor')
+    if cursor:
+        (before_id,) = decode_cursor(cursor, 1)
+        if not isinstance(before_id, int):
+            raise ValueError("Invalid cursor")
+
+    return {
+        'status': status_value,
+        # created_date is a local date; [start, end) are local midnights
+        'start_day': start.date() if start else None,
+        'end_day': end.date() if end else None,
+        'username': request.GET.get('username') or None,
+        'customer_code': request.GET.get('customer_code') or None,
+        'before_id': before_id,
+        'limit': get_page_size(request),
+        'with_total': request.GET.get('with_total') in ('1', 'true'),
+    }
+
+
+def _filter_conditions(client_id, filters, keyset):
+    conditions = ["client_id = %s"]
+    params = [client_id]
+    filter_columns = [
+        ('status', 'status', '='),
+        ('username', 'username', '='),
+        ('customer_code', 'customer_code', '='),
+        ('created_date', 'start_day', '>='),
+        ('created_date', 'end_day', '<'),
+    ]
+    if keyset:
+        filter_columns.append(('id', 'before_id', '<'))
+    for column, key, operator in filter_columns:
+        if filters.get(key) is not None:
+            conditions.append(f"{column} {operator} %s")
+            params.append(filters[key])
+    return " AND ".join(conditions), params
+
+
+def document_page(header_model, line_model, client_id, filters, header_columns, line_columns):
+    """
+    One page of documents, newest first.
+
+    header_columns -- header columns returned as-is (created_date and
+                      created_time are always added, formatted)
+    line_columns   -- {key in each item: line column}
+
+    Returns (documents, next_cursor); each document is a dict of the header
+    columns plus "items", its lines newest first.
+    """
+    where, params = _filter_conditions(client_id, filters, keyset=True)
+    params.append(filters['limit'] + 1)
+
+    page_sql = f"""
+        SELECT id FROM {header_model._meta.db_table}
+        WHERE {where}
+        ORDER BY id DESC
+        LIMIT %s
+    """
+    rows = _fetch_documents(header_model, line_model, page_sql, params, header_columns, line_columns)
+
+    has_more = len(rows) > filters['limit']
+    rows = rows[:filters['limit']]
+    next_cursor = encode_cursor(rows[-1]['id']) if has_more else None
+
+    for row in rows:
+        del row['id']
+    return rows, next_cursor
+
+
+def document_count(header_model, client_id, filters):
+    """
+    Number of the tenant's documents matching filters, on every page; None
+    unless the list asked for it with ?with_total=1
+    """
+    if not filters.get('with_total'):
+        return None
+    where, params = _filter_conditions(client_id, filters, keyset=False)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {header_model._meta.db_table} WHERE {where}", params)
+        return cursor.fetchone()[0]
+
+
+def documents_by_id(header_model, line_model, ids, header_columns, line_columns):
+    """{header id: document} for the given ids, same shape as document_page"""
+    page_sql = "SELECT unnest(%s::bigint[]) AS id"
+    rows = _fetch_documents(header_model, line_model, page_sql, [list(ids)], header_columns, line_columns)
+    return {row.pop('id'): row for row in rows}
+
+
+def _fetch_documents(header_model, line_model, page_sql, params, header_columns, line_columns):
+    """Headers whose ids page_sql selects, each with its lines folded into "items" """
+    header_table = header_model._meta.db_table
+    line_table = line_model._meta.db_table
+    select_columns = ", ".join(f"h.{c}" for c in header_columns)
+    item_object = ", ".join(
+        f"'{key}', " + (f"l.{column}::text" if column in DECIMAL_TEXT_COLUMNS else f"l.{column}")
+        for key, column in line_columns.items()
+    )
+
+    sql_query = f"""
+    SELECT
+        h.id,
+        {select_columns},
+        to_char(h.created_date, 'YYYY-MM-DD') AS created_date,
+        to_char(h.created_time, 'HH24:MI:SS') AS created_time,
+        COALESCE(
+            json_agg(json_build_object({item_object}) ORDER BY l.id DESC)
+                FILTER (WHERE l.id IS NOT NULL),
+            '[]'::json
+        ) AS items
+    FROM ({page_sql}) page
+    JOIN {header_table} h ON h.id = page.id
+    LEFT JOIN {line_table} l ON l.header_id = h.id
+    GROUP BY h.id
+    ORDER BY h.id DESC
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, params)
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
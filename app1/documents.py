@@ -0,0 +1,188 @@
+"""
+Shared writer for line-item documents (item orders, sales, sales returns).
+
+Each document is a header row (document id, customer, area, username,
+status, ...) plus line rows pointing to it through a "header" foreign
+key. write_document() validates the header and every line before
+touching the database, then inserts the header and ALL lines (one
+bulk_create) inside a transaction, so a document is either stored
+completely or not at all. The daily rollups (app1.rollups) are updated
+in the same transaction.
+
+Submissions are idempotent when the app sends a request_uuid: the header
+is unique on (client_id, device_id, request_uuid), so a retry of the
+same request gets the stored document back instead of a duplicate, even
+when both attempts race each other.
+"""
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+
+from .rollups import add_document
+
+
+MAX_DOCUMENT_LINES = 1000
+
+
+class DocumentValidationError(Exception):
+    """One or more lines are invalid; nothing was written"""
+
+    def __init__(self, errors):
+        super().__init__("Invalid document lines")
+        self.errors = errors
+
+
+def new_document_id(prefix):
+    """Document number in the existing format, e.g. ORD-1A2B3C4D5E"""
+    return f"{prefix}-{uuid.uuid4().hex[:10].upper()}"
+
+
+def clean_value(field, value):
+    """
+    Convert and validate one value the way the column will store it:
+    NULL only where the column allows it, decimals parsed, max_length /
+    max_digits enforced. Empty strings stay allowed, as before.
+    """
+    if value is None:
+        if field.null:
+            return None
+        raise ValidationError("This field is required.")
+    value = field.to_python(value)
+    field.run_validators(value)
+    return value
+
+
+def _stored_document(header_model, header):
+    """(header_row, line_rows) already saved for this request_uuid, or None"""
+    header_row = header_model.objects.filter(
+        client_id=header.get('client_id'),
+        device_id=header.get('device_id'),
+        request_uuid=header['request_uuid'],
+    ).first()
+    if header_row is None:
+        return None
+    return header_row, list(header_row.lines.order_by('id'))
+
+
+def write_document(header_model, line_model, header, lines, line_fields, check=None):
+    """
+    Validate and insert a document, returning (header_row, line_rows, created).
+    created is False when header['request_uuid'] was already submitted;
+    the rows are then the ones stored by the first attempt.
+
+    header      -- {field: value} for the header row (document id included)
+    lines       -- list of dicts sent by the app, one per line
+    line_fields -- {line model field: key in the line dict}
+    check       -- optional callable(clean lines) returning more errors in
+                   the same format (e.g. app1.order_checks.OrderLineCheck);
+                   only called for new documents whose fields are valid
+
+    Every line also gets the header's client_id. Raises
+    DocumentValidationError with [{'line', 'field', 'error'}] when anything
+    fails; the database is not touched in that case.
+    """
+    request_uuid = header.get('request_uuid')
+    if request_uuid:
+        stored = _stored_document(header_model, header)
+        if stored is not None:
+            return (*stored, False)
+
+    header_fields = {f.name: f for f in header_model._meta.concrete_fields}
+    line_model_fields = {f.name: f for f in line_model._meta.concrete_fields}
+    errors = []
+
+    clean_header = {}
+    for name, value in header.items():
+        try:
+            clean_header[name] = clean_value(header_fields[name], value)
+        except ValidationError as e:
+            errors.append({'line': None, 'field': name, 'error': ' '.join(e.messages)})
+
+    if len(lines) > MAX_DOCUMENT_LINES:
+        errors.append({
+            'line': None,
+            'field': 'items',
+            'error': f'A document can have at most {MAX_DOCUMENT_LINES} lines'
+        })
+        raise DocumentValidationError(errors)
+
+    clean_lines = []
+    for index, line in enumerate(lines):
+        if not isinstance(line, dict):
+            errors.append({'line': index, 'field': None, 'error': 'Line must be an object'})
+            continue
+        values = {}
+        for name, key in line_fields.items():
+            try:
+                values[name] = clean_value(line_model_fields[name], line.get(key))
+            except ValidationError as e:
+                errors.append({'line': index, 'field': key, 'error': ' '.join(e.messages)})
+        clean_lines.append(values)
+
+    if not errors and check is not None:
+        errors = check(clean_lines)
+
+    if errors:
+        raise DocumentValidationError(errors)
+
+    try:
+        with transaction.atomic():
+            header_row = header_model.objects.create(**clean_header)
+            line_rows = line_model.objects.bulk_create([
+                line_model(header=header_row, client_id=header_row.client_id, **values)
+                for values in clean_lines
+            ])
+            add_document(header_model, header_row)
+    except IntegrityError:
+        # A concurrent retry of the same request committed first
+        stored = _stored_document(header_model, header) if request_uuid else None
+        if stored is None:
+            raise
+        return (*stored, False)
+    return header_row, line_rows, True
+
+
+# --------------------------------------------------
+# STATUS CHANGES
+# --------------------------------------------------
+DOCUMENT_STATUSES = ["uploaded to server", "completed"]
+MAX_BULK_DOCUMENTS = 500
+
+
+def parse_bulk_keys(data, key):
+    """
+    The document ids of a bulk request (data[key]), de-duplicated in
+    order. Raises ValueError for a missing, empty or oversized list.
+    """
+    keys = data.get(key)
+    if not isinstance(keys, list) or not keys:
+        raise ValueError(f"{key} must be a non-empty list")
+    if len(keys) > MAX_BULK_DOCUMENTS:
+        raise ValueError(f"At most {MAX_BULK_DOCUMENTS} {key} per request")
+    return list(dict.fromkeys(str(k) for k in keys))
+
+
+def set_document_status(header_model, line_model, key_column, client_id, keys, assignments):
+    """
+    Apply assignments ({column: value}) to the tenant's headers whose
+    key_column is in keys, with ONE UPDATE ... RETURNING.
+
+    Returns {document id: number of lines} for the documents that exist;
+    ids missing from the result were not found.
+    """
+    header_table = header_model._meta.db_table
+    line_table = line_model._meta.db_table
+    set_sql = ", ".join(f"{column} = %s" for column in assignments)
+
+    sql_query = f"""
+    UPDATE {header_table} h
+    SET {set_sql}
+    WHERE h.client_id = %s AND h.{key_column} = ANY(%s)
+    RETURNING h.{key_column},
+              (SELECT COUNT(*) FROM {line_table} l WHERE l.header_id = h.id)
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, [*assignments.values(), client_id, list(keys)])
+        return dict(cursor.fetchall())
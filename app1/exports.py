@@ -0,0 +1,19 @@
+"""
+Streaming CSV helpers for report exports.
+"""
+import csv
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back to csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    """Yield CSV lines (header first) for a StreamingHttpResponse"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[c] for c in columns])
@@ -0,0 +1,327 @@
+"""
+Ingestion of ERP master data (acc_master, acc_product, acc_productbatch,
+acc_goddownstock, acc_ledgers, acc_invmast) for one tenant.
+
+The ERP used to write these shared tables directly, and recovering from
+a bad load meant clearing the tenant (developer options) and loading
+everything again. Now it posts each table as a stream of NDJSON or CSV
+rows, and ingest_table():
+
+    1. COPYs the rows into a temporary staging table, which is private
+       to the request's session and never WAL-logged;
+    2. hashes every staged and live row of the tenant (md5 of the row
+       text) and compares the hashes, so only the rows that changed are
+       written:
+         - tables with a key (acc_master, acc_product: code) get an
+           UPDATE for changed rows, an INSERT for new codes and, in
+           "replace" mode, a DELETE for codes missing from the upload;
+         - the other tables have no key the ERP keeps stable, so their
+           rows are compared as a multiset (hash + occurrence): rows
+           that did not change keep their id (collection_ledger_match
+           refers to acc_ledgers ids), new ones are inserted and, in
+           "replace" mode, the rest are deleted;
+    3. leaves the rest to the table's triggers: every write bumps the
+       tenant's data version of the table (app1.versions), which the
+       caches built from it key on.
+
+The merge runs in one transaction holding a per-tenant, per-table
+advisory lock. It only takes row locks, so readers keep reading the old
+rows until the commit.
+"""
+import csv
+import io
+import json
+
+from django.db import DataError, IntegrityError, connection, transaction
+from psycopg2 import DataError as CopyDataError
+from psycopg2.errors import QueryCanceled
+
+from .models import AccGoddownStock, AccInvmast, AccLedgers, AccMaster, AccProduct, AccProductBatch
+
+
+INGEST_MODES = ("replace", "merge")
+INGEST_STATEMENT_TIMEOUT = "10min"  # the default 30 s is for requests that read
+STAGE_TABLE = "ingest_stage"
+COPY_NULL = r"\N"
+
+
+# table name -> (model, key columns or ())
+INGEST_TABLES = {
+    "acc_master": (AccMaster, ("code",)),
+    "acc_product": (AccProduct, ("code",)),
+    "acc_productbatch": (AccProductBatch, ()),
+    "acc_goddownstock": (AccGoddownStock, ()),
+    "acc_ledgers": (AccLedgers, ()),
+    "acc_invmast": (AccInvmast, ()),
+}
+
+
+class IngestError(ValueError):
+    """The upload cannot be ingested (bad table, columns or rows)"""
+
+
+def ingest_columns(model):
+    """The columns an upload may set: every column but client_id and an auto id"""
+    return [
+        field.column for field in model._meta.concrete_fields
+        if field.column != "client_id" and not field.auto_created and field.get_internal_type() != "AutoField"
+    ]
+
+
+# -------------------------------
+# UPLOAD FORMATS
+# -------------------------------
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_value(value):
+    if value is None:
+        return COPY_NULL
+    if value is True or value is False:
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).translate(_COPY_ESCAPES)
+
+
+class _LineReader(io.RawIOBase):
+    """Read-only file over an iterator of byte strings (for copy_expert)"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b""
+                return 0
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def _ndjson_copy_lines(stream, columns, state):
+    """COPY text lines for the NDJSON objects of stream"""
+    allowed = set(columns)
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise IngestError(f"line {number}: not valid JSON")
+        if not isinstance(row, dict):
+            raise IngestError(f"line {number}: expected a JSON object")
+        unknown = row.keys() - allowed
+        if unknown:
+            raise IngestError(f"line {number}: unknown columns {sorted(unknown)}")
+        state["rows"] += 1
+        yield ("\t".join(_copy_value(row.get(column)) for column in columns) + "\n").encode()
+
+
+def _copy_ndjson(cursor, stream, columns):
+    state = {"rows": 0, "error": None}
+
+    def lines():
+        try:
+            yield from _ndjson_copy_lines(stream, columns, state)
+        except IngestError as e:
+            state["error"] = e
+            raise
+
+    reader = io.BufferedReader(_LineReader(lines()), 1 << 16)
+    try:
+        cursor.copy_expert(f"COPY {STAGE_TABLE} ({', '.join(columns)}) FROM STDIN", reader)
+    except QueryCanceled:
+        # psycopg2 cancels the COPY when read() raises; report the cause
+        if state["error"] is not None:
+            raise state["error"]
+        raise
+    return state["rows"]
+
+
+def _copy_csv(cursor, stream, columns):
+    """CSV with a header row naming the columns; an empty unquoted field is NULL"""
+    header_line = stream.readline().decode("utf-8-sig").strip()
+    if not header_line:
+        return 0
+    header = [name.strip() for name in next(csv.reader([header_line]))]
+    unknown = set(header) - set(columns)
+    if unknown:
+        raise IngestError(f"unknown columns {sorted(unknown)}")
+    if len(set(header)) != len(header):
+        raise IngestError("duplicate columns in the header")
+    cursor.copy_expert(f"COPY {STAGE_TABLE} ({', '.join(header)}) FROM STDIN WITH (FORMAT csv)", stream)
+    return cursor.rowcount
+
+
+UPLOAD_FORMATS = {
+    "ndjson": _copy_ndjson,
+    "csv": _copy_csv,
+}
+
+
+# -------------------------------
+# MERGE
+# -------------------------------
+def _row_hash(alias, columns):
+    return f"md5(ROW({', '.join(f'{alias}.{c}' for c in columns)})::text)"
+
+
+def _merge_keyed(cursor, table, client_id, columns, key, replace):
+    """UPDATE changed rows, INSERT new keys, DELETE missing keys (replace)"""
+    key_list = ", ".join(key)
+    values = [c for c in columns if c not in key]
+    key_match = " AND ".join(f"t.{c} = s.{c}" for c in key)
+
+    # Last row of a key wins
+    cursor.execute(f"""
+        CREATE TEMP TABLE ingest_rows ON COMMIT DROP AS
+        SELECT DISTINCT ON ({key_list}) {", ".join(columns)}, {_row_hash("s", columns)} AS row_hash
+        FROM {STAGE_TABLE} s
+        WHERE {" AND ".join(f"s.{c} IS NOT NULL" for c in key)}
+        ORDER BY {key_list}, s.ingest_line DESC
+    """)
+    cursor.execute("ANALYZE ingest_rows")
+
+    counts = {"updated": 0, "inserted": 0, "deleted": 0}
+    if values:
+        cursor.execute(f"""
+            UPDATE {table} t
+            SET {", ".join(f"{c} = s.{c}" for c in values)}
+            FROM ingest_rows s
+            WHERE t.client_id = %s AND {key_match}
+              AND {_row_hash("t", columns)} <> s.row_hash
+        """, [client_id])
+        counts["updated"] = cursor.rowcount
+
+    cursor.execute(f"""
+        INSERT INTO {table} (client_id, {", ".join(columns)})
+        SELECT %s, {", ".join(f"s.{c}" for c in columns)}
+        FROM ingest_rows s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {table} t WHERE t.client_id = %s AND {key_match}
+        )
+    """, [client_id, client_id])
+    counts["inserted"] = cursor.rowcount
+
+    if replace:
+        cursor.execute(f"""
+            DELETE FROM {table} t
+            WHERE t.client_id = %s
+              AND NOT EXISTS (SELECT 1 FROM ingest_rows s WHERE {key_match})
+        """, [client_id])
+        counts["deleted"] = cursor.rowcount
+    return counts
+
+
+def _merge_rows(cursor, table, pk, client_id, columns, replace):
+    """Multiset diff on (row hash, occurrence): INSERT new rows, DELETE gone ones"""
+    cursor.execute(f"""
+        CREATE TEMP TABLE ingest_rows ON COMMIT DROP AS
+        SELECT h.*, row_number() OVER (PARTITION BY h.row_hash) AS occurrence
+        FROM (SELECT s.*, {_row_hash("s", columns)} AS row_hash FROM {STAGE_TABLE} s) h
+    """)
+    cursor.execute(f"""
+        CREATE TEMP TABLE ingest_live ON COMMIT DROP AS
+        SELECT h.{pk}, h.row_hash, row_number() OVER (PARTITION BY h.row_hash ORDER BY h.{pk}) AS occurrence
+        FROM (
+            SELECT t.{pk}, {_row_hash("t", columns)} AS row_hash FROM {table} t WHERE t.client_id = %s
+        ) h
+    """, [client_id])
+    cursor.execute("ANALYZE ingest_rows")
+    cursor.execute("ANALYZE ingest_live")
+
+    counts = {"updated": 0, "inserted": 0, "deleted": 0}
+    if replace:
+        cursor.execute(f"""
+            DELETE FROM {table} t
+            USING ingest_live l
+            WHERE t.{pk} = l.{pk}
+              AND NOT EXISTS (
+                  SELECT 1 FROM ingest_rows s
+                  WHERE s.row_hash = l.row_hash AND s.occurrence = l.occurrence
+              )
+        """)
+        counts["deleted"] = cursor.rowcount
+
+    cursor.execute(f"""
+        INSERT INTO {table} (client_id, {", ".join(columns)})
+        SELECT %s, {", ".join(f"s.{c}" for c in columns)}
+        FROM ingest_rows s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM ingest_live l
+            WHERE l.row_hash = s.row_hash AND l.occurrence = s.occurrence
+        )
+        ORDER BY s.ingest_line
+    """, [client_id])
+    counts["inserted"] = cursor.rowcount
+    return counts
+
+
+@transaction.atomic
+def ingest_table(client_id, table, stream, upload_format="ndjson", mode="replace", allow_empty=False):
+    """
+    Load the tenant's rows of table from stream (a binary file object)
+    and merge them into the live table. mode "replace" makes the table
+    equal to the upload, "merge" only adds and updates. An upload with no
+    rows would empty the table in "replace" mode, so it is rejected
+    unless allow_empty is set (a truncated export must not wipe the
+    tenant). Returns
+    {"received", "inserted", "updated", "deleted", "unchanged"}; raises
+    IngestError for a bad upload (nothing is written then).
+    """
+    if table not in INGEST_TABLES:
+        raise IngestError(f"unknown table {table}; allowed: {list(INGEST_TABLES)}")
+    if upload_format not in UPLOAD_FORMATS:
+        raise IngestError(f"unknown format {upload_format}; allowed: {list(UPLOAD_FORMATS)}")
+    if mode not in INGEST_MODES:
+        raise IngestError(f"unknown mode {mode}; allowed: {list(INGEST_MODES)}")
+
+    model, key = INGEST_TABLES[table]
+    columns = ingest_columns(model)
+
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL statement_timeout = %s", [INGEST_STATEMENT_TIMEOUT])
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(hashtext('ingest'), hashtext(%s))", [f"{client_id}:{table}"]
+        )
+        # ON COMMIT DROP only fires at the outermost commit; a second load
+        # in the same transaction finds the first one's work tables
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGE_TABLE}, ingest_rows, ingest_live")
+        # Same column types as the live table, so both sides hash alike
+        cursor.execute(f"""
+            CREATE TEMP TABLE {STAGE_TABLE} ON COMMIT DROP AS
+            SELECT {", ".join(columns)} FROM {table} WITH NO DATA
+        """)
+        cursor.execute(f"ALTER TABLE {STAGE_TABLE} ADD COLUMN ingest_line bigserial")
+
+        try:
+            received = UPLOAD_FORMATS[upload_format](cursor, stream, columns)
+        except (UnicodeDecodeError, csv.Error, CopyDataError) as e:
+            raise IngestError(f"unreadable upload: {e}")
+        if not received and mode == "replace" and not allow_empty:
+            raise IngestError(
+                f"the upload has no rows; replace mode would delete every {table} row of the tenant"
+                " (allow_empty=1 to do that)"
+            )
+
+        try:
+            if key:
+                counts = _merge_keyed(cursor, table, client_id, columns, key, mode == "replace")
+            else:
+                pk = model._meta.pk.column
+                counts = _merge_rows(cursor, table, pk, client_id, columns, mode == "replace")
+        except (DataError, IntegrityError) as e:
+            raise IngestError(f"rows rejected by {table}: {e}")
+
+    counts["received"] = received
+    counts["unchanged"] = max(received - counts["inserted"] - counts["updated"], 0)
+    return counts
@@ -0,0 +1,104 @@
+"""
+Benchmark document creation (item orders) per line count.
+
+    python manage.py bench_document_writer --iterations 50
+
+Compares the old per-line ItemOrders.objects.create() loop with the
+shared bulk writer for 10-, 50- and 200-line documents and reports
+documents per second. Both run in autocommit like the views do; the
+rows are written under client_id "__bench__" and deleted afterwards.
+"""
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from app1.documents import new_document_id, write_document
+from app1.models import (
+    CustomerItemHistory, DailyCustomerRollup, DailyItemRollup, DailyUserRollup,
+    ItemOrderHeader, ItemOrders,
+)
+from item_orders.views import ORDER_LINE_FIELDS
+
+
+BENCH_CLIENT = "__bench__"
+
+HEADER = {
+    "customer_name": "BENCH CUSTOMER",
+    "customer_code": "BENCH",
+    "area": "BENCH AREA",
+    "payment_type": "cash",
+    "client_id": BENCH_CLIENT,
+    "username": "bench",
+    "remark": None,
+    "device_id": "bench-device",
+}
+
+
+def make_lines(count):
+    return [
+        {
+            "product_name": f"Product {i}",
+            "item_code": f"ITEM{i:05d}",
+            "barcode": f"89000000{i:05d}",
+            "price": "12.50",
+            "quantity": "4",
+            "amount": "50.00",
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_create(lines):
+    """The pre bulk-writer loop: one INSERT per line, autocommit"""
+    header = ItemOrderHeader.objects.create(order_id=new_document_id("ORD"), **HEADER)
+    for item in lines:
+        ItemOrders.objects.create(
+            header=header,
+            client_id=header.client_id,
+            product_name=item["product_name"],
+            item_code=item["item_code"],
+            barcode=item["barcode"],
+            price=Decimal(item["price"]),
+            quantity=Decimal(item["quantity"]),
+            amount=Decimal(item["amount"]),
+        )
+
+
+def bulk_create(lines):
+    write_document(
+        ItemOrderHeader,
+        ItemOrders,
+        header={"order_id": new_document_id("ORD"), **HEADER},
+        lines=lines,
+        line_fields=ORDER_LINE_FIELDS,
+    )
+
+
+class Command(BaseCommand):
+    help = "Measure item orders created per second, per-line INSERTs vs bulk writer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--sizes', default='10,50,200')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        sizes = [int(size) for size in options['sizes'].split(',')]
+
+        for size in sizes:
+            lines = make_lines(size)
+            for label, func in (('per-line create', legacy_create), ('bulk writer', bulk_create)):
+                try:
+                    func(lines)  # warm up
+                    started = time.perf_counter()
+                    for _ in range(iterations):
+                        func(lines)
+                    elapsed = time.perf_counter() - started
+                finally:
+                    ItemOrderHeader.objects.filter(client_id=BENCH_CLIENT).delete()
+                    for rollup in (DailyUserRollup, DailyItemRollup, DailyCustomerRollup, CustomerItemHistory):
+                        rollup.objects.filter(client_id=BENCH_CLIENT).delete()
+                self.stdout.write(
+                    f"{size:>4} lines  {label:<16} {iterations / elapsed:>8.1f} orders/s"
+                )
@@ -0,0 +1,78 @@
+"""
+Benchmark token authentication per request.
+
+    python manage.py bench_token_auth --iterations 100000
+
+Compares what every view did before (jwt.decode on each request) with
+the verified-token cache of app1.auth, both for a bare decode and for a
+whole request going through authenticate() twice (the DRF class and the
+view's own helper), as a request does now.
+"""
+import time
+from datetime import datetime, timedelta
+
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from app1.auth import JWT_ALGORITHMS, authenticate, clear_token_cache, decode_token
+
+
+def make_token():
+    return jwt.encode({
+        "user_id": "bench",
+        "username": "bench",
+        "client_id": "__bench__",
+        "role": "Admin",
+        "accountcode": "BENCH",
+        "exp": datetime.utcnow() + timedelta(hours=1),
+        "iat": datetime.utcnow(),
+    }, settings.SECRET_KEY, algorithm="HS256")
+
+
+class Command(BaseCommand):
+    help = "Measure token decodes per second, jwt.decode vs the verified-token cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        token = make_token()
+        factory = RequestFactory()
+
+        def raw_decode():
+            jwt.decode(token, settings.SECRET_KEY, algorithms=JWT_ALGORITHMS)
+
+        def cached_decode():
+            decode_token(token)
+
+        def per_request():
+            request = factory.get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+            authenticate(request)
+            authenticate(request)
+
+        def per_request_legacy():
+            request = factory.get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+            for _ in range(2):
+                jwt.decode(
+                    request.META["HTTP_AUTHORIZATION"].split(" ")[1],
+                    settings.SECRET_KEY, algorithms=JWT_ALGORITHMS,
+                )
+
+        clear_token_cache()
+        for label, func in (
+            ('jwt.decode', raw_decode),
+            ('decode_token', cached_decode),
+            ('request, jwt.decode x2', per_request_legacy),
+            ('request, authenticate', per_request),
+        ):
+            func()  # warm up
+            started = time.perf_counter()
+            for _ in range(iterations):
+                func()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:<24} {iterations / elapsed:>10.0f}/s  {elapsed / iterations * 1e6:>7.2f} us"
+            )
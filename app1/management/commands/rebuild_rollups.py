@@ -0,0 +1,38 @@
+"""
+Recompute the daily order / sales / return rollups and the customer item
+history from the line tables.
+
+    python manage.py rebuild_rollups                 # every tenant
+    python manage.py rebuild_rollups --client-id SYSMAC
+
+Normally not needed: every document written through app1.documents
+updates the rollups. Use it after documents were changed or loaded
+outside the app, or to verify the incremental totals.
+"""
+from django.core.management.base import BaseCommand
+
+from app1.rollups import DOCUMENT_KINDS, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily rollups for one tenant or for all tenants"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client-id', help='Only rebuild this tenant')
+
+    def handle(self, *args, **options):
+        if options['client_id']:
+            client_ids = [options['client_id']]
+        else:
+            client_ids = set()
+            for header_model in DOCUMENT_KINDS:
+                client_ids.update(
+                    header_model.objects.values_list('client_id', flat=True).distinct()
+                )
+            client_ids = sorted(client_ids)
+
+        for client_id in client_ids:
+            rebuild_rollups(client_id)
+            self.stdout.write(f"{client_id}: rebuilt")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(client_ids)} tenant(s)"))
@@ -0,0 +1,42 @@
+"""
+Match completed collections to the acc_ledgers credits synced from the
+ERP (see app1.reconciliation).
+
+    python manage.py reconcile_collections                 # every tenant
+    python manage.py reconcile_collections --client-id SYSMAC
+
+Run it after each ERP sync; only rows not matched yet are looked at.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app1.models import Collection
+from app1.reconciliation import reconcile_collections
+
+
+class Command(BaseCommand):
+    help = "Reconcile completed collections with ledger credits"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client-id', help='Only reconcile this tenant')
+
+    def handle(self, *args, **options):
+        if options['client_id']:
+            client_ids = [options['client_id']]
+        else:
+            client_ids = sorted(
+                Collection.objects.filter(status='completed')
+                .values_list('client_id', flat=True).distinct()
+            )
+
+        for client_id in client_ids:
+            started = time.perf_counter()
+            summary = reconcile_collections(client_id)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{client_id}: {summary['matched']} of {summary['collections']} matched "
+                f"({summary['reference']} by reference) in {elapsed:.2f}s"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {len(client_ids)} tenant(s)"))
@@ -0,0 +1,159 @@
+"""
+Which menus a user sees in the app. Admins (acc_users role "level 3")
+get every menu; other users get their user_menus row, or just "company"
+when none was assigned.
+
+Logins come in bursts at shift start, so both lookups login makes are
+cached per tenant:
+
+    users   every acc_users row of the tenant, under its settings_version
+            (the ERP sync bumps it on each acc_users write, see
+            settings_options migration 0003), so a changed password or
+            role is seen on the next login. Only while those triggers
+            are installed and enabled: without them nothing would move
+            the version, so the users are then read on every login
+    menus   the user_menus rows, under the tenant's "menus" data version
+            (app1.versions; bumped on every user_menus save)
+
+The menu version also goes into the token (claim "menu_version"), so a
+device or the bootstrap endpoint can tell that its menus are still
+current without reading them again.
+"""
+import hashlib
+import hmac
+
+from django.core.cache import cache
+from django.db import connection
+
+from accesscontroll.models import AllowedMenu
+from settings_options.bundle import settings_version
+from .models import AccUser
+from .versions import get_version
+
+
+# add new menu's here:
+ADMIN_MENU_IDS = (
+    "item-details",
+    "bank-cash",
+    "cash-book",
+    "bank-book",
+    "debtors",
+    "company",
+    "punch-in",
+    "location-capture",
+    "punch-in-action",
+    "area-assign",
+    "master",
+    "user-menu",
+    "settings",
+    "users",
+    "master-debtors",
+    "area-table",
+    "master-suppliers",
+    "bills-receivable",
+    "reports",
+    "collection-report",
+    "reports"
+)
+
+DEFAULT_MENU_IDS = ("company",)
+
+MENU_CACHE_TIMEOUT = 24 * 60 * 60  # seconds; a new version switches to new keys anyway
+USER_CACHE_TIMEOUT = 24 * 60 * 60
+
+_NO_ROW = "-"  # cached for users without a user_menus row
+
+# The acc_users triggers that bump settings_version (settings_options 0003)
+USER_VERSION_TRIGGERS = ["acc_users_settings_insert", "acc_users_settings_update", "acc_users_settings_delete"]
+TRIGGER_CHECK_TIMEOUT = 60  # seconds a trigger check is trusted
+
+
+def menu_version(client_id):
+    """The tenant's menu version (one indexed lookup)"""
+    return get_version(client_id, "menus")
+
+
+def stored_menu_ids(user_id, client_id, version=None):
+    """
+    The user's user_menus row (allowedMenuIds), None without one. Pass
+    the menu version when it was already read.
+    """
+    if version is None:
+        version = menu_version(client_id)
+    key = f"menus:{client_id}:{version}:{user_id}"
+    allowed = cache.get(key)
+    if allowed is None:
+        allowed = AllowedMenu.objects.filter(
+            user_id=user_id, client_id=client_id
+        ).values_list('allowedMenuIds', flat=True).first()
+        cache.set(key, _NO_ROW if allowed is None else allowed, MENU_CACHE_TIMEOUT)
+    return None if allowed == _NO_ROW else allowed
+
+
+def allowed_menu_ids(user_id, client_id, role, version=None):
+    """Menu ids for the user; role is the token role ("Admin" / "User")"""
+    if role == "Admin":
+        return list(ADMIN_MENU_IDS)
+
+    # If no allowed menus found, default to ['company']
+    return stored_menu_ids(user_id, client_id, version) or list(DEFAULT_MENU_IDS)
+
+
+def _password_digest(password):
+    return hashlib.sha256(str(password).encode()).hexdigest()
+
+
+def user_version_triggers_installed():
+    """Whether every acc_users trigger bumping settings_version is enabled"""
+    installed = cache.get("acc_users_version_triggers")
+    if installed is None:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT COUNT(*) FROM pg_trigger
+                WHERE tgrelid = to_regclass('acc_users')
+                  AND tgname = ANY(%s)
+                  AND tgenabled <> 'D'
+            """, [USER_VERSION_TRIGGERS])
+            installed = cursor.fetchone()[0] == len(USER_VERSION_TRIGGERS)
+        cache.set("acc_users_version_triggers", installed, TRIGGER_CHECK_TIMEOUT)
+    return installed
+
+
+def _read_users(client_id):
+    return {
+        user_id: (None if password is None else _password_digest(password), role, accountcode)
+        for user_id, password, role, accountcode in AccUser.objects.filter(
+            client_id=client_id
+        ).values_list('id', 'password', 'role', 'accountcode')
+    }
+
+
+def tenant_users(client_id):
+    """
+    {user id: (password digest, role, accountcode)} of the tenant, cached
+    while the acc_users triggers keep the version current. Only a digest
+    of the password is kept in the cache.
+    """
+    if not user_version_triggers_installed():
+        return _read_users(client_id)
+
+    key = f"login_users:{client_id}:{settings_version(client_id)}"
+    users = cache.get(key)
+    if users is None:
+        users = _read_users(client_id)
+        cache.set(key, users, USER_CACHE_TIMEOUT)
+    return users
+
+
+def check_credentials(username, password, client_id):
+    """
+    AccUser for valid credentials, else None. Built from the cache, so
+    it carries no password and must not be saved.
+    """
+    record = tenant_users(client_id).get(username)
+    if record is None or record[0] is None:
+        return None
+    digest, role, accountcode = record
+    if not hmac.compare_digest(digest, _password_digest(password)):
+        return None
+    return AccUser(id=username, role=role, accountcode=accountcode, client_id=client_id)
@@ -0,0 +1,135 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+HEADER_COLUMNS = [
+    "order_id", "customer_name", "customer_code", "area", "payment_type",
+    "client_id", "username", "remark", "device_id", "status",
+    "status_changed_date", "status_changed_time", "status_changed_by",
+    "created_date", "created_time",
+]
+
+# One header per (client_id, order_id), taken from the document's first line
+BACKFILL_HEADERS = f"""
+INSERT INTO item_order_headers ({", ".join(HEADER_COLUMNS)})
+SELECT DISTINCT ON (client_id, order_id) {", ".join(HEADER_COLUMNS)}
+FROM item_orders
+ORDER BY client_id, order_id, id;
+
+UPDATE item_orders l
+SET header_id = h.id
+FROM item_order_headers h
+WHERE h.client_id = l.client_id AND h.order_id = l.order_id;
+
+SET CONSTRAINTS ALL IMMEDIATE;
+"""
+
+# Header columns dropped from the lines: (name, type, nullable)
+LINE_COLUMNS = [
+    ("order_id", "varchar(50)", False),
+    ("customer_name", "varchar(200)", False),
+    ("customer_code", "varchar(100)", False),
+    ("area", "varchar(200)", False),
+    ("payment_type", "varchar(50)", False),
+    ("username", "varchar(100)", False),
+    ("remark", "text", True),
+    ("device_id", "varchar(100)", False),
+    ("status", "varchar(30)", False),
+    ("status_changed_date", "date", True),
+    ("status_changed_time", "time", True),
+    ("status_changed_by", "varchar(100)", True),
+    ("created_date", "date", False),
+    ("created_time", "time", False),
+]
+
+DROP_LINE_COLUMNS = "ALTER TABLE item_orders " + ", ".join(
+    f"DROP COLUMN {name}" for name, _, _ in LINE_COLUMNS
+)
+
+# Reverse: re-added as NULL, filled by RESTORE_LINE_COLUMNS, then tightened
+ADD_LINE_COLUMNS = "ALTER TABLE item_orders " + ", ".join(
+    f"ADD COLUMN {name} {sql_type} NULL" for name, sql_type, _ in LINE_COLUMNS
+)
+
+# Reverse: copy the header fields back onto every line
+RESTORE_LINE_COLUMNS = f"""
+UPDATE item_orders l
+SET {", ".join(f"{c} = h.{c}" for c in HEADER_COLUMNS)}
+FROM item_order_headers h
+WHERE h.id = l.header_id;
+
+SET CONSTRAINTS ALL IMMEDIATE;
+""" + "ALTER TABLE item_orders " + ", ".join(
+    f"ALTER COLUMN {name} SET NOT NULL" for name, _, nullable in LINE_COLUMNS if not nullable
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0005_itemorders_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemOrderHeader',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(editable=False, max_length=50)),
+                ('customer_name', models.CharField(max_length=200)),
+                ('customer_code', models.CharField(max_length=100)),
+                ('area', models.CharField(max_length=200)),
+                ('payment_type', models.CharField(max_length=50)),
+                ('client_id', models.CharField(max_length=100)),
+                ('username', models.CharField(max_length=100)),
+                ('remark', models.TextField(blank=True, null=True)),
+                ('device_id', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('uploaded to server', 'Uploaded to Server'), ('completed', 'Completed')], default='uploaded to server', max_length=30)),
+                ('status_changed_date', models.DateField(blank=True, null=True)),
+                ('status_changed_time', models.TimeField(blank=True, null=True)),
+                ('status_changed_by', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_date', models.DateField(auto_now_add=True)),
+                ('created_time', models.TimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'item_order_headers',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['client_id', '-id'], name='idx_item_order_hdr_client')],
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'order_id'), name='uniq_item_order_header')],
+            },
+        ),
+        migrations.AddField(
+            model_name='itemorders',
+            name='header',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='app1.itemorderheader'),
+        ),
+        migrations.RunSQL(BACKFILL_HEADERS, RESTORE_LINE_COLUMNS),
+        migrations.AlterField(
+            model_name='itemorders',
+            name='header',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='app1.itemorderheader'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(DROP_LINE_COLUMNS, ADD_LINE_COLUMNS),
+            ],
+            state_operations=[
+                migrations.RemoveField(model_name='itemorders', name='order_id'),
+                migrations.RemoveField(model_name='itemorders', name='customer_name'),
+                migrations.RemoveField(model_name='itemorders', name='customer_code'),
+                migrations.RemoveField(model_name='itemorders', name='area'),
+                migrations.RemoveField(model_name='itemorders', name='payment_type'),
+                migrations.RemoveField(model_name='itemorders', name='username'),
+                migrations.RemoveField(model_name='itemorders', name='remark'),
+                migrations.RemoveField(model_name='itemorders', name='device_id'),
+                migrations.RemoveField(model_name='itemorders', name='status'),
+                migrations.RemoveField(model_name='itemorders', name='status_changed_date'),
+                migrations.RemoveField(model_name='itemorders', name='status_changed_time'),
+                migrations.RemoveField(model_name='itemorders', name='status_changed_by'),
+                migrations.RemoveField(model_name='itemorders', name='created_date'),
+                migrations.RemoveField(model_name='itemorders', name='created_time'),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0006_item_order_headers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemorderheader',
+            name='request_uuid',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='itemorderheader',
+            constraint=models.UniqueConstraint(condition=models.Q(('request_uuid__isnull', False)), fields=('client_id', 'device_id', 'request_uuid'), name='uniq_item_order_request'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0007_itemorderheader_request_uuid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itemorderheader',
+            index=models.Index(condition=models.Q(('status', 'uploaded to server')), fields=['client_id', '-id'], name='idx_item_order_hdr_pending'),
+        ),
+    ]
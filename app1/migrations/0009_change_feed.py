@@ -0,0 +1,132 @@
+# Generated by Django 5.0.2 on 2026-10-19 13:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# entity -> (table, document key column)
+FEED_TABLES = {
+    "item_order": ("item_order_headers", "order_id"),
+    "sales": ("sales_headers", "sales_id"),
+    "sales_return": ("sales_return_headers", "order_id"),
+    "collection": ("collection", "id"),
+}
+
+# Statement-level, so a bulk status change costs one trigger call. The
+# per-tenant advisory lock is taken before the feed ids are drawn and held
+# until commit: a later transaction of the same tenant cannot get a lower
+# id that becomes visible after a reader has already moved past it.
+RECORD_CHANGE_FUNCTION = """
+CREATE OR REPLACE FUNCTION record_change_event() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_advisory_xact_lock(hashtext('change_feed'), hashtext(t.client_id))
+        FROM (SELECT DISTINCT client_id FROM new_rows ORDER BY client_id) t;
+
+        EXECUTE format(
+            'INSERT INTO change_feed (client_id, entity, entity_id, entity_key, action, status, created_at) '
+            'SELECT n.client_id, %L, n.id, n.%I::text, ''created'', n.status, now() '
+            'FROM new_rows n ORDER BY n.id',
+            TG_ARGV[0], TG_ARGV[1]);
+    ELSE
+        PERFORM pg_advisory_xact_lock(hashtext('change_feed'), hashtext(t.client_id))
+        FROM (
+            SELECT DISTINCT n.client_id FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.status IS DISTINCT FROM o.status ORDER BY n.client_id
+        ) t;
+
+        EXECUTE format(
+            'INSERT INTO change_feed (client_id, entity, entity_id, entity_key, action, status, created_at) '
+            'SELECT n.client_id, %L, n.id, n.%I::text, ''status'', n.status, now() '
+            'FROM new_rows n JOIN old_rows o ON o.id = n.id '
+            'WHERE n.status IS DISTINCT FROM o.status ORDER BY n.id',
+            TG_ARGV[0], TG_ARGV[1]);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+CREATE_TRIGGERS = "\n".join(
+    f"""
+CREATE TRIGGER {table}_feed_insert
+    AFTER INSERT ON {table}
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_change_event('{entity}', '{key}');
+
+CREATE TRIGGER {table}_feed_status
+    AFTER UPDATE ON {table}
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_change_event('{entity}', '{key}');
+"""
+    for entity, (table, key) in FEED_TABLES.items()
+)
+
+DROP_TRIGGERS = "\n".join(
+    f"""
+DROP TRIGGER IF EXISTS {table}_feed_insert ON {table};
+DROP TRIGGER IF EXISTS {table}_feed_status ON {table};
+"""
+    for table, _ in FEED_TABLES.values()
+) + "DROP FUNCTION IF EXISTS record_change_event();"
+
+# Documents stored before the feed existed, as "created" events in the
+# order they were made, so an ERP starting from 0 gets everything.
+BACKFILL_EVENTS = f"""
+INSERT INTO change_feed (client_id, entity, entity_id, entity_key, action, status, created_at)
+SELECT client_id, entity, id, entity_key, 'created', status, created_at
+FROM (
+    {" UNION ALL ".join(
+        f"SELECT client_id, '{entity}' AS entity, id, {key}::text AS entity_key, status, "
+        f"(created_date + created_time) AT TIME ZONE '{settings.TIME_ZONE}' AS created_at FROM {table}"
+        for entity, (table, key) in FEED_TABLES.items()
+    )}
+) existing
+ORDER BY created_at, entity, id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0008_itemorderheader_pending_index'),
+        ('sales', '0004_salesheader_pending_index'),
+        ('sales_return', '0004_salesreturnheader_pending_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=100)),
+                ('entity', models.CharField(choices=[('item_order', 'Item Order'), ('sales', 'Sales'), ('sales_return', 'Sales Return'), ('collection', 'Collection')], max_length=20)),
+                ('entity_id', models.BigIntegerField()),
+                ('entity_key', models.CharField(max_length=50)),
+                ('action', models.CharField(max_length=20)),
+                ('status', models.CharField(blank=True, max_length=30, null=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'change_feed',
+                'indexes': [models.Index(fields=['client_id', 'id'], name='idx_change_feed_client')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeFeedAck',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=100)),
+                ('consumer', models.CharField(max_length=50)),
+                ('acked_id', models.BigIntegerField(default=0)),
+                ('acked_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'change_feed_ack',
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'consumer'), name='uniq_change_feed_ack')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_EVENTS, migrations.RunSQL.noop),
+        migrations.RunSQL(RECORD_CHANGE_FUNCTION, "DROP FUNCTION IF EXISTS record_change_event();"),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.0.2 on 2026-10-19 13:30
+
+from django.db import migrations, models
+
+
+# (header table, line table, measure prefix)
+DOCUMENT_TABLES = [
+    ("item_order_headers", "item_orders", "order"),
+    ("sales_headers", "sales", "sales"),
+    ("sales_return_headers", "sales_return", "return"),
+]
+
+# (rollup table, dimension column, source expression)
+ROLLUP_TABLES = [
+    ("rollup_daily_user", "username", "h.username"),
+    ("rollup_daily_item", "item_code", "l.item_code"),
+    ("rollup_daily_customer", "customer_code", "h.customer_code"),
+]
+
+MEASURE_COLUMNS = [
+    f"{prefix}_{measure}"
+    for prefix in ("order", "sales", "return")
+    for measure in ("docs", "lines", "qty", "amount")
+]
+
+
+def _backfill_sql(header_table, line_table, prefix, table, column, source):
+    values = {
+        f"{prefix}_docs": "COUNT(DISTINCT h.id)",
+        f"{prefix}_lines": "COUNT(*)",
+        f"{prefix}_qty": "SUM(l.quantity)",
+        f"{prefix}_amount": "SUM(l.amount)",
+    }
+    return f"""
+INSERT INTO {table} (client_id, day, {column}, {", ".join(MEASURE_COLUMNS)})
+SELECT h.client_id, h.created_date, {source}, {", ".join(values.get(c, "0") for c in MEASURE_COLUMNS)}
+FROM {header_table} h
+JOIN {line_table} l ON l.header_id = h.id
+GROUP BY 1, 2, 3
+ON CONFLICT (client_id, day, {column}) DO UPDATE SET
+    {", ".join(f"{c} = {table}.{c} + EXCLUDED.{c}" for c in values)};
+"""
+
+
+# Totals of the documents stored before the rollups existed
+BACKFILL_ROLLUPS = "".join(
+    _backfill_sql(*document, *rollup)
+    for document in DOCUMENT_TABLES
+    for rollup in ROLLUP_TABLES
+)
+
+
+def _rollup_fields(dimension_field):
+    return [
+        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+        ('client_id', models.CharField(max_length=100)),
+        ('day', models.DateField()),
+        ('order_docs', models.IntegerField(default=0)),
+        ('order_lines', models.IntegerField(default=0)),
+        ('order_qty', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+        ('order_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+        ('sales_docs', models.IntegerField(default=0)),
+        ('sales_lines', models.IntegerField(default=0)),
+        ('sales_qty', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+        ('sales_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+        ('return_docs', models.IntegerField(default=0)),
+        ('return_lines', models.IntegerField(default=0)),
+        ('return_qty', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+        ('return_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+        (dimension_field, models.CharField(max_length=100)),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0009_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCustomerRollup',
+            fields=_rollup_fields('customer_code'),
+            options={
+                'db_table': 'rollup_daily_customer',
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'day', 'customer_code'), name='uniq_rollup_daily_customer')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyItemRollup',
+            fields=_rollup_fields('item_code'),
+            options={
+                'db_table': 'rollup_daily_item',
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'day', 'item_code'), name='uniq_rollup_daily_item')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyUserRollup',
+            fields=_rollup_fields('username'),
+            options={
+                'db_table': 'rollup_daily_user',
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'day', 'username'), name='uniq_rollup_daily_user')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_ROLLUPS, migrations.RunSQL.noop),
+    ]
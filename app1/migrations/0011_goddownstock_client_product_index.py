@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-19 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0010_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accgoddownstock',
+            index=models.Index(fields=['client_id', 'product'], name='idx_goddownstock_client_prod'),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.0.2 on 2026-10-19 13:50
+
+from django.db import migrations, models
+
+
+PENDING = "'uploaded to server'"
+
+# Quantities are added for lines of pending orders and taken back when an
+# order leaves (or re-enters) the pending status or its lines are deleted.
+DEMAND_TRIGGERS = f"""
+CREATE OR REPLACE FUNCTION add_pending_demand_lines() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO pending_item_demand (client_id, item_code, quantity)
+        SELECT h.client_id, l.item_code, SUM(l.quantity)
+        FROM new_rows l
+        JOIN item_order_headers h ON h.id = l.header_id
+        WHERE h.status = {PENDING}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (client_id, item_code) DO UPDATE
+        SET quantity = pending_item_demand.quantity + EXCLUDED.quantity;
+    ELSE
+        INSERT INTO pending_item_demand (client_id, item_code, quantity)
+        SELECT h.client_id, l.item_code, -SUM(l.quantity)
+        FROM old_rows l
+        JOIN item_order_headers h ON h.id = l.header_id
+        WHERE h.status = {PENDING}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (client_id, item_code) DO UPDATE
+        SET quantity = pending_item_demand.quantity + EXCLUDED.quantity;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION move_pending_demand() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO pending_item_demand (client_id, item_code, quantity)
+    SELECT n.client_id, l.item_code,
+           SUM(CASE WHEN n.status = {PENDING} THEN l.quantity ELSE -l.quantity END)
+    FROM new_rows n
+    JOIN old_rows o ON o.id = n.id
+    JOIN item_orders l ON l.header_id = n.id
+    WHERE (n.status = {PENDING}) IS DISTINCT FROM (o.status = {PENDING})
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT (client_id, item_code) DO UPDATE
+    SET quantity = pending_item_demand.quantity + EXCLUDED.quantity;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER item_orders_demand_insert
+    AFTER INSERT ON item_orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION add_pending_demand_lines();
+
+CREATE TRIGGER item_orders_demand_delete
+    AFTER DELETE ON item_orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION add_pending_demand_lines();
+
+CREATE TRIGGER item_order_headers_demand_status
+    AFTER UPDATE ON item_order_headers
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION move_pending_demand();
+"""
+
+DROP_DEMAND_TRIGGERS = """
+DROP TRIGGER IF EXISTS item_orders_demand_insert ON item_orders;
+DROP TRIGGER IF EXISTS item_orders_demand_delete ON item_orders;
+DROP TRIGGER IF EXISTS item_order_headers_demand_status ON item_order_headers;
+DROP FUNCTION IF EXISTS add_pending_demand_lines();
+DROP FUNCTION IF EXISTS move_pending_demand();
+"""
+
+BACKFILL_DEMAND = f"""
+INSERT INTO pending_item_demand (client_id, item_code, quantity)
+SELECT h.client_id, l.item_code, SUM(l.quantity)
+FROM item_order_headers h
+JOIN item_orders l ON l.header_id = h.id
+WHERE h.status = {PENDING}
+GROUP BY 1, 2;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0011_goddownstock_client_product_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingItemDemand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=100)),
+                ('item_code', models.CharField(max_length=100)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+            options={
+                'db_table': 'pending_item_demand',
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'item_code'), name='uniq_pending_item_demand')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_DEMAND, migrations.RunSQL.noop),
+        migrations.RunSQL(DEMAND_TRIGGERS, DROP_DEMAND_TRIGGERS),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:10
+
+from django.db import migrations, models
+
+
+# Item orders and sales count as a customer buying an item
+DOCUMENT_TABLES = [
+    ("item_order_headers", "item_orders"),
+    ("sales_headers", "sales"),
+]
+
+LATEST = "ORDER BY created_date DESC, created_time DESC, document_id DESC"
+
+# What each customer bought before the history existed
+BACKFILL_HISTORY = f"""
+INSERT INTO rollup_customer_items (
+    client_id, customer_code, item_code, product_name,
+    documents, total_qty, last_qty, last_price, last_date
+)
+SELECT client_id, customer_code, item_code,
+       (array_agg(product_name {LATEST}))[1],
+       COUNT(*), SUM(qty),
+       (array_agg(qty {LATEST}))[1],
+       (array_agg(price {LATEST}))[1],
+       MAX(created_date)
+FROM (
+    {" UNION ALL ".join(
+        f'''SELECT h.client_id, h.customer_code, l.item_code, h.id AS document_id,
+               h.created_date, h.created_time,
+               (array_agg(l.product_name ORDER BY l.id DESC))[1] AS product_name,
+               SUM(l.quantity) AS qty,
+               (array_agg(l.price ORDER BY l.id DESC))[1] AS price
+        FROM {header_table} h
+        JOIN {line_table} l ON l.header_id = h.id
+        GROUP BY h.id, l.item_code'''
+        for header_table, line_table in DOCUMENT_TABLES
+    )}
+) per_document
+GROUP BY 1, 2, 3;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0012_pending_item_demand'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerItemHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=100)),
+                ('customer_code', models.CharField(max_length=100)),
+                ('item_code', models.CharField(max_length=100)),
+                ('product_name', models.CharField(max_length=200)),
+                ('documents', models.IntegerField(default=0)),
+                ('total_qty', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('last_qty', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('last_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_date', models.DateField()),
+            ],
+            options={
+                'db_table': 'rollup_customer_items',
+                'indexes': [models.Index(fields=['client_id', 'customer_code', '-documents', '-last_date'], name='idx_rollup_customer_top')],
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'customer_code', 'item_code'), name='uniq_rollup_customer_item')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_HISTORY, migrations.RunSQL.noop),
+    ]
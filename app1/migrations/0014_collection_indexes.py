@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0013_customer_item_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='collection',
+            index=models.Index(fields=['client_id', '-id'], name='idx_collection_client'),
+        ),
+        migrations.AddIndex(
+            model_name='collection',
+            index=models.Index(condition=models.Q(('status', 'uploaded to server')), fields=['client_id', '-id'], name='idx_collection_pending'),
+        ),
+        migrations.AddIndex(
+            model_name='collection',
+            index=models.Index(condition=models.Q(('status', 'uploaded to server')), fields=['client_id', 'created_date', 'created_by', 'type'], include=('amount',), name='idx_collection_pending_day'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0014_collection_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='client_uuid',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='collection',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_uuid__isnull', False)), fields=('client_id', 'client_uuid'), name='uniq_collection_client_uuid'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0015_collection_client_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionLedgerMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=100)),
+                ('ledger_id', models.IntegerField()),
+                ('ledger_date', models.DateField(null=True)),
+                ('rule', models.CharField(choices=[('reference', 'Cheque / reference number'), ('amount_date', 'Amount and date')], max_length=20)),
+                ('day_gap', models.IntegerField()),
+                ('matched_at', models.DateTimeField(auto_now_add=True)),
+                ('collection', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_match', to='app1.collection')),
+            ],
+            options={
+                'db_table': 'collection_ledger_match',
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'ledger_id'), name='uniq_collection_match_ledger')],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.0.2 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+# ERP-synced table -> data version entity it belongs to
+VERSIONED_TABLES = {
+    "acc_master": "acc_master",
+    "acc_product": "products",
+    "acc_productbatch": "products",
+    "acc_productphoto": "products",
+    "acc_departments": "products",
+    "acc_goddown": "stock",
+    "acc_goddownstock": "stock",
+    "acc_ledgers": "ledgers",
+    "acc_invmast": "invoices",
+}
+
+BUMP_FUNCTION = """
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_versions (client_id, entity, version, updated_at)
+    SELECT DISTINCT client_id, TG_ARGV[0], 1, now()
+    FROM changed_rows
+    WHERE client_id IS NOT NULL
+    ORDER BY 1
+    ON CONFLICT (client_id, entity)
+    DO UPDATE SET version = data_versions.version + 1, updated_at = now();
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# Statement-level, one trigger per event (transition tables need that).
+# The tables are created by the ERP sync, so they may not exist yet.
+CREATE_TRIGGERS = "\n".join(
+    f"""
+DO $$
+BEGIN
+    IF to_regclass('{table}') IS NOT NULL THEN
+        CREATE TRIGGER {table}_version_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('{entity}');
+        CREATE TRIGGER {table}_version_update AFTER UPDATE ON {table}
+            REFERENCING NEW TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('{entity}');
+        CREATE TRIGGER {table}_version_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('{entity}');
+    END IF;
+END
+$$;
+"""
+    for table, entity in VERSIONED_TABLES.items()
+)
+
+DROP_TRIGGERS = "\n".join(
+    f"""
+DO $$
+BEGIN
+    IF to_regclass('{table}') IS NOT NULL THEN
+        DROP TRIGGER IF EXISTS {table}_version_insert ON {table};
+        DROP TRIGGER IF EXISTS {table}_version_update ON {table};
+        DROP TRIGGER IF EXISTS {table}_version_delete ON {table};
+    END IF;
+END
+$$;
+"""
+    for table in VERSIONED_TABLES
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0016_collection_ledger_match'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=100)),
+                ('entity', models.CharField(max_length=30)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'data_versions',
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'entity'), name='uniq_data_version')],
+            },
+        ),
+        migrations.RunSQL(BUMP_FUNCTION, "DROP FUNCTION IF EXISTS bump_data_version();"),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0017_data_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changefeedack',
+            name='owner',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0018_changefeedack_owner'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='itemorders',
+            name='quantity',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+    ]
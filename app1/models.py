@@ -314,6 +314,10 @@ class AccGoddownStock(models.Model):
     class Meta:
         db_table = 'acc_goddownstock'
         managed = True
+        indexes = [
+            # stock lookups by item (dispatch consolidation)
+            models.Index(fields=['client_id', 'product'], name='idx_goddownstock_client_prod'),
+        ]
 
 
 class AccDepartments(models.Model):
@@ -367,9 +371,34 @@ class Collection(models.Model):
         default='uploaded to server'
     )
 
+    # ✅ Set by the app for offline receipts, so a replayed batch is not stored twice
+    client_uuid = models.CharField(max_length=64, blank=True, null=True)
+
     class Meta:
         db_table = 'collection'
         managed = True
+        constraints = [
+            models.UniqueConstraint(
+                fields=["client_id", "client_uuid"],
+                condition=models.Q(client_uuid__isnull=False),
+                name="uniq_collection_client_uuid",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["client_id", "-id"], name="idx_collection_client"),
+            # The back office lists and totals pending collections all day
+            models.Index(
+                fields=["client_id", "-id"],
+                condition=models.Q(status="uploaded to server"),
+                name="idx_collection_pending",
+            ),
+            models.Index(
+                fields=["client_id", "created_date", "created_by", "type"],
+                include=["amount"],
+                condition=models.Q(status="uploaded to server"),
+                name="idx_collection_pending_day",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.code} - {self.name}"
@@ -377,7 +406,7 @@ class Collection(models.Model):
 from django.db import models
 import uuid
 
-class ItemOrders(models.Model):
+class ItemOrderHeader(models.Model):
 
     STATUS_CHOICES = [
         ('uploaded to server', 'Uploaded to Server'),
@@ -390,23 +419,15 @@ class ItemOrders(models.Model):
     customer_code = models.CharField(max_length=100)
     area = models.CharField(max_length=200)
 
-    product_name = models.CharField(max_length=200)
-    item_code = models.CharField(max_length=100)
-    barcode = models.CharField(max_length=100)
-
     payment_type = models.CharField(max_length=50)
-    price = models.DecimalField(max_digits=10, decimal_places=2)
-    quantity = models.DecimalField(
-        max_digits=10,
-        decimal_places=2
-    )
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
 
     client_id = models.CharField(max_length=100)
     username = models.CharField(max_length=100)
     remark = models.TextField(blank=True, null=True)
 
     device_id = models.CharField(max_length=100)
+    # ✅ Sent by the app; a retry with the same uuid returns the stored document
+    request_uuid = models.CharField(max_length=64, blank=True, null=True)
 
     # ✅ SAME AS COLLECTION
     status = models.CharField(
@@ -428,11 +449,250 @@ class ItemOrders(models.Model):
             self.order_id = f"ORD-{uuid.uuid4().hex[:10].upper()}"
         super().save(*args, **kwargs)
 
+    class Meta:
+        db_table = "item_order_headers"
+        ordering = ['-id']
+        constraints = [
+            models.UniqueConstraint(fields=["client_id", "order_id"], name="uniq_item_order_header"),
+            models.UniqueConstraint(
+                fields=["client_id", "device_id", "request_uuid"],
+                condition=models.Q(request_uuid__isnull=False),
+                name="uniq_item_order_request",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["client_id", "-id"], name="idx_item_order_hdr_client"),
+            # Pending documents are what the back office lists all day
+            models.Index(
+                fields=["client_id", "-id"],
+                condition=models.Q(status="uploaded to server"),
+                name="idx_item_order_hdr_pending",
+            ),
+        ]
+
+
+class ItemOrders(models.Model):
+    """One line of an item order; the shared fields live on the header"""
+
+    header = models.ForeignKey(
+        ItemOrderHeader,
+        on_delete=models.CASCADE,
+        related_name="lines"
+    )
+
+    product_name = models.CharField(max_length=200)
+    item_code = models.CharField(max_length=100)
+    barcode = models.CharField(max_length=100)
+
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.DecimalField(
+        max_digits=10,
+        decimal_places=2
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    client_id = models.CharField(max_length=100)
+
     class Meta:
         db_table = "item_orders"
         ordering = ['-id']
 
 
+class ChangeEvent(models.Model):
+    """
+    Append-only feed of mobile transactions for the ERP pull. Rows are
+    written by triggers on the document headers and collection (see
+    migration 0009); id is the feed cursor and only grows per tenant.
+    """
+
+    ENTITY_CHOICES = [
+        ('item_order', 'Item Order'),
+        ('sales', 'Sales'),
+        ('sales_return', 'Sales Return'),
+        ('collection', 'Collection'),
+    ]
+
+    client_id = models.CharField(max_length=100)
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    entity_id = models.BigIntegerField()
+    entity_key = models.CharField(max_length=50)
+    action = models.CharField(max_length=20)
+    status = models.CharField(max_length=30, blank=True, null=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "change_feed"
+        indexes = [
+            models.Index(fields=["client_id", "id"], name="idx_change_feed_client"),
+        ]
+
+
+class ChangeFeedAck(models.Model):
+    """Last feed id a consumer (e.g. the ERP) has confirmed, per tenant"""
+
+    client_id = models.CharField(max_length=100)
+    consumer = models.CharField(max_length=50)
+    owner = models.CharField(max_length=100, blank=True, default="")  # username that acks for the consumer
+    acked_id = models.BigIntegerField(default=0)
+    acked_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "change_feed_ack"
+        constraints = [
+            models.UniqueConstraint(fields=["client_id", "consumer"], name="uniq_change_feed_ack"),
+        ]
+
+
+class DailyRollup(models.Model):
+    """
+    Per-day totals of item orders, sales and sales returns, kept up to
+    date by app1.rollups as documents are written. Reports read these
+    instead of scanning the line tables.
+    """
+
+    client_id = models.CharField(max_length=100)
+    day = models.DateField()
+
+    order_docs = models.IntegerField(default=0)
+    order_lines = models.IntegerField(default=0)
+    order_qty = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    order_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
 
+    sales_docs = models.IntegerField(default=0)
+    sales_lines = models.IntegerField(default=0)
+    sales_qty = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    sales_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
 
+    return_docs = models.IntegerField(default=0)
+    return_lines = models.IntegerField(default=0)
+    return_qty = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    return_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
 
+    class Meta:
+        abstract = True
+
+
+class DailyUserRollup(DailyRollup):
+    username = models.CharField(max_length=100)
+
+    class Meta:
+        db_table = "rollup_daily_user"
+        constraints = [
+            models.UniqueConstraint(fields=["client_id", "day", "username"], name="uniq_rollup_daily_user"),
+        ]
+
+
+class DailyItemRollup(DailyRollup):
+    item_code = models.CharField(max_length=100)
+
+    class Meta:
+        db_table = "rollup_daily_item"
+        constraints = [
+            models.UniqueConstraint(fields=["client_id", "day", "item_code"], name="uniq_rollup_daily_item"),
+        ]
+
+
+class DailyCustomerRollup(DailyRollup):
+    customer_code = models.CharField(max_length=100)
+
+    class Meta:
+        db_table = "rollup_daily_customer"
+        constraints = [
+            models.UniqueConstraint(fields=["client_id", "day", "customer_code"], name="uniq_rollup_daily_customer"),
+        ]
+
+
+class PendingItemDemand(models.Model):
+    """
+    Quantity per item on pending ('uploaded to server') item orders.
+    Maintained by triggers on item_orders / item_order_headers (see
+    migration 0012); read by app1.order_checks.
+    """
+
+    client_id = models.CharField(max_length=100)
+    item_code = models.CharField(max_length=100)
+    quantity = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = "pending_item_demand"
+        constraints = [
+            models.UniqueConstraint(fields=["client_id", "item_code"], name="uniq_pending_item_demand"),
+        ]
+
+
+class CustomerItemHistory(models.Model):
+    """
+    What each customer buys: one row per customer and item over all item
+    orders and sales, kept up to date by app1.rollups. The index ranks a
+    customer's items so the top N is one index range read.
+    """
+
+    client_id = models.CharField(max_length=100)
+    customer_code = models.CharField(max_length=100)
+    item_code = models.CharField(max_length=100)
+    product_name = models.CharField(max_length=200)
+
+    documents = models.IntegerField(default=0)
+    total_qty = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    last_qty = models.DecimalField(max_digits=12, decimal_places=2)
+    last_price = models.DecimalField(max_digits=10, decimal_places=2)
+    last_date = models.DateField()
+
+    class Meta:
+        db_table = "rollup_customer_items"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["client_id", "customer_code", "item_code"], name="uniq_rollup_customer_item"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["client_id", "customer_code", "-documents", "-last_date"],
+                name="idx_rollup_customer_top",
+            ),
+        ]
+
+
+class CollectionLedgerMatch(models.Model):
+    """
+    A completed collection matched to the acc_ledgers credit the ERP
+    posted for it (app1.reconciliation). A collection and a ledger row
+    are each matched at most once.
+    """
+
+    RULE_CHOICES = [
+        ("reference", "Cheque / reference number"),
+        ("amount_date", "Amount and date"),
+    ]
+
+    client_id = models.CharField(max_length=100)
+    collection = models.OneToOneField(Collection, on_delete=models.CASCADE, related_name="ledger_match")
+    ledger_id = models.IntegerField()  # acc_ledgers.id
+    ledger_date = models.DateField(null=True)
+    rule = models.CharField(max_length=20, choices=RULE_CHOICES)
+    day_gap = models.IntegerField()  # ledger entry_date - collection created_date
+    matched_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "collection_ledger_match"
+        constraints = [
+            models.UniqueConstraint(fields=["client_id", "ledger_id"], name="uniq_collection_match_ledger"),
+        ]
+
+
+class DataVersion(models.Model):
+    """
+    Per-tenant version counter of one kind of data (app1.versions). Only
+    ever goes up; caches key on it instead of guessing expiry times.
+    """
+
+    client_id = models.CharField(max_length=100)
+    entity = models.CharField(max_length=30)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "data_versions"
+        constraints = [
+            models.UniqueConstraint(fields=["client_id", "entity"], name="uniq_data_version"),
+        ]
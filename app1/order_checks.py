@@ -0,0 +1,195 @@
+"""
+Price and stock checks for new item orders and sales.
+
+Price rules (from settings_options), checked when order_rate_editable is
+off:
+    - a line's price should be one of the item's batch prices for the
+      user's price codes (the barcode's batch when it matches one);
+    - the price codes are protected_price_users[username] when that is a
+      {username: code or [codes]} map with an entry for the user, else
+      default_price_code, else S1. The settings screen owns that field
+      and has never defined its shape, so any other value is ignored.
+Mismatches and items missing from the tenant's product list are only
+reported (price_warnings): the app's price list may be older than the
+last sync, and the document is still stored.
+
+Stock: every item of the document is compared with its godown stock
+minus the quantity already on pending item orders. Short items are only
+reported (stock_warnings); the document is still stored.
+
+Item codes are compared trimmed, like the index built from
+TRIM(productcode) / TRIM(product).
+
+Batch prices and stock per item come from a per-tenant index built with
+one query and cached under the tenant's products / stock data versions
+(app1.versions); pending quantities come from pending_item_demand (kept
+by triggers), one indexed query per document.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+
+from settings_options.models import SettingsOptions
+from .versions import version_tag
+
+
+PRICE_INDEX_TIMEOUT = 300  # seconds; only bounds memory, syncs change the key
+DEFAULT_PRICE_CODE = "S1"
+PRICE_TOLERANCE = Decimal("0.01")
+
+# acc_productbatch column -> price code (same map as the product API)
+PRICE_FIELDS = {
+    "salesprice": "S1",
+    "secondprice": "S2",
+    "thirdprice": "S3",
+    "fourthprice": "S4",
+    "nlc1": "S5",
+    "bmrp": "MR",
+    "cost": "CO",
+}
+
+
+def _index_key(client_id):
+    # Under the products / stock data versions, so a sync is seen at once
+    return f"price_stock_index:{client_id}:{version_tag(client_id, 'products', 'stock')}"
+
+
+def build_price_stock_index(client_id):
+    """
+    {item_code: {"batches": [(barcode, {price code: price})], "stock": qty}}
+    for the tenant, from acc_productbatch and acc_goddownstock in one query.
+    """
+    price_columns = list(PRICE_FIELDS)
+    sql_query = f"""
+    SELECT TRIM(productcode), barcode, {", ".join(price_columns)}, NULL
+    FROM acc_productbatch
+    WHERE client_id = %s
+    UNION ALL
+    SELECT TRIM(product), NULL, {", ".join("NULL" for _ in price_columns)}, SUM(COALESCE(quantity, 0))
+    FROM acc_goddownstock
+    WHERE client_id = %s
+    GROUP BY TRIM(product)
+    """
+
+    index = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, [client_id, client_id])
+        for code, barcode, *values in cursor.fetchall():
+            entry = index.setdefault(code, {"batches": [], "stock": Decimal(0)})
+            stock = values.pop()
+            if stock is not None:
+                entry["stock"] += stock
+            else:
+                prices = {
+                    PRICE_FIELDS[column]: value
+                    for column, value in zip(price_columns, values)
+                    if value is not None
+                }
+                entry["batches"].append((barcode, prices))
+    return index
+
+
+def get_price_stock_index(client_id):
+    key = _index_key(client_id)
+    index = cache.get(key)
+    if index is None:
+        index = build_price_stock_index(client_id)
+        cache.set(key, index, PRICE_INDEX_TIMEOUT)
+    return index
+
+
+def invalidate_price_stock_index(client_id):
+    """Drop the cached index, e.g. after new prices / stock were loaded"""
+    cache.delete(_index_key(client_id))
+
+
+def _price_codes(options, username):
+    protected = (options.get("protected_price_users") or {}) if options else {}
+    codes = protected.get(username) if isinstance(protected, dict) else None
+    if isinstance(codes, str) and codes:
+        return {codes}
+    if isinstance(codes, list) and codes:
+        return {str(code) for code in codes}
+    return {(options or {}).get("default_price_code") or DEFAULT_PRICE_CODE}
+
+
+def _pending_quantities(client_id, item_codes):
+    with connection.cursor() as cursor:
+        # Lines store the item code as the app sent it
+        cursor.execute("""
+            SELECT TRIM(item_code), SUM(GREATEST(quantity, 0))
+            FROM pending_item_demand
+            WHERE client_id = %s AND TRIM(item_code) = ANY(%s)
+            GROUP BY TRIM(item_code)
+        """, [client_id, list(item_codes)])
+        return dict(cursor.fetchall())
+
+
+class OrderLineCheck:
+    """
+    write_document() check for one new order / sales document. Never
+    rejects the document: price mismatches are left in .price_warnings
+    and stock shortfalls in .stock_warnings.
+    """
+
+    def __init__(self, client_id, username):
+        self.client_id = client_id
+        self.username = username
+        self.price_warnings = []
+        self.stock_warnings = []
+
+    def __call__(self, lines):
+        index = get_price_stock_index(self.client_id)
+        options = SettingsOptions.objects.filter(client_id=self.client_id).values(
+            "order_rate_editable", "default_price_code", "protected_price_users"
+        ).first()
+        item_codes = [(line["item_code"] or "").strip() for line in lines]
+
+        if index and not (options and options["order_rate_editable"]):
+            codes = _price_codes(options, self.username)
+            for number, (line, item_code) in enumerate(zip(lines, item_codes)):
+                warning = self._price_error(index.get(item_code), line, codes)
+                if warning:
+                    self.price_warnings.append({"line": number, "item_code": item_code, "warning": warning})
+
+        requested = {}
+        for line, item_code in zip(lines, item_codes):
+            requested[item_code] = requested.get(item_code, 0) + line["quantity"]
+        pending = _pending_quantities(self.client_id, requested)
+
+        for number, item_code in enumerate(item_codes):
+            if item_code not in requested:
+                continue  # reported on the item's first line
+            entry = index.get(item_code)
+            available = (entry["stock"] if entry else 0) - pending.get(item_code, 0)
+            if requested[item_code] > available:
+                self.stock_warnings.append({
+                    "line": number,
+                    "item_code": item_code,
+                    "requested": float(requested[item_code]),
+                    "available": float(max(available, 0)),
+                })
+            del requested[item_code]
+
+        return []
+
+    @staticmethod
+    def _price_error(entry, line, codes):
+        if entry is None:
+            return "Unknown item_code"
+
+        batches = entry["batches"]
+        if line.get("barcode"):
+            batches = [b for b in batches if b[0] == line["barcode"]] or batches
+
+        allowed = {
+            price for _, prices in batches
+            for code, price in prices.items() if code in codes
+        }
+        if not allowed:
+            return f"No price for price code {'/'.join(sorted(codes))}"
+        if not any(abs(line["price"] - price) < PRICE_TOLERANCE for price in allowed):
+            shown = ", ".join(f"{price:.2f}" for price in sorted(allowed))
+            return f"Price must be {shown}"
+        return None
@@ -0,0 +1,84 @@
+"""
+Helpers shared by the list endpoints: keyset cursors, page size and
+date-range filters.
+
+A cursor is the sort key of the last row of the previous page, encoded as an
+opaque url-safe token. Clients just send back the ``next_cursor`` they got.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Read ?limit= from the query string, clamped to [1, maximum]"""
+    raw = request.GET.get('limit')
+    if not raw:
+        return default
+
+    try:
+        size = int(raw)
+    except ValueError:
+        raise ValueError("limit must be a positive integer")
+    if size < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(size, maximum)
+
+
+def encode_cursor(*values):
+    """Encode the sort key of a row into an opaque cursor token"""
+    parts = [v.isoformat() if isinstance(v, (datetime, date)) else v for v in values]
+    raw = json.dumps(parts, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Decode a cursor token back into its list of ``size`` raw values"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def cursor_datetime(value):
+    """Parse a datetime stored in a cursor, rejecting anything else"""
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError("Invalid cursor")
+    return parsed
+
+
+def parse_date_range(request, start_param='start_date', end_param='end_date'):
+    """
+    Turn ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD into aware datetimes
+    [start, end) in the current time zone. Either bound may be missing.
+    end_date is inclusive, so the returned end is midnight of the next day.
+    """
+    bounds = []
+    for param, shift in ((start_param, 0), (end_param, 1)):
+        raw = request.GET.get(param)
+        if not raw:
+            bounds.append(None)
+            continue
+
+        day = parse_date(raw)
+        if day is None:
+            raise ValueError(f"{param} must be YYYY-MM-DD")
+        bounds.append(
+            timezone.make_aware(datetime.combine(day + timedelta(days=shift), time.min))
+        )
+
+    return bounds[0], bounds[1]
@@ -0,0 +1,230 @@
+"""
+Reconciliation of completed collections against acc_ledgers credits.
+
+A collection is matched to a ledger credit of the same account code and
+amount whose entry_date lies between LEDGER_DAYS_BEFORE days before and
+LEDGER_DAYS_AFTER days after the collection date (the ERP posts the
+receipt when it syncs). Where the collection has a cheque_no / ref_no,
+a credit mentioning it in particulars / narration is preferred
+("reference" rule); the rest are paired by date, earliest first
+("amount_date" rule). References are compared as whole words: both sides
+are split into upper-case alphanumeric tokens and the reference's tokens
+must appear together in the credit's, so "12" does not match "123456"
+and "R-77" matches "ref r/77".
+
+Both sides are read sorted by (code, amount, date) - the collections not
+matched yet and the credits not matched yet - and merged like a sort-merge
+join: the two streams advance together and only rows with the same code
+and amount are compared, so the cost is one pass over each side instead
+of collections x ledger rows. Matches are stored in
+collection_ledger_match; run it again after every ERP sync.
+
+The ERP sync may delete or re-key ledger rows, so every run first drops
+the matches whose ledger row is gone: their collections are matched
+again in the same run.
+"""
+import re
+from bisect import bisect_left
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import connection, transaction
+from django.db.models import TextField, Value
+from django.db.models.functions import Coalesce, Collate, Concat, Trim, Upper
+
+from .models import AccLedgers, Collection, CollectionLedgerMatch
+
+
+LEDGER_DAYS_BEFORE = 1
+LEDGER_DAYS_AFTER = 7
+READ_CHUNK = 5000
+
+_TOKEN = re.compile(r"[A-Z0-9]+")
+
+
+def _lock_tenant(cursor, client_id):
+    """One reconciliation per tenant at a time, until commit"""
+    cursor.execute(
+        "SELECT pg_advisory_xact_lock(hashtext('reconcile'), hashtext(%s))", [client_id]
+    )
+
+
+def _prune_dangling(cursor, client_id):
+    """Delete the tenant's matches whose acc_ledgers row no longer exists"""
+    cursor.execute(f"""
+        DELETE FROM {CollectionLedgerMatch._meta.db_table} m
+        WHERE m.client_id = %s
+          AND NOT EXISTS (
+              SELECT 1 FROM {AccLedgers._meta.db_table} l
+              WHERE l.id = m.ledger_id AND l.client_id = m.client_id
+          )
+    """, [client_id])
+    return cursor.rowcount
+
+
+def _tokens(text):
+    """Upper-case alphanumeric runs of text, which references are compared on"""
+    return tuple(_TOKEN.findall(text.upper()))
+
+
+def _mentions(tokens, reference):
+    """Whether the reference's tokens appear, adjacent and in order, in tokens"""
+    size = len(reference)
+    return any(tokens[start:start + size] == reference for start in range(len(tokens) - size + 1))
+
+
+def _sort_key():
+    # "C" collation sorts like Python compares str, which the merge relies on
+    return Collate(Trim("code"), "C")
+
+
+def _pending_collections(client_id):
+    """(key, amount, date, id, references) of unmatched completed collections"""
+    rows = (
+        Collection.objects
+        .filter(client_id=client_id, status="completed", ledger_match__isnull=True)
+        .annotate(key=_sort_key())
+        .order_by("key", "amount", "created_date", "id")
+        .values_list("key", "amount", "created_date", "id", "cheque_no", "ref_no")
+    )
+    for key, amount, day, collection_id, cheque_no, ref_no in rows.iterator(chunk_size=READ_CHUNK):
+        references = [tokens for tokens in (_tokens(r or "") for r in (cheque_no, ref_no)) if tokens]
+        yield key, amount, day, collection_id, references
+
+
+def _pending_credits(client_id, codes, first_day):
+    """(key, amount, date, id, text) of unmatched ledger credits for codes"""
+    matched = CollectionLedgerMatch.objects.filter(client_id=client_id).values("ledger_id")
+    rows = (
+        AccLedgers.objects
+        .filter(client_id=client_id, credit__gt=0, entry_date__gte=first_day)
+        .exclude(id__in=matched)
+        .annotate(key=_sort_key())
+        .filter(key__in=codes)
+        .annotate(text=Upper(Concat(
+            Coalesce("particulars", Value("")), Value(" "), Coalesce("narration", Value("")),
+            output_field=TextField(),
+        )))
+        .order_by("key", "credit", "entry_date", "id")
+        .values_list("key", "credit", "entry_date", "id", "text")
+    )
+    return rows.iterator(chunk_size=READ_CHUNK)
+
+
+def _match_group(collections, credits):
+    """
+    Pair the collections and credits of one (code, amount), both sorted by
+    date. Yields (collection_id, collection date, credit, rule).
+    """
+    used = set()
+    matched = set()
+    days = [credit[2] for credit in credits]
+    credit_tokens = [_tokens(credit[4]) for credit in credits]
+
+    def candidates(day):
+        high = day + timedelta(days=LEDGER_DAYS_AFTER)
+        start = bisect_left(days, day - timedelta(days=LEDGER_DAYS_BEFORE))
+        for index in range(start, len(credits)):
+            if days[index] > high:
+                break
+            if index not in used:
+                yield index, credits[index]
+
+    # Reference matches first, so a plain match cannot take their credit
+    for _, _, day, collection_id, references in collections:
+        if not references:
+            continue
+        for index, credit in candidates(day):
+            if any(_mentions(credit_tokens[index], reference) for reference in references):
+                used.add(index)
+                matched.add(collection_id)
+                yield collection_id, day, credit, "reference"
+                break
+
+    for _, _, day, collection_id, _ in collections:
+        if collection_id in matched:
+            continue
+        for index, credit in candidates(day):
+            used.add(index)
+            yield collection_id, day, credit, "amount_date"
+            break
+
+
+def _merge(collections, credits):
+    """Sort-merge the two streams on (code, amount), matching equal groups"""
+    group_key = lambda row: (row[0], row[1])
+    collection_groups = groupby(collections, group_key)
+    credit_groups = groupby(credits, group_key)
+
+    collection_group = next(collection_groups, None)
+    credit_group = next(credit_groups, None)
+    while collection_group is not None and credit_group is not None:
+        if collection_group[0] < credit_group[0]:
+            collection_group = next(collection_groups, None)
+        elif credit_group[0] < collection_group[0]:
+            credit_group = next(credit_groups, None)
+        else:
+            yield from _match_group(list(collection_group[1]), list(credit_group[1]))
+            collection_group = next(collection_groups, None)
+            credit_group = next(credit_groups, None)
+
+
+@transaction.atomic
+def reconcile_collections(client_id):
+    """
+    Match the tenant's unmatched completed collections to unmatched
+    ledger credits and store the matches. Returns {"pruned": n,
+    "collections": n, "matched": n, "reference": n, "amount_date": n};
+    pruned counts the matches dropped because their ledger row is gone.
+    """
+    with connection.cursor() as cursor:
+        _lock_tenant(cursor, client_id)
+        pruned = _prune_dangling(cursor, client_id)
+
+    collections = list(_pending_collections(client_id))
+    summary = {
+        "pruned": pruned, "collections": len(collections), "matched": 0, "reference": 0, "amount_date": 0,
+    }
+    if not collections:
+        return summary
+
+    codes = sorted({row[0] for row in collections})
+    first_day = min(row[2] for row in collections) - timedelta(days=LEDGER_DAYS_BEFORE)
+    credits = _pending_credits(client_id, codes, first_day)
+
+    matches = []
+    for collection_id, day, credit, rule in _merge(collections, credits):
+        matches.append((collection_id, credit[3], credit[2], rule, (credit[2] - day).days))
+        summary[rule] += 1
+
+    # One INSERT from arrays; bulk_create spends longer building the rows
+    # than the database takes to store them
+    if matches:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {CollectionLedgerMatch._meta.db_table}
+                    (client_id, collection_id, ledger_id, ledger_date, rule, day_gap, matched_at)
+                SELECT %s, m.collection_id, m.ledger_id, m.ledger_date, m.rule, m.day_gap, now()
+                FROM unnest(%s::bigint[], %s::int[], %s::date[], %s::text[], %s::int[])
+                    AS m (collection_id, ledger_id, ledger_date, rule, day_gap)
+            """, [client_id, *map(list, zip(*matches))])
+
+    summary["matched"] = len(matches)
+    return summary
+
+
+def unmatched_ledger_credits(client_id):
+    """Ledger credits of the tenant that no collection was matched to"""
+    matched = CollectionLedgerMatch.objects.filter(client_id=client_id).values("ledger_id")
+    return (
+        AccLedgers.objects
+        .filter(client_id=client_id, credit__gt=0)
+        .exclude(id__in=matched)
+    )
+
+
+def unmatched_collections(client_id):
+    """Completed collections of the tenant without a ledger match"""
+    return Collection.objects.filter(
+        client_id=client_id, status="completed", ledger_match__isnull=True
+    )
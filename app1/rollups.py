@@ -0,0 +1,209 @@
+"""
+Daily rollups of item orders, sales and sales returns.
+
+Three tables hold per-day totals for a tenant, one per dimension:
+rollup_daily_user (username), rollup_daily_item (item_code) and
+rollup_daily_customer (customer_code). Every row has docs / lines /
+qty / amount for orders, sales and returns; net = sales - returns.
+
+rollup_customer_items keeps, per customer and item, how many orders and
+sales had the item, the total and last quantity and the last price; it
+backs the reorder suggestions.
+
+write_document() adds each new document inside its own transaction, so
+the rollups always match the committed documents. Totals do not depend
+on a document's status, so status changes leave them untouched.
+rebuild_rollups() recomputes a tenant from the line tables (see the
+rebuild_rollups management command).
+"""
+from django.db import connection, transaction
+
+from sales.models import Sales, SalesHeader
+from sales_return.models import SalesReturn, SalesReturnHeader
+from .models import CustomerItemHistory, ItemOrderHeader, ItemOrders
+
+
+# header model -> (measure prefix, line model)
+DOCUMENT_KINDS = {
+    ItemOrderHeader: ("order", ItemOrders),
+    SalesHeader: ("sales", Sales),
+    SalesReturnHeader: ("return", SalesReturn),
+}
+
+# dimension -> (table, dimension column, source expression)
+ROLLUP_TABLES = {
+    "user": ("rollup_daily_user", "username", "h.username"),
+    "item": ("rollup_daily_item", "item_code", "l.item_code"),
+    "customer": ("rollup_daily_customer", "customer_code", "h.customer_code"),
+}
+
+MEASURES = ("docs", "lines", "qty", "amount")
+PREFIXES = ("order", "sales", "return")
+MEASURE_COLUMNS = [f"{prefix}_{measure}" for prefix in PREFIXES for measure in MEASURES]
+
+# Documents that count as a customer buying an item
+HISTORY_KINDS = (ItemOrderHeader, SalesHeader)
+HISTORY_TABLE = CustomerItemHistory._meta.db_table
+
+
+def _lock_tenant(cursor, client_id):
+    """Serialize rollup writers of a tenant with a rebuild, until commit"""
+    cursor.execute(
+        "SELECT pg_advisory_xact_lock(hashtext('rollups'), hashtext(%s))", [client_id]
+    )
+
+
+def _accumulate(cursor, header_model, where, params):
+    """Add the documents of header_model matching `where` to every rollup"""
+    prefix, line_model = DOCUMENT_KINDS[header_model]
+    header_table = header_model._meta.db_table
+    line_table = line_model._meta.db_table
+
+    values = {
+        f"{prefix}_docs": "COUNT(DISTINCT h.id)",
+        f"{prefix}_lines": "COUNT(*)",
+        f"{prefix}_qty": "SUM(l.quantity)",
+        f"{prefix}_amount": "SUM(l.amount)",
+    }
+    select_values = ", ".join(values.get(column, "0") for column in MEASURE_COLUMNS)
+
+    for table, column, source in ROLLUP_TABLES.values():
+        increments = ", ".join(f"{c} = {table}.{c} + EXCLUDED.{c}" for c in values)
+        cursor.execute(f"""
+            INSERT INTO {table} (client_id, day, {column}, {", ".join(MEASURE_COLUMNS)})
+            SELECT h.client_id, h.created_date, {source}, {select_values}
+            FROM {header_table} h
+            JOIN {line_table} l ON l.header_id = h.id
+            WHERE {where}
+            GROUP BY 1, 2, 3
+            ORDER BY 1, 2, 3
+            ON CONFLICT (client_id, day, {column}) DO UPDATE SET {increments}
+        """, params)
+
+
+def _history_documents_sql(header_model, where):
+    """One row per (document, item): quantity, last line's price and name"""
+    _, line_model = DOCUMENT_KINDS[header_model]
+    return f"""
+        SELECT h.client_id, h.customer_code, l.item_code, h.id AS document_id,
+               h.created_date, h.created_time,
+               (array_agg(l.product_name ORDER BY l.id DESC))[1] AS product_name,
+               SUM(l.quantity) AS qty,
+               (array_agg(l.price ORDER BY l.id DESC))[1] AS price
+        FROM {header_model._meta.db_table} h
+        JOIN {line_model._meta.db_table} l ON l.header_id = h.id
+        WHERE {where}
+        GROUP BY h.id, l.item_code
+    """
+
+
+def _accumulate_history(cursor, header_model, where, params):
+    """Fold the matching documents into rollup_customer_items"""
+    latest = "ORDER BY created_date DESC, created_time DESC, document_id DESC"
+    cursor.execute(f"""
+        INSERT INTO {HISTORY_TABLE} (
+            client_id, customer_code, item_code, product_name,
+            documents, total_qty, last_qty, last_price, last_date
+        )
+        SELECT client_id, customer_code, item_code,
+               (array_agg(product_name {latest}))[1],
+               COUNT(*), SUM(qty),
+               (array_agg(qty {latest}))[1],
+               (array_agg(price {latest}))[1],
+               MAX(created_date)
+        FROM ({_history_documents_sql(header_model, where)}) per_document
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (client_id, customer_code, item_code) DO UPDATE SET
+            product_name = EXCLUDED.product_name,
+            documents = {HISTORY_TABLE}.documents + EXCLUDED.documents,
+            total_qty = {HISTORY_TABLE}.total_qty + EXCLUDED.total_qty,
+            last_qty = EXCLUDED.last_qty,
+            last_price = EXCLUDED.last_price,
+            last_date = EXCLUDED.last_date
+    """, params)
+
+
+def add_document(header_model, header_row):
+    """
+    Add a newly written document to the rollups. Must run inside the
+    transaction that inserted it; other header models are ignored.
+    """
+    if header_model not in DOCUMENT_KINDS:
+        return
+    with connection.cursor() as cursor:
+        _lock_tenant(cursor, header_row.client_id)
+        _accumulate(cursor, header_model, "h.id = %s", [header_row.id])
+        if header_model in HISTORY_KINDS:
+            _accumulate_history(cursor, header_model, "h.id = %s", [header_row.id])
+
+
+@transaction.atomic
+def rebuild_rollups(client_id):
+    """Recompute all rollups of a tenant from the document tables"""
+    with connection.cursor() as cursor:
+        _lock_tenant(cursor, client_id)
+        for table in [t for t, _, _ in ROLLUP_TABLES.values()] + [HISTORY_TABLE]:
+            cursor.execute(f"DELETE FROM {table} WHERE client_id = %s", [client_id])
+        for header_model in DOCUMENT_KINDS:
+            _accumulate(cursor, header_model, "h.client_id = %s", [client_id])
+        for header_model in HISTORY_KINDS:
+            _accumulate_history(cursor, header_model, "h.client_id = %s", [client_id])
+
+
+def rollup_report(client_id, dimension, first_day, last_day, per_day=False, key=None, limit=100):
+    """
+    Rows of the dimension's rollup between first_day and last_day
+    (inclusive): summed over the range, or one row per day with
+    per_day. key restricts to one username / item_code / customer_code.
+    Sorted by net amount, largest first.
+    """
+    table, column, _ = ROLLUP_TABLES[dimension]
+    group_columns = f"day, {column}" if per_day else column
+
+    conditions = ["client_id = %s", "day >= %s", "day <= %s"]
+    params = [client_id, first_day, last_day]
+    if key is not None:
+        conditions.append(f"{column} = %s")
+        params.append(key)
+    params.append(limit)
+
+    sums = ", ".join(
+        f"SUM({c})::{'bigint' if c.endswith(('_docs', '_lines')) else 'float8'} AS {c}"
+        for c in MEASURE_COLUMNS
+    )
+    sql_query = f"""
+    SELECT
+        {"to_char(day, 'YYYY-MM-DD') AS day, " if per_day else ""}{column},
+        {sums},
+        SUM(sales_qty - return_qty)::float8 AS net_qty,
+        SUM(sales_amount - return_amount)::float8 AS net_amount
+    FROM {table}
+    WHERE {" AND ".join(conditions)}
+    GROUP BY {group_columns}
+    ORDER BY {"day, " if per_day else ""}net_amount DESC, {column}
+    LIMIT %s
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, params)
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def reorder_suggestions(client_id, customer_code, limit=10):
+    """The customer's most frequently bought items, most recent first on ties"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT item_code, product_name, documents AS times_ordered,
+                   ROUND(total_qty / documents, 2)::float8 AS typical_qty,
+                   last_qty::float8 AS last_qty,
+                   last_price::float8 AS last_price,
+                   to_char(last_date, 'YYYY-MM-DD') AS last_date
+            FROM {HISTORY_TABLE}
+            WHERE client_id = %s AND customer_code = %s
+            ORDER BY documents DESC, last_date DESC
+            LIMIT %s
+        """, [client_id, customer_code, limit])
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
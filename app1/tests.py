@@ -1,3 +1,384 @@
+import json
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .auth import clear_token_cache, decode_token
+from accesscontroll.models import AllowedMenu
+from .models import AccGoddownStock, AccMaster, AccProduct, AccUser, ItemOrderHeader, ItemOrders
+from .versions import get_versions
+from .rollups import add_document, rebuild_rollups
+
+
+CLIENT_ID = "test-client"
+
+
+def make_token(username="alice", role="User", client_id=CLIENT_ID, **claims):
+    payload = {
+        "user_id": username,
+        "username": username,
+        "client_id": client_id,
+        "role": role,
+        "accountcode": "",
+        "exp": datetime.utcnow() + timedelta(hours=1),
+        "iat": datetime.utcnow(),
+    }
+    payload.update(claims)
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+
+
+def create_order(client_id=CLIENT_ID, **fields):
+    header = ItemOrderHeader.objects.create(
+        customer_name="Corner Shop", customer_code="C001", area="NORTH", payment_type="Cash",
+        client_id=client_id, username="alice", device_id="device-1", **fields
+    )
+    ItemOrders.objects.create(
+        header=header, product_name="Soap", item_code="P001", barcode="B001",
+        price=10, quantity=2, amount=20, client_id=client_id,
+    )
+    return header
+
+
+class APITestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token()}")
+
+    def as_admin(self):
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token('boss', role='Admin')}")
+
+
+class ChangeFeedTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.as_admin()
+
+    def ack(self, seq, **body):
+        return self.api.post("/api/changes/ack/", dict(body, seq=seq), format="json")
+
+    def read_feed(self, query=""):
+        response = self.api.get(f"/api/changes/{query}")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        return lines[:-1], lines[-1]
+
+    def test_created_and_status_changes_are_fed_in_order(self):
+        header = create_order()
+        ItemOrderHeader.objects.filter(id=header.id).update(status="completed")
+
+        events, end = self.read_feed()
+
+        self.assertEqual([(e["entity"], e["key"], e["action"]) for e in events], [
+            ("item_order", header.order_id, "created"),
+            ("item_order", header.order_id, "status"),
+        ])
+        self.assertEqual(events[1]["document"]["status"], "completed")
+        self.assertEqual(end["last_seq"], events[-1]["seq"])
+        self.assertFalse(end["has_more"])
+
+    def test_feed_resumes_after_the_acknowledged_seq(self):
+        create_order()
+        events, end = self.read_feed()
+        ack = self.ack(end["last_seq"])
+        self.assertEqual(ack.json()["acked_seq"], end["last_seq"])
+
+        second = create_order()
+        events, _ = self.read_feed()
+
+        self.assertEqual([e["key"] for e in events], [second.order_id])
+
+    def test_other_tenants_events_are_not_fed(self):
+        create_order(client_id="other-client")
+
+        events, end = self.read_feed()
+
+        self.assertEqual(events, [])
+        self.assertEqual(end["last_seq"], 0)
+
+    def test_ack_never_moves_back_or_past_the_feed(self):
+        create_order()
+        create_order()
+        _, end = self.read_feed()
+        self.ack(end["last_seq"])
+
+        self.assertEqual(self.ack(end["last_seq"] - 1).status_code, 400)
+        self.assertEqual(self.ack(end["last_seq"] + 1).status_code, 400)
+        self.assertEqual(self.ack(end["last_seq"]).json()["acked_seq"], end["last_seq"])
+
+    def test_consumer_belongs_to_the_user_that_claimed_it(self):
+        create_order()
+        _, end = self.read_feed()
+        self.ack(end["last_seq"], consumer="erp")
+
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token('other-admin', role='Admin')}")
+
+        self.assertEqual(self.ack(end["last_seq"], consumer="erp").status_code, 403)
+        self.assertEqual(self.api.get("/api/changes/?consumer=erp").status_code, 403)
+        self.assertEqual(self.ack(end["last_seq"], consumer="erp-2").status_code, 200)
+
+    def test_only_admins_may_read_or_ack_the_feed(self):
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token()}")
+
+        self.assertEqual(self.api.get("/api/changes/").status_code, 403)
+        self.assertEqual(self.ack(0).status_code, 403)
+
+
+class SalesRollupReportTests(APITestCase):
+
+    def test_new_documents_are_added_to_the_daily_rollups(self):
+        add_document(ItemOrderHeader, create_order())
+        add_document(ItemOrderHeader, create_order())
+
+        body = self.api.get("/api/reports/sales-rollup/?group=user").json()
+
+        self.assertEqual(body["data"], [dict(
+            body["data"][0], username="alice", order_docs=2, order_lines=2, order_qty=4.0, order_amount=40.0
+        )])
+
+    def test_rebuild_matches_the_incremental_totals(self):
+        add_document(ItemOrderHeader, create_order())
+        before = self.api.get("/api/reports/sales-rollup/?group=user").json()["data"]
+
+        rebuild_rollups(CLIENT_ID)
+
+        self.assertEqual(self.api.get("/api/reports/sales-rollup/?group=user").json()["data"], before)
+
+    def test_invalid_calendar_date_is_a_bad_request(self):
+        response = self.api.get("/api/reports/sales-rollup/?start_date=2026-02-30")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "start_date / end_date must be YYYY-MM-DD")
+
+    def test_users_only_see_their_own_totals(self):
+        response = self.api.get("/api/reports/sales-rollup/?group=item")
+
+        self.assertEqual(response.status_code, 403)
+
+
+class BootstrapTests(APITestCase):
+
+    def bootstrap(self, query=""):
+        return self.api.get(f"/api/bootstrap/{query}").json()["sections"]
+
+    def test_sections_carry_data_and_a_version(self):
+        AccMaster.objects.create(code="F001", name="Corner Shop", area="NORTH", client_id=CLIENT_ID)
+
+        sections = self.bootstrap("?sections=areas,settings,products")
+
+        self.assertEqual(list(sections), ["areas", "settings", "products"])
+        self.assertEqual(sections["areas"]["data"], ["NORTH"])
+        self.assertEqual(sections["settings"]["data"]["client_id"], CLIENT_ID)
+        self.assertIn("data", sections["products"])
+        self.assertTrue(all(section["version"] for section in sections.values()))
+
+    def test_sections_at_the_sent_version_are_unchanged(self):
+        first = self.bootstrap("?sections=areas,misel")
+        query = f"?sections=areas,misel&areas={first['areas']['version']}&misel={first['misel']['version']}"
+
+        sections = self.bootstrap(query)
+
+        self.assertEqual(sections["areas"], {"version": first["areas"]["version"], "unchanged": True})
+        self.assertTrue(sections["misel"]["unchanged"])
+
+        AccMaster.objects.create(code="F001", name="Corner Shop", area="NORTH", client_id=CLIENT_ID)
+        self.assertEqual(self.bootstrap(query)["areas"]["data"], ["NORTH"])
+
+    def test_unknown_section_is_a_bad_request(self):
+        response = self.api.get("/api/bootstrap/?sections=areas,weather")
+
+        self.assertEqual(response.status_code, 400)
+
+
+class TokenAuthenticationTests(TestCase):
+    # area/list is a DRF view, item-orders/list a plain Django one
+    VIEWS = ["/api/area/list/", "/api/item-orders/list"]
+
+    def setUp(self):
+        clear_token_cache()
+
+    def get(self, url, authorization=None):
+        headers = {} if authorization is None else {"HTTP_AUTHORIZATION": authorization}
+        return self.client.get(url, **headers)
+
+    def test_valid_token(self):
+        for url in self.VIEWS:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url, f"Bearer {make_token()}").status_code, 200)
+
+    def test_missing_token(self):
+        for url in self.VIEWS:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url).status_code, 401)
+
+    def test_empty_token(self):
+        for url in self.VIEWS:
+            with self.subTest(url=url):
+                response = self.get(url, "Bearer ")
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response.json()["error"], "Invalid token")
+
+    def test_expired_token(self):
+        token = make_token(exp=datetime.utcnow() - timedelta(minutes=1))
+        for url in self.VIEWS:
+            with self.subTest(url=url):
+                response = self.get(url, f"Bearer {token}")
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response.json()["error"], "Token expired")
+
+    def test_cached_token_still_expires(self):
+        token = make_token(exp=datetime.utcnow() + timedelta(minutes=1))
+        self.assertEqual(decode_token(token)["username"], "alice")
+
+        with mock.patch("app1.auth.time.time", return_value=time.time() + 120):
+            response = self.get("/api/item-orders/list", f"Bearer {token}")
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["error"], "Token expired")
+
+
+class LoginTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        AccUser.objects.create(id="bob", password="old", role="level 1", accountcode="", client_id=CLIENT_ID)
+
+    def login(self, password):
+        return self.client.post(
+            "/api/login/", {"username": "bob", "password": password, "client_id": CLIENT_ID},
+            content_type="application/json",
+        )
+
+    def change_password(self):
+        AccUser.objects.filter(id="bob").update(password="new")
+
+    def test_changed_password_is_seen_on_the_next_login(self):
+        self.assertEqual(self.login("old").status_code, 200)
+
+        self.change_password()
+
+        self.assertEqual(self.login("old").status_code, 401)
+        self.assertEqual(self.login("new").status_code, 200)
+
+    def test_users_are_not_cached_without_the_acc_users_trigger(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE acc_users DISABLE TRIGGER acc_users_settings_update")
+        self.assertEqual(self.login("old").status_code, 200)
+
+        # Nothing moves the settings version now
+        self.change_password()
+
+        self.assertEqual(self.login("old").status_code, 401)
+        self.assertEqual(self.login("new").status_code, 200)
+
+    def test_changed_menus_are_seen_on_the_next_login(self):
+        self.assertEqual(self.login("old").json()["user"]["allowedMenuIds"], ["company"])
+
+        AllowedMenu.objects.create(user_id="bob", client_id=CLIENT_ID, allowedMenuIds=["reports"])
+
+        self.assertEqual(self.login("old").json()["user"]["allowedMenuIds"], ["reports"])
+
+
+class IngestTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.as_admin()
+
+    def ingest(self, rows, query=""):
+        body = "".join(json.dumps(row) + "\n" for row in rows)
+        return self.api.post(f"/api/ingest/acc_master/{query}", body, content_type="application/x-ndjson")
+
+    def codes(self):
+        return sorted(AccMaster.objects.filter(client_id=CLIENT_ID).values_list("code", flat=True))
+
+    def test_replace_deletes_the_rows_missing_from_the_upload(self):
+        self.ingest([{"code": "F001", "name": "North"}, {"code": "F002", "name": "South"}])
+
+        body = self.ingest([{"code": "F001", "name": "North Traders"}]).json()
+
+        self.assertEqual((body["received"], body["updated"], body["deleted"]), (1, 1, 1))
+        self.assertEqual(self.codes(), ["F001"])
+
+    def test_unchanged_rows_are_not_written(self):
+        rows = [{"code": "F001", "name": "North"}, {"code": "F002", "name": "South"}]
+        self.ingest(rows)
+
+        body = self.ingest(rows).json()
+
+        self.assertEqual(
+            [body[count] for count in ("inserted", "updated", "deleted", "unchanged")], [0, 0, 0, 2]
+        )
+
+    def test_empty_upload_does_not_empty_the_table(self):
+        self.ingest([{"code": "F001", "name": "North"}])
+
+        response = self.ingest([])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.codes(), ["F001"])
+
+        body = self.ingest([], "?allow_empty=1").json()
+        self.assertEqual(body["deleted"], 1)
+        self.assertEqual(self.codes(), [])
+
+    def test_merge_keeps_the_rows_missing_from_the_upload(self):
+        self.ingest([{"code": "F001", "name": "North"}])
+
+        body = self.ingest([{"code": "F002", "name": "South"}], "?mode=merge").json()
+
+        self.assertEqual((body["inserted"], body["deleted"]), (1, 0))
+        self.assertEqual(self.codes(), ["F001", "F002"])
+
+
+class DataVersionTests(APITestCase):
+
+    def test_erp_table_writes_bump_their_entity(self):
+        before = get_versions(CLIENT_ID)
+
+        AccMaster.objects.create(code="F001", name="Corner Shop", client_id=CLIENT_ID)
+        AccProduct.objects.create(code="P001", name="Soap", client_id=CLIENT_ID)
+        AccGoddownStock.objects.filter(client_id=CLIENT_ID).update(quantity=1)  # no rows: no bump
+
+        after = get_versions(CLIENT_ID)
+        changed = {entity for entity in after if after[entity] != before[entity]}
+        self.assertEqual(changed, {"acc_master", "products"})
+
+    def test_one_statement_bumps_every_tenant_it_touched(self):
+        AccMaster.objects.bulk_create([
+            AccMaster(code="F001", name="North", client_id=CLIENT_ID),
+            AccMaster(code="X001", name="North", client_id="other-client"),
+        ])
+
+        self.assertEqual(get_versions(CLIENT_ID, ("acc_master",)), {"acc_master": 1})
+        self.assertEqual(get_versions("other-client", ("acc_master",)), {"acc_master": 1})
+
+    def test_model_saves_bump_through_signals(self):
+        AllowedMenu.objects.create(user_id="alice", client_id=CLIENT_ID, allowedMenuIds=["reports"])
+
+        self.assertEqual(get_versions(CLIENT_ID, ("menus", "areas")), {"menus": 1, "areas": 0})
+
+    def test_versions_endpoint_answers_not_modified_until_a_change(self):
+        response = self.api.get("/api/versions/?entities=acc_master,settings")
+        self.assertEqual(set(response.json()["versions"]), {"acc_master", "settings"})
+        etag = response["ETag"]
+
+        self.assertEqual(
+            self.api.get("/api/versions/?entities=acc_master,settings", HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        AccMaster.objects.create(code="F001", name="Corner Shop", client_id=CLIENT_ID)
+        response = self.api.get("/api/versions/?entities=acc_master,settings", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["versions"]["acc_master"], 1)
 
-# Create your tests here.
+    def test_unknown_entity_is_a_bad_request(self):
+        self.assertEqual(self.api.get("/api/versions/?entities=weather").status_code, 400)
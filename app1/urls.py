@@ -12,7 +12,13 @@ from .views import (
     get_cash_book_data,
     get_bank_book_data,
     get_bank_ledger_details,
-    get_cash_ledger_details
+    get_cash_ledger_details,
+    change_feed,
+    change_feed_ack,
+    sales_rollup_report,
+    bootstrap,
+    ingest,
+    data_versions
 )
 
 
@@ -29,6 +35,16 @@ urlpatterns = [
     path('get-bank-book-data/',  get_bank_book_data,  name='get_bank_book_data'),
     path('get-cash-ledger-details/', get_cash_ledger_details, name='get_cash_ledger_details'),
     path('get-bank-ledger-details/', get_bank_ledger_details, name='get_bank_ledger_details'),
+
+    path('changes/',     change_feed,     name='change_feed'),
+    path('changes/ack/', change_feed_ack, name='change_feed_ack'),
+
+    path('reports/sales-rollup/', sales_rollup_report, name='sales_rollup_report'),
+
+    path('bootstrap/', bootstrap, name='bootstrap'),
+
+    path('ingest/<str:table>/', ingest, name='ingest'),
+    path('versions/', data_versions, name='data_versions'),
 ]
 
 
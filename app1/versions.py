@@ -0,0 +1,153 @@
+"""
+Per-tenant data versions: one counter per (client_id, entity) that goes
+up whenever that kind of data changes, so caches and clients can key on
+it instead of guessing expiry times.
+
+    acc_master      acc_master (debtors, areas, firms)
+    products        acc_product, acc_productbatch, acc_productphoto,
+                    acc_departments
+    stock           acc_goddown, acc_goddownstock
+    ledgers         acc_ledgers
+    invoices        acc_invmast
+    settings        settings_options.settings_version (see
+                    settings_options.bundle), read from there
+    menus           user_menus
+    areas           user_areas
+    shop_locations  shop_location
+    punches         punchin (punch-ins, punch-outs, verification)
+
+Where the counters are bumped:
+
+    - triggers on the ERP tables (migration 0017), so every writer is
+      covered: the ERP's own SQL, the ingestion API, developer-options
+      purges;
+    - model signals (connect_signals(), from App1Config.ready) for the
+      Django models;
+    - bump() from queryset writes that send no signals (bulk_create,
+      update()).
+
+A bump is part of the writer's transaction, so a version never moves
+before the data is visible.
+"""
+import hashlib
+
+from django.apps import apps
+from django.db import connection
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+
+from settings_options.models import SettingsOptions
+from .models import DataVersion
+
+
+ENTITIES = (
+    "acc_master",
+    "products",
+    "stock",
+    "ledgers",
+    "invoices",
+    "settings",
+    "menus",
+    "areas",
+    "shop_locations",
+    "punches",
+)
+
+# ERP table -> entity; bumped by the triggers of migration 0017
+TABLE_ENTITIES = {
+    "acc_master": "acc_master",
+    "acc_product": "products",
+    "acc_productbatch": "products",
+    "acc_productphoto": "products",
+    "acc_departments": "products",
+    "acc_goddown": "stock",
+    "acc_goddownstock": "stock",
+    "acc_ledgers": "ledgers",
+    "acc_invmast": "invoices",
+}
+
+# model label -> entity, bumped on save / delete
+SIGNAL_MODELS = {
+    "accesscontroll.AllowedMenu": "menus",
+    "PunchIn.UserAreas": "areas",
+    "PunchIn.ShopLocation": "shop_locations",
+}
+
+
+def bump(client_id, *entities):
+    """Move the tenant's versions of entities up by one"""
+    unknown = set(entities) - set(ENTITIES)
+    if unknown:
+        raise ValueError(f"unknown data version entities {sorted(unknown)}")
+
+    if "settings" in entities:
+        SettingsOptions.objects.filter(client_id=client_id).update(
+            settings_version=F("settings_version") + 1
+        )
+    # Sorted, so two writers never lock the rows in opposite order
+    counters = sorted(set(entities) - {"settings"})
+    if not counters:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {DataVersion._meta.db_table} (client_id, entity, version, updated_at)
+            SELECT %s, entity, 1, now() FROM unnest(%s::text[]) AS entity
+            ORDER BY entity
+            ON CONFLICT (client_id, entity)
+            DO UPDATE SET version = {DataVersion._meta.db_table}.version + 1, updated_at = now()
+        """, [client_id, counters])
+
+
+def get_versions(client_id, entities=ENTITIES):
+    """{entity: version} of the tenant, 0 for data never changed; one query"""
+    sql_query = f"""
+        SELECT entity, version FROM {DataVersion._meta.db_table}
+        WHERE client_id = %s AND entity = ANY(%s)
+    """
+    params = [client_id, [entity for entity in entities if entity != "settings"]]
+    if "settings" in entities:
+        sql_query += f"""
+        UNION ALL
+        SELECT 'settings', settings_version FROM {SettingsOptions._meta.db_table}
+        WHERE client_id = %s
+        """
+        params.append(client_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, params)
+        found = dict(cursor.fetchall())
+    return {entity: found.get(entity, 0) for entity in entities}
+
+
+def get_version(client_id, entity):
+    return get_versions(client_id, (entity,))[entity]
+
+
+def version_tag(client_id, *entities):
+    """
+    One string for the versions of entities ("12.3.7"), to put in a cache
+    key or an ETag: it changes whenever any of them does.
+    """
+    versions = get_versions(client_id, entities)
+    return ".".join(str(versions[entity]) for entity in entities)
+
+
+def versions_etag(versions):
+    raw = ",".join(f"{entity}={version}" for entity, version in sorted(versions.items()))
+    return f'"versions-{hashlib.sha1(raw.encode()).hexdigest()[:16]}"'
+
+
+def _bump_for_instance(entity):
+    def receiver(sender, instance, **kwargs):
+        if instance.client_id:
+            bump(instance.client_id, entity)
+    return receiver
+
+
+def connect_signals():
+    """Bump the versions of SIGNAL_MODELS on every save / delete"""
+    for label, entity in SIGNAL_MODELS.items():
+        model = apps.get_model(label)
+        receiver = _bump_for_instance(entity)
+        post_save.connect(receiver, sender=model, weak=False, dispatch_uid=f"data_version:{label}:save")
+        post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=f"data_version:{label}:delete")
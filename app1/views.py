@@ -1,12 +1,12 @@
 # views.py - With debugging
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from .models import AccUser, Misel
 from datetime import datetime, timedelta
 import jwt
+from .auth import authenticate, token_claims
 from django.conf import settings
-from .models import AccUser, Misel, AccMaster, AccLedgers, AccInvmast,CashAndBankAccMaster
-from accesscontroll.models import AllowedMenu
+from .models import AccUser, Misel, AccLedgers, AccInvmast,CashAndBankAccMaster
+from .menus import allowed_menu_ids, check_credentials, menu_version
 
 
 
@@ -21,13 +21,11 @@ def login(request):
     if not username or not password or not client_id:
         return Response({'success': False, 'error': 'Missing credentials'}, status=400)
 
-    try:
-        # Include client_id in the initial query to avoid MultipleObjectsReturned error
-        user = AccUser.objects.get(id=username, password=password, client_id=client_id)
-    except AccUser.DoesNotExist:
+    # Tenant users are cached (see app1.menus), so a burst of logins does
+    # not query acc_users each time
+    user = check_credentials(username, password, client_id)
+    if user is None:
         return Response({'success': False, 'error': 'Invalid credentials'}, status=401)
-    except AccUser.MultipleObjectsReturned:
-        return Response({'success': False, 'error': 'Multiple users found with these credentials'}, status=401)
 
     # Remove the redundant client_id check since it's now part of the query
     # if client_id != user.client_id:
@@ -39,52 +37,12 @@ def login(request):
     role = "Admin" if (user.role and user.role.strip().lower() == "level 3") else "User"
 
 
-# add new menu's here:
-    if role == "Admin":
-       allowedMenuIds= [
-     "item-details",
-    "bank-cash",
-    "cash-book",
-    "bank-book",
-    "debtors",
-    "company",
-    "punch-in",
-    "location-capture",
-    "punch-in-action",
-    "area-assign",
-    "master",
-    "user-menu",
-    "settings",
-    "users",
-    "master-debtors",
-    "area-table",
-    "master-suppliers",
-    "bills-receivable",
-    "reports",
-    "collection-report",
-    "reports"
-    ]
-    else :    
-        try:
-        # Fetch allowed menu IDs for the user
-            allowedMenuIds = AllowedMenu.objects.filter(
-            user_id=user.id, client_id=client_id
-            ).values_list('allowedMenuIds',flat=True).first()
-
-
-        # If no allowed menus found, default to ['company']
-            if not allowedMenuIds:
-                allowedMenuIds = ['company']
-
-        except AllowedMenu.DoesNotExist:
-        # This usually won't trigger with filter(), but included for safety
-            allowedMenuIds = ['company']
-
-        except Exception as e:
+    try:
+        menus_version = menu_version(client_id)
+        allowedMenuIds = allowed_menu_ids(user.id, client_id, role, menus_version)
+    except Exception as e:
         # Log the error in production
-            return Response({'success': False, "error": "Error fetching AllowedMenuIds"}, status=500)
-
-     
+        return Response({'success': False, "error": "Error fetching AllowedMenuIds"}, status=500)
 
     # Create custom JWT token with user data
     payload = {
@@ -93,6 +51,7 @@ def login(request):
         'client_id': user.client_id,
         'role': role,
         'accountcode': user.accountcode,
+        'menu_version': menus_version,
         'exp': datetime.utcnow() + timedelta(hours=24),  # Token expires in 24 hours
         'iat': datetime.utcnow(),
     }
@@ -136,11 +95,9 @@ def get_misel_data(request):
                 'error': 'Invalid authorization header format'
             }, status=401)
         
-        token = auth_header.split(' ')[1]
-        
         try:
             # Decode the JWT token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = authenticate(request).claims
             client_id = payload.get('client_id')
             
             if not client_id:
@@ -181,7 +138,6 @@ def test_token(request):
 def get_debtors_data(request):
     """Get joined data from AccMaster, AccLedgers, and AccInvmast tables for logged user's client_id with pagination and search"""
     from django.db import connection
-    from django.core.paginator import Paginator
     import math
     
     try:
@@ -191,11 +147,9 @@ def get_debtors_data(request):
         if not auth_header or not auth_header.startswith('Bearer '):
             return Response({'success': False, 'error': 'Missing or invalid authorization header'}, status=401)
         
-        token = auth_header.split(' ')[1]
-        
         try:
             # Decode the JWT token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = authenticate(request).claims
             client_id = payload.get('client_id')
             
             if not client_id:
@@ -303,11 +257,9 @@ def get_ledger_details(request):
         if not auth_header or not auth_header.startswith('Bearer '):
             return Response({'success': False, 'error': 'Missing or invalid authorization header'}, status=401)
         
-        token = auth_header.split(' ')[1]
-        
         try:
             # Decode the JWT token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = authenticate(request).claims
             client_id = payload.get('client_id')
             
             if not client_id:
@@ -351,11 +303,9 @@ def get_invoice_details(request):
         if not auth_header or not auth_header.startswith('Bearer '):
             return Response({'success': False, 'error': 'Missing or invalid authorization header'}, status=401)
         
-        token = auth_header.split(' ')[1]
-        
         try:
             # Decode the JWT token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = authenticate(request).claims
             client_id = payload.get('client_id')
             
             if not client_id:
@@ -403,11 +353,9 @@ def get_cash_book_data(request):
         if not auth_header or not auth_header.startswith('Bearer '):
             return Response({'success': False, 'error': 'Missing or invalid authorization header'}, status=401)
         
-        token = auth_header.split(' ')[1]
-        
         try:
             # Decode the JWT token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = authenticate(request).claims
             client_id = payload.get('client_id')
             
             if not client_id:
@@ -470,11 +418,9 @@ def get_bank_book_data(request):
         if not auth_header or not auth_header.startswith('Bearer '):
             return Response({'success': False, 'error': 'Missing or invalid authorization header'}, status=401)
         
-        token = auth_header.split(' ')[1]
-        
         try:
             # Decode the JWT token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = authenticate(request).claims
             client_id = payload.get('client_id')
             
             if not client_id:
@@ -542,11 +488,9 @@ def get_cash_ledger_details(request):
         if not auth_header or not auth_header.startswith('Bearer '):
             return Response({'success': False, 'error': 'Missing or invalid authorization header'}, status=401)
         
-        token = auth_header.split(' ')[1]
-        
         try:
             # Decode the JWT token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = authenticate(request).claims
             client_id = payload.get('client_id')
             
             if not client_id:
@@ -600,11 +544,9 @@ def get_bank_ledger_details(request):
         if not auth_header or not auth_header.startswith('Bearer '):
             return Response({'success': False, 'error': 'Missing or invalid authorization header'}, status=401)
         
-        token = auth_header.split(' ')[1]
-        
         try:
             # Decode the JWT token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = authenticate(request).claims
             client_id = payload.get('client_id')
             
             if not client_id:
@@ -646,3 +588,290 @@ def get_bank_ledger_details(request):
         
     except Exception as e:
         return Response({'success': False, 'error': str(e)}, status=500)
+
+
+# --------------------------------------------------
+# CHANGE FEED (ERP PULL)
+# --------------------------------------------------
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import renderer_classes
+from rest_framework.renderers import JSONRenderer
+from .change_feed import (
+    DEFAULT_CONSUMER, DEFAULT_FEED_LIMIT, MAX_FEED_LIMIT, AckError, ConsumerNotOwned,
+    NDJSONRenderer, acked_id, acknowledge, check_owner, stream_changes
+)
+
+
+@api_view(['GET'])
+@renderer_classes([JSONRenderer, NDJSONRenderer])
+def change_feed(request):
+    """
+    NDJSON stream of orders, sales, returns and collections created or
+    changed after ?after=<seq> (default: the consumer's last ack).
+    ?limit= up to 5000, ?consumer= defaults to "erp".
+    Admin (level 3) tokens only.
+    """
+    payload, error = token_claims(request)
+    if error:
+        return Response({'success': False, 'error': error}, status=401)
+    if payload.get('role') != 'Admin':
+        return Response({'success': False, 'error': 'Permission denied. Level 3 access required.'}, status=403)
+    client_id = payload['client_id']
+
+    consumer = request.GET.get('consumer') or DEFAULT_CONSUMER
+    try:
+        check_owner(client_id, consumer, payload.get('username'))
+    except ConsumerNotOwned as e:
+        return Response({'success': False, 'error': str(e)}, status=403)
+    try:
+        after = request.GET.get('after')
+        after_id = int(after) if after else acked_id(client_id, consumer)
+        limit = int(request.GET.get('limit', DEFAULT_FEED_LIMIT))
+        if after_id < 0 or limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response({'success': False, 'error': 'after and limit must be non-negative integers'}, status=400)
+
+    response = StreamingHttpResponse(
+        stream_changes(client_id, after_id, min(limit, MAX_FEED_LIMIT)),
+        content_type='application/x-ndjson'
+    )
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@api_view(['POST'])
+def change_feed_ack(request):
+    """
+    Body {"seq": <last stored seq>, "consumer": "erp"}. Acks never move
+    back or past the feed; a consumer is acked by the user that claimed
+    it with its first ack. Admin (level 3) tokens only.
+    """
+    payload, error = token_claims(request)
+    if error:
+        return Response({'success': False, 'error': error}, status=401)
+    if payload.get('role') != 'Admin':
+        return Response({'success': False, 'error': 'Permission denied. Level 3 access required.'}, status=403)
+    client_id = payload['client_id']
+
+    consumer = request.data.get('consumer') or DEFAULT_CONSUMER
+    seq = request.data.get('seq')
+    if not isinstance(seq, int) or isinstance(seq, bool) or seq < 0:
+        return Response({'success': False, 'error': 'seq must be a non-negative integer'}, status=400)
+
+    if not isinstance(consumer, str) or len(consumer) > 50:
+        return Response({'success': False, 'error': 'consumer must be a name of at most 50 characters'}, status=400)
+
+    try:
+        acked = acknowledge(client_id, consumer, seq, payload.get('username'))
+    except ConsumerNotOwned as e:
+        return Response({'success': False, 'error': str(e)}, status=403)
+    except AckError as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
+    return Response({'success': True, 'consumer': consumer, 'acked_seq': acked})
+
+
+# --------------------------------------------------
+# SALES ROLLUP REPORT
+# --------------------------------------------------
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .rollups import ROLLUP_TABLES, rollup_report
+
+MAX_ROLLUP_DAYS = 366
+MAX_ROLLUP_ROWS = 1000
+
+
+@api_view(['GET'])
+def sales_rollup_report(request):
+    """
+    Order / sales / return totals per user, item or customer, read only
+    from the daily rollups.
+    ?group=user|item|customer  ?start_date=  ?end_date=  (default: this month)
+    ?per_day=true  ?key=<username / item_code / customer_code>  ?limit=
+    Users other than admins only get their own group=user totals.
+    """
+    payload, error = token_claims(request)
+    if error:
+        return Response({'success': False, 'error': error}, status=401)
+    client_id = payload['client_id']
+    role = payload.get('role')
+    is_admin = bool(role and role.lower() == 'admin')
+
+    group = request.GET.get('group', 'user')
+    if group not in ROLLUP_TABLES:
+        return Response({'success': False, 'error': f'group must be one of {list(ROLLUP_TABLES)}'}, status=400)
+
+    key = request.GET.get('key') or None
+    if not is_admin:
+        if group != 'user':
+            return Response({'success': False, 'error': 'Only admins can see item and customer totals'}, status=403)
+        key = payload.get('username')
+
+    today = timezone.localdate()
+    first_day, last_day = today.replace(day=1), today
+    try:
+        if request.GET.get('start_date'):
+            first_day = parse_date(request.GET['start_date'])
+        if request.GET.get('end_date'):
+            last_day = parse_date(request.GET['end_date'])
+    except ValueError:
+        # Well formed but not a real date (2026-02-30)
+        first_day = None
+    if first_day is None or last_day is None:
+        return Response({'success': False, 'error': 'start_date / end_date must be YYYY-MM-DD'}, status=400)
+    if last_day < first_day:
+        return Response({'success': False, 'error': 'end_date must not be before start_date'}, status=400)
+    if (last_day - first_day).days >= MAX_ROLLUP_DAYS:
+        return Response({'success': False, 'error': f'Date range is limited to {MAX_ROLLUP_DAYS} days'}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', 100))
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response({'success': False, 'error': 'limit must be a positive integer'}, status=400)
+
+    per_day = request.GET.get('per_day', '').lower() in ('1', 'true', 'yes')
+    rows = rollup_report(
+        client_id, group, first_day, last_day,
+        per_day=per_day, key=key, limit=min(limit, MAX_ROLLUP_ROWS)
+    )
+
+    return Response({
+        'success': True,
+        'group': group,
+        'start_date': first_day.isoformat(),
+        'end_date': last_day.isoformat(),
+        'per_day': per_day,
+        'count': len(rows),
+        'data': rows,
+    })
+
+
+# --------------------------------------------------
+# BOOTSTRAP (EVERYTHING THE APP LOADS AT LAUNCH)
+# --------------------------------------------------
+from .bootstrap import SECTIONS, load_bootstrap
+
+
+@api_view(['GET'])
+def bootstrap(request):
+    """
+    The startup reads in one round-trip (app1.bootstrap). Send back
+    the versions of the last response (?settings=7&areas=...) to get
+    "unchanged" for sections that did not change; ?sections=a,b limits
+    the sections.
+    """
+    payload, error = token_claims(request)
+    if error:
+        return Response({'success': False, 'error': error}, status=401)
+
+    names = list(SECTIONS)
+    if request.GET.get('sections'):
+        names = [name.strip() for name in request.GET['sections'].split(',') if name.strip()]
+        unknown = [name for name in names if name not in SECTIONS]
+        if unknown:
+            return Response({'success': False, 'error': f'Unknown sections {unknown}. Allowed: {list(SECTIONS)}'}, status=400)
+
+    known_versions = {name: request.GET.get(name) for name in names if request.GET.get(name)}
+
+    return Response({
+        'success': True,
+        'user': {
+            'username': payload.get('username'),
+            'role': payload.get('role'),
+            'client_id': payload.get('client_id'),
+            'accountcode': payload.get('accountcode'),
+        },
+        'sections': load_bootstrap(payload, names, known_versions)
+    })
+
+
+# --------------------------------------------------
+# ERP MASTER-DATA INGESTION
+# --------------------------------------------------
+import gzip
+import time
+
+from .ingest import INGEST_TABLES, IngestError, ingest_table
+from .versions import ENTITIES, TABLE_ENTITIES, get_versions, versions_etag
+
+
+@api_view(['POST'])
+def ingest(request, table):
+    """
+    Load one ERP table for the tenant: the body is NDJSON (one object per
+    row) or CSV with a header (Content-Type text/csv), optionally gzipped
+    (Content-Encoding: gzip). ?mode=replace (default) makes the tenant's
+    rows equal to the upload, ?mode=merge only adds and updates rows.
+    An empty upload is refused in replace mode unless ?allow_empty=1.
+    Admin (level 3) tokens only.
+    """
+    payload, error = token_claims(request)
+    if error:
+        return Response({'success': False, 'error': error}, status=401)
+    if payload.get('role') != 'Admin':
+        return Response({'success': False, 'error': 'Permission denied. Level 3 access required.'}, status=403)
+    if table not in INGEST_TABLES:
+        return Response({'success': False, 'error': f'Unknown table {table}. Allowed: {list(INGEST_TABLES)}'}, status=404)
+
+    content_type = (request.content_type or '').split(';')[0].strip().lower()
+    upload_format = 'csv' if content_type in ('text/csv', 'application/csv') else 'ndjson'
+
+    # Read the body as a stream; it is never held in memory as a whole
+    stream = request._request
+    if request.META.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream)
+
+    started = time.monotonic()
+    try:
+        counts = ingest_table(
+            payload['client_id'], table, stream,
+            upload_format=upload_format, mode=request.GET.get('mode', 'replace'),
+            allow_empty=request.GET.get('allow_empty') in ('1', 'true'),
+        )
+    except IngestError as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+    except OSError as e:  # a broken gzip body
+        return Response({'success': False, 'error': f'Unreadable upload: {e}'}, status=400)
+
+    return Response({
+        'success': True,
+        'table': table,
+        **counts,
+        'seconds': round(time.monotonic() - started, 2),
+        'versions': get_versions(payload['client_id'], (TABLE_ENTITIES[table],)),
+    })
+
+
+# --------------------------------------------------
+# DATA VERSIONS (CLIENT POLLING)
+# --------------------------------------------------
+@api_view(['GET'])
+def data_versions(request):
+    """
+    The tenant's data versions, {entity: version}; ?entities=a,b limits
+    them. Poll with If-None-Match: 304 while nothing changed.
+    """
+    payload, error = token_claims(request)
+    if error:
+        return Response({'success': False, 'error': error}, status=401)
+
+    entities = ENTITIES
+    if request.GET.get('entities'):
+        entities = tuple(name.strip() for name in request.GET['entities'].split(',') if name.strip())
+        unknown = [name for name in entities if name not in ENTITIES]
+        if unknown:
+            return Response({'success': False, 'error': f'Unknown entities {unknown}. Allowed: {list(ENTITIES)}'}, status=400)
+
+    versions = get_versions(payload['client_id'], entities)
+    etag = versions_etag(versions)
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = Response(status=304)
+    else:
+        response = Response({'success': True, 'versions': versions})
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
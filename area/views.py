@@ -1,7 +1,7 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.conf import settings
 import jwt
+from app1.auth import authenticate
 
 from app1.models import AccMaster   # existing model
 
@@ -15,11 +15,9 @@ def get_area_list(request):
     if not auth_header or not auth_header.startswith('Bearer '):
         return Response({'success': False, 'error': 'Missing or invalid token'}, status=401)
 
-    token = auth_header.split(' ')[1]
-
     # 2) Decode token
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+        payload = authenticate(request).claims
         client_id = payload.get('client_id')
     except jwt.ExpiredSignatureError:
         return Response({'success': False, 'error': 'Token expired'}, status=401)
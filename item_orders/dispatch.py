@@ -0,0 +1,119 @@
+"""
+Dispatch consolidation of pending item orders.
+
+For every item on a pending order ('uploaded to server') the warehouse
+gets the total quantity ordered, split by area, next to the stock per
+godown from acc_goddownstock and the shortfall (ordered - available,
+never below 0). Everything is aggregated in one SQL statement.
+"""
+from django.db import connection
+
+
+PENDING_STATUS = "uploaded to server"
+
+CSV_COLUMNS = [
+    "item_code", "product_name", "area", "area_ordered_qty", "area_orders",
+    "ordered_qty", "available", "shortfall", "godown_stock",
+]
+
+
+def consolidate_pending_orders(client_id, area=None, godown=None):
+    """
+    One row per item: item_code, product_name, ordered_qty, orders,
+    available, shortfall, areas [{area, ordered_qty, orders}] and godowns
+    [{godown_id, godown_name, quantity}]. area limits the orders counted,
+    godown the stock counted as available.
+    """
+    order_filter = ""
+    params = [client_id, PENDING_STATUS]
+    if area:
+        order_filter = "AND h.area = %s"
+        params.append(area)
+
+    stock_filter = ""
+    params.append(client_id)
+    if godown:
+        stock_filter = "AND s.goddownid = %s"
+        params.append(godown)
+
+    sql_query = f"""
+    WITH demand AS (
+        SELECT
+            l.item_code,
+            h.area,
+            MAX(l.product_name) AS product_name,
+            SUM(l.quantity) AS ordered_qty,
+            COUNT(DISTINCT h.id) AS orders
+        FROM item_order_headers h
+        JOIN item_orders l ON l.header_id = h.id
+        WHERE h.client_id = %s AND h.status = %s {order_filter}
+        GROUP BY l.item_code, h.area
+    ),
+    stock AS (
+        SELECT
+            s.product,
+            s.goddownid,
+            MAX(g.name) AS goddown_name,
+            SUM(COALESCE(s.quantity, 0)) AS quantity
+        FROM acc_goddownstock s
+        LEFT JOIN acc_goddown g ON g.goddownid = s.goddownid AND g.client_id = s.client_id
+        WHERE s.client_id = %s {stock_filter}
+          AND s.product IN (SELECT item_code FROM demand)
+        GROUP BY s.product, s.goddownid
+    ),
+    stock_items AS (
+        SELECT
+            product,
+            SUM(quantity) AS available,
+            jsonb_agg(jsonb_build_object(
+                'godown_id', goddownid,
+                'godown_name', goddown_name,
+                'quantity', quantity::float8
+            ) ORDER BY goddownid) AS godowns
+        FROM stock
+        GROUP BY product
+    )
+    SELECT
+        d.item_code,
+        MAX(d.product_name) AS product_name,
+        SUM(d.ordered_qty)::float8 AS ordered_qty,
+        SUM(d.orders)::int AS orders,
+        COALESCE(si.available, 0)::float8 AS available,
+        GREATEST(SUM(d.ordered_qty) - COALESCE(si.available, 0), 0)::float8 AS shortfall,
+        json_agg(json_build_object(
+            'area', d.area,
+            'ordered_qty', d.ordered_qty::float8,
+            'orders', d.orders
+        ) ORDER BY d.area) AS areas,
+        COALESCE(si.godowns, '[]'::jsonb)::json AS godowns
+    FROM demand d
+    LEFT JOIN stock_items si ON si.product = d.item_code
+    GROUP BY d.item_code, si.available, si.godowns
+    ORDER BY d.item_code
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, params)
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def csv_rows(items):
+    """Flatten consolidated items to one CSV row per item and area"""
+    for item in items:
+        godown_stock = "; ".join(
+            f"{g['godown_name'] or g['godown_id']}: {g['quantity']:g}"
+            for g in item["godowns"]
+        )
+        for area in item["areas"]:
+            yield {
+                "item_code": item["item_code"],
+                "product_name": item["product_name"],
+                "area": area["area"],
+                "area_ordered_qty": area["ordered_qty"],
+                "area_orders": area["orders"],
+                "ordered_qty": item["ordered_qty"],
+                "available": item["available"],
+                "shortfall": item["shortfall"],
+                "godown_stock": godown_stock,
+            }
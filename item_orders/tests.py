@@ -1,3 +1,176 @@
+import json
+from datetime import datetime, timedelta
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from app1.models import AccGoddownStock, AccProduct, AccProductBatch, ItemOrderHeader
+from settings_options.models import SettingsOptions
+from .models import ItemOrders
+
+
+CLIENT_ID = "test-client"
+
+
+def make_token(username="alice", role="User", client_id=CLIENT_ID):
+    return jwt.encode({
+        "user_id": username,
+        "username": username,
+        "client_id": client_id,
+        "role": role,
+        "accountcode": "",
+        "exp": datetime.utcnow() + timedelta(hours=1),
+        "iat": datetime.utcnow(),
+    }, settings.SECRET_KEY, algorithm="HS256")
+
+
+class ItemOrderTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {make_token()}"}
+
+    def create_order(self, **data):
+        body = {
+            "device_id": "device-1",
+            "customer_code": "C001",
+            "customer_name": "Corner Shop",
+            "username": "alice",
+            "area": "NORTH",
+            "payment_type": "Cash",
+            "items": [
+                {"product_name": "Soap", "item_code": "P001", "barcode": "B001",
+                 "price": "10.00", "quantity": "2", "amount": "20.00"},
+                {"product_name": "Salt", "item_code": "P002", "barcode": "B002",
+                 "price": "5.00", "quantity": "1", "amount": "5.00"},
+            ],
+        }
+        body.update(data)
+        return self.client.post(
+            "/api/item-orders/create", json.dumps(body), content_type="application/json", **self.auth
+        )
+
+
+class CreateItemOrderTests(ItemOrderTestCase):
+
+    def test_retry_with_the_same_request_uuid_returns_the_stored_order(self):
+        first = self.create_order(request_uuid="req-1").json()
+        retry = self.create_order(request_uuid="req-1").json()
+
+        self.assertFalse(first["replayed"])
+        self.assertTrue(retry["replayed"])
+        self.assertEqual(retry["order_id"], first["order_id"])
+        self.assertEqual(ItemOrderHeader.objects.filter(client_id=CLIENT_ID).count(), 1)
+        self.assertEqual(ItemOrders.objects.filter(client_id=CLIENT_ID).count(), 2)
+
+    def test_request_uuid_is_scoped_to_the_device(self):
+        self.create_order(request_uuid="req-1")
+        other = self.create_order(request_uuid="req-1", device_id="device-2").json()
+
+        self.assertFalse(other["replayed"])
+        self.assertEqual(ItemOrderHeader.objects.filter(client_id=CLIENT_ID).count(), 2)
+
+    def test_without_request_uuid_every_submission_is_stored(self):
+        first = self.create_order().json()
+        second = self.create_order().json()
+
+        self.assertNotEqual(first["order_id"], second["order_id"])
+        self.assertEqual(ItemOrderHeader.objects.filter(client_id=CLIENT_ID).count(), 2)
+
+
+class ItemOrderListTests(ItemOrderTestCase):
+
+    def test_total_counts_every_page(self):
+        for _ in range(3):
+            self.create_order()
+
+        body = self.client.get("/api/item-orders/list?limit=2&with_total=1", **self.auth).json()
+
+        self.assertEqual(body["total_orders"], 3)
+        self.assertEqual(body["page_count"], 2)
+        self.assertTrue(body["has_more"])
+        item = body["orders"][0]["items"][-1]
+        self.assertEqual(item["quantity"], "2.00")
+        self.assertEqual(item["price"], 10.0)
+
+    def test_next_page_follows_the_cursor(self):
+        created = [self.create_order().json()["order_id"] for _ in range(3)]
+
+        first = self.client.get("/api/item-orders/list?limit=2", **self.auth).json()
+        second = self.client.get(
+            f"/api/item-orders/list?limit=2&cursor={first['next_cursor']}", **self.auth
+        ).json()
+
+        listed = [order["order_id"] for order in first["orders"] + second["orders"]]
+        self.assertEqual(listed, created[::-1])
+        self.assertFalse(second["has_more"])
+        # Counting every page is opt-in
+        self.assertIsNone(second["total_orders"])
+
+
+class OrderPriceCheckTests(ItemOrderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for code, s1, s2 in (("P001", 10, 12), ("P002", 5, 6)):
+            AccProduct.objects.create(code=code, name=code, client_id=CLIENT_ID)
+            AccProductBatch.objects.create(
+                productcode_id=code, salesprice=s1, secondprice=s2, barcode=f"B{code[1:]}", client_id=CLIENT_ID
+            )
+            AccGoddownStock.objects.create(goddownid="G1", product=code, quantity=100, client_id=CLIENT_ID)
+
+    def set_options(self, **options):
+        SettingsOptions.objects.update_or_create(client_id=CLIENT_ID, defaults=options)
+
+    def test_default_price_code_mismatch_is_a_warning(self):
+        self.set_options(default_price_code="S2")
+
+        response = self.create_order()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["price_warnings"], [
+            {"line": 0, "item_code": "P001", "warning": "Price must be 12.00"},
+            {"line": 1, "item_code": "P002", "warning": "Price must be 6.00"},
+        ])
+        self.assertEqual(ItemOrderHeader.objects.filter(client_id=CLIENT_ID).count(), 1)
+
+    def test_prices_of_the_default_code_pass(self):
+        response = self.create_order()
+
+        self.assertEqual(response.json()["price_warnings"], [])
+        self.assertEqual(response.json()["stock_warnings"], [])
+
+    def test_protected_user_is_checked_against_their_price_code(self):
+        self.set_options(protected_price_users={"alice": "S2"})
+
+        body = self.create_order().json()
+
+        self.assertEqual([w["warning"] for w in body["price_warnings"]], ["Price must be 12.00", "Price must be 6.00"])
+
+    def test_editable_rate_skips_the_price_check(self):
+        self.set_options(order_rate_editable=True, default_price_code="S2")
+
+        body = self.create_order().json()
+
+        self.assertEqual(body["price_warnings"], [])
+
+    def test_unknown_item_is_a_warning_and_codes_are_trimmed(self):
+        items = [
+            {"product_name": "Soap", "item_code": " P001 ", "barcode": "B001",
+             "price": "10.00", "quantity": "2", "amount": "20.00"},
+            {"product_name": "Gone", "item_code": "P999", "barcode": "B999",
+             "price": "1.00", "quantity": "1", "amount": "1.00"},
+        ]
+
+        response = self.create_order(items=items)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["price_warnings"], [
+            {"line": 1, "item_code": "P999", "warning": "Unknown item_code"},
+        ])
+        self.assertEqual(
+            response.json()["stock_warnings"],
+            [{"line": 1, "item_code": "P999", "requested": 1.0, "available": 0.0}],
+        )
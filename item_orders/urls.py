@@ -6,4 +6,7 @@ urlpatterns = [
     path("list", views.item_orders_list, name="item_orders_list"),
     path("list-all", views.item_orders_list_all, name="item_orders_list_all"),
     path("status-change", views.change_order_status, name="change_order_status"),
+    path("status-change/bulk", views.change_order_status_bulk, name="change_order_status_bulk"),
+    path("dispatch", views.dispatch_consolidation, name="dispatch_consolidation"),
+    path("suggestions", views.reorder_suggestions, name="reorder_suggestions"),
 ]
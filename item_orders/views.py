@@ -1,56 +1,39 @@
 import json
-import jwt
-from django.conf import settings
+from app1.auth import token_claims
 from django.http import JsonResponse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from rest_framework.response import Response
 from .models import ItemOrders
+from app1.models import ItemOrderHeader
+from app1.documents import (
+    DOCUMENT_STATUSES, DocumentValidationError, new_document_id,
+    parse_bulk_keys, set_document_status, write_document
+)
+from app1.document_lists import document_count, document_filters, document_page
+from app1.order_checks import OrderLineCheck
 
 
 # --------------------------------------------------
-# TOKEN VALIDATION
+# CREATE ITEM ORDER (POST)
 # --------------------------------------------------
-import jwt
-from django.conf import settings
-
-
-def get_client_from_token(request):
-    auth_header = request.META.get('HTTP_AUTHORIZATION')
+# model field -> key in each item sent by the app
+ORDER_LINE_FIELDS = {
+    "product_name": "product_name",
+    "item_code": "item_code",
+    "barcode": "barcode",
+    "price": "price",
+    "quantity": "quantity",
+    "amount": "amount",
+}
 
-    if not auth_header:
-        return None, "Authorization header missing"
 
-    if not auth_header.startswith("Bearer "):
-        return None, "Invalid authorization format"
-
-    token = auth_header.split(" ", 1)[1]
-
-    try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=["HS256"]
-        )
-        return payload, None
-
-    except jwt.ExpiredSignatureError:
-        return None, "Token expired"
-
-    except jwt.InvalidTokenError:
-        return None, "Invalid token"
-
-
-
-# --------------------------------------------------
-# CREATE ITEM ORDER (POST)
-# --------------------------------------------------
 @csrf_exempt
 @require_http_methods(["POST"])
 def create_item_order(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
-        return error
+        return JsonResponse({"success": False, "error": error}, status=401)
 
     try:
         data = json.loads(request.body)
@@ -62,56 +45,66 @@ def create_item_order(request):
             }, status=400)
 
         items = data.get("items", [])
-        if not items:
+        if not items or not isinstance(items, list):
             return JsonResponse({
                 "success": False,
                 "error": "items list is required"
             }, status=400)
 
-        # ✅ Generate ONE order_id
-        import uuid
-        order_id = f"ORD-{uuid.uuid4().hex[:10].upper()}"
-
-        created_items = []
-
-        for item in items:
-            order = ItemOrders.objects.create(
-                order_id=order_id,
-
-                customer_name=data.get("customer_name"),
-                customer_code=data.get("customer_code"),
-                area=data.get("area"),
-
-                product_name=item.get("product_name"),
-                item_code=item.get("item_code"),
-                barcode=item.get("barcode"),
-
-                payment_type=data.get("payment_type"),
-                price=item.get("price"),
-                quantity=item.get("quantity"),
-                amount=item.get("amount"),
-
-                client_id=payload.get("client_id"),
-                username=data.get("username"),
-                remark=data.get("remark"),
-
-                device_id=data.get("device_id")
-            )
+        # ✅ Generate ONE order_id (a retried request_uuid keeps the stored one)
+        order_id = new_document_id("ORD")
+
+        # ✅ Prices checked against the batch prices, stock against pending orders (warnings only)
+        line_check = OrderLineCheck(payload.get("client_id"), payload.get("username"))
+
+        # ✅ Everything validated first, then header + lines stored in one transaction
+        header, orders, created = write_document(
+            ItemOrderHeader,
+            ItemOrders,
+            header={
+                "order_id": order_id,
+                "customer_name": data.get("customer_name"),
+                "customer_code": data.get("customer_code"),
+                "area": data.get("area"),
+                "payment_type": data.get("payment_type"),
+                "client_id": payload.get("client_id"),
+                "username": data.get("username"),
+                "remark": data.get("remark"),
+                "device_id": data.get("device_id"),
+                "request_uuid": data.get("request_uuid"),
+            },
+            lines=items,
+            line_fields=ORDER_LINE_FIELDS,
+            check=line_check,
+        )
 
-            created_items.append({
+        created_items = [
+            {
                 "product_name": order.product_name,
                 "item_code": order.item_code,
-                "quantity": order.quantity,
+                "quantity": float(order.quantity),
                 "amount": float(order.amount)
-            })
+            }
+            for order in orders
+        ]
 
         return JsonResponse({
             "success": True,
             "message": "Order created successfully",
-            "order_id": order_id,
+            "order_id": header.order_id,
+            "replayed": not created,
+            "price_warnings": line_check.price_warnings,
+            "stock_warnings": line_check.stock_warnings,
             "items": created_items
         })
 
+    except DocumentValidationError as e:
+        return JsonResponse({
+            "success": False,
+            "error": "Invalid order items",
+            "details": e.errors
+        }, status=400)
+
     except Exception as e:
         return JsonResponse({
             "success": False,
@@ -119,72 +112,70 @@ def create_item_order(request):
         }, status=400)
 
 
-
-
-
 # --------------------------------------------------
 # LIST ITEM ORDERS (GET)
 # --------------------------------------------------
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+
+# Columns of the list responses (item key -> line column)
+ORDER_COLUMNS = ["order_id", "customer_name", "customer_code", "area", "payment_type", "username", "remark"]
+ORDER_ITEM_COLUMNS = {
+    "product_name": "product_name",
+    "item_code": "item_code",
+    "barcode": "barcode",
+    "price": "price",
+    "quantity": "quantity",
+    "amount": "amount",
+}
 
 @require_http_methods(["GET"])
 def item_orders_list(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
         return JsonResponse({"success": False, "error": error}, status=401)
 
-    client_id = payload.get("client_id")
+    try:
+        filters = document_filters(request)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
 
     # ✅ SHOW ONLY "uploaded to server"
-    orders = ItemOrders.objects.filter(
-        client_id=client_id,
-        status="uploaded to server"
-    ).order_by('-id')
-
-    grouped_orders = {}
-
-    for o in orders:
-        if o.order_id not in grouped_orders:
-            grouped_orders[o.order_id] = {
-                "order_id": o.order_id,
-                "customer_name": o.customer_name,
-                "customer_code": o.customer_code,
-                "area": o.area,
-                "payment_type": o.payment_type,
-                "username": o.username,
-                "remark": o.remark,
-                "created_date": o.created_date.strftime('%Y-%m-%d'),
-                "created_time": o.created_time.strftime('%H:%M:%S'),
-                "items": []
-            }
-
-        grouped_orders[o.order_id]["items"].append({
-            "product_name": o.product_name,
-            "item_code": o.item_code,
-            "barcode": o.barcode,
-            "price": float(o.price),
-            "quantity": o.quantity,
-            "amount": float(o.amount)
-        })
+    filters["status"] = "uploaded to server"
+
+    # ✅ Grouped and paginated in SQL (keyset on header id)
+    orders, next_cursor = document_page(
+        ItemOrderHeader,
+        ItemOrders,
+        payload.get("client_id"),
+        filters,
+        ORDER_COLUMNS,
+        ORDER_ITEM_COLUMNS,
+    )
 
     return JsonResponse({
         "success": True,
-        "total_orders": len(grouped_orders),
-        "orders": list(grouped_orders.values())
+        "total_orders": document_count(ItemOrderHeader, payload.get("client_id"), filters),
+        "page_count": len(orders),
+        "orders": orders,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     })
 
 
-from django.utils import timezone
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-import json
-from django.http import JsonResponse
-from .models import ItemOrders
+def _status_assignments(payload, status_value):
+    """Header columns written by a status change (same audit fields as before)"""
+    now = timezone.localtime()
+    return {
+        "status": status_value,
+        "status_changed_date": now.date(),
+        "status_changed_time": now.time(),
+        "status_changed_by": payload.get("username") or payload.get("user") or "system",
+    }
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def change_order_status(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
         return JsonResponse({"success": False, "error": error}, status=401)
 
@@ -196,95 +187,197 @@ def change_order_status(request):
     order_id = data.get("order_id")
     status_value = data.get("status")
 
-    ALLOWED_STATUSES = ["uploaded to server", "completed"]
-
     if not order_id or not status_value:
         return JsonResponse({
             "success": False,
             "error": "order_id and status are required"
         }, status=400)
 
-    if status_value not in ALLOWED_STATUSES:
+    if status_value not in DOCUMENT_STATUSES:
         return JsonResponse({
             "success": False,
-            "error": f"Invalid status. Allowed: {ALLOWED_STATUSES}"
+            "error": f"Invalid status. Allowed: {DOCUMENT_STATUSES}"
         }, status=400)
 
-    orders = ItemOrders.objects.filter(
-        order_id=order_id,
-        client_id=payload.get("client_id")
+    # ✅ One UPDATE on the header row, line count from RETURNING
+    updated = set_document_status(
+        ItemOrderHeader, ItemOrders, "order_id",
+        payload.get("client_id"), [str(order_id)],
+        _status_assignments(payload, status_value)
     )
 
-    if not orders.exists():
+    if str(order_id) not in updated:
         return JsonResponse({
             "success": False,
             "error": "Order not found"
         }, status=404)
 
-    now = timezone.localtime()
-
-    orders.update(
-        status=status_value,
-        status_changed_date=now.date(),
-        status_changed_time=now.time(),
-        status_changed_by=payload.get("username") or payload.get("user") or "system"
-    )
-
     return JsonResponse({
         "success": True,
         "message": "Order status updated successfully",
         "order_id": order_id,
-        "total_items_updated": orders.count(),
+        "total_items_updated": updated[str(order_id)],
         "status": status_value
     })
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def change_order_status_bulk(request):
+    """
+    Set one status on many orders:
+    { "order_ids": ["…", "…"], "status": "completed" }
+    Returns one result per id, in request order.
+    """
+    payload, error = token_claims(request)
+    if error:
+        return JsonResponse({"success": False, "error": error}, status=401)
+
+    try:
+        data = json.loads(request.body)
+    except Exception:
+        return JsonResponse({"success": False, "error": "Invalid JSON"}, status=400)
+
+    try:
+        keys = parse_bulk_keys(data, "order_ids")
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    status_value = data.get("status")
+    if status_value not in DOCUMENT_STATUSES:
+        return JsonResponse({
+            "success": False,
+            "error": f"Invalid status. Allowed: {DOCUMENT_STATUSES}"
+        }, status=400)
+
+    updated = set_document_status(
+        ItemOrderHeader, ItemOrders, "order_id",
+        payload.get("client_id"), keys,
+        _status_assignments(payload, status_value)
+    )
+
+    results = [
+        {"order_id": key, "updated": True, "total_items_updated": updated[key]}
+        if key in updated else
+        {"order_id": key, "updated": False, "error": "Order not found"}
+        for key in keys
+    ]
+
+    return JsonResponse({
+        "success": True,
+        "status": status_value,
+        "total_updated": len(updated),
+        "results": results
+    })
 
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
 
 @require_http_methods(["GET"])
 def item_orders_list_all(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
+    if error:
+        return JsonResponse({"success": False, "error": error}, status=401)
+
+    try:
+        filters = document_filters(request)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    # ✅ NO status filter → show ALL (unless ?status= is given)
+    # ✅ Grouped and paginated in SQL (keyset on header id)
+    orders, next_cursor = document_page(
+        ItemOrderHeader,
+        ItemOrders,
+        payload.get("client_id"),
+        filters,
+        ORDER_COLUMNS + ["status"],
+        ORDER_ITEM_COLUMNS,
+    )
+
+    return JsonResponse({
+        "success": True,
+        "total_orders": document_count(ItemOrderHeader, payload.get("client_id"), filters),
+        "page_count": len(orders),
+        "orders": orders,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    })
+
+
+# --------------------------------------------------
+# DISPATCH CONSOLIDATION (PENDING ORDERS)
+# --------------------------------------------------
+from django.http import StreamingHttpResponse
+from app1.exports import csv_lines
+from .dispatch import CSV_COLUMNS, consolidate_pending_orders, csv_rows
+
+
+@require_http_methods(["GET"])
+def dispatch_consolidation(request):
+    """
+    Total quantity per item over all pending orders, split by area, with
+    stock per godown and shortfall. ?area= ?godown= ?format=csv
+    """
+    payload, error = token_claims(request)
     if error:
         return JsonResponse({"success": False, "error": error}, status=401)
 
     client_id = payload.get("client_id")
+    items = consolidate_pending_orders(
+        client_id,
+        area=request.GET.get("area") or None,
+        godown=request.GET.get("godown") or None,
+    )
 
-    # ✅ NO status filter → show ALL
-    orders = ItemOrders.objects.filter(
-        client_id=client_id
-    ).order_by('-id')
-
-    grouped_orders = {}
-
-    for o in orders:
-        if o.order_id not in grouped_orders:
-            grouped_orders[o.order_id] = {
-                "order_id": o.order_id,
-                "customer_name": o.customer_name,
-                "customer_code": o.customer_code,
-                "area": o.area,
-                "payment_type": o.payment_type,
-                "username": o.username,
-                "remark": o.remark,
-                "status": o.status,  # ✅ include status
-                "created_date": o.created_date.strftime('%Y-%m-%d'),
-                "created_time": o.created_time.strftime('%H:%M:%S'),
-                "items": []
-            }
+    if request.GET.get("format") == "csv":
+        response = StreamingHttpResponse(
+            csv_lines(CSV_COLUMNS, csv_rows(items)), content_type="text/csv"
+        )
+        response["Content-Disposition"] = f'attachment; filename="dispatch_{client_id}.csv"'
+        return response
 
-        grouped_orders[o.order_id]["items"].append({
-            "product_name": o.product_name,
-            "item_code": o.item_code,
-            "barcode": o.barcode,
-            "price": float(o.price),
-            "quantity": o.quantity,
-            "amount": float(o.amount)
-        })
+    return JsonResponse({
+        "success": True,
+        "total_items": len(items),
+        "total_shortfall_items": sum(1 for item in items if item["shortfall"] > 0),
+        "items": items
+    })
+
+
+# --------------------------------------------------
+# REORDER SUGGESTIONS (CUSTOMER PURCHASE HISTORY)
+# --------------------------------------------------
+from app1.rollups import reorder_suggestions as customer_top_items
+
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+
+@require_http_methods(["GET"])
+def reorder_suggestions(request):
+    """
+    The items a customer buys most often, from their item orders and
+    sales, with typical quantity and last price. ?customer_code= ?limit=
+    """
+    payload, error = token_claims(request)
+    if error:
+        return JsonResponse({"success": False, "error": error}, status=401)
+
+    customer_code = request.GET.get("customer_code")
+    if not customer_code:
+        return JsonResponse({"success": False, "error": "customer_code is required"}, status=400)
+
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_SUGGESTIONS))
+    except ValueError:
+        return JsonResponse({"success": False, "error": "limit must be an integer"}, status=400)
+    limit = max(1, min(limit, MAX_SUGGESTIONS))
+
+    # ✅ One indexed read of the customer's precomputed history
+    items = customer_top_items(payload.get("client_id"), customer_code, limit)
 
     return JsonResponse({
         "success": True,
-        "total_orders": len(grouped_orders),
-        "orders": list(grouped_orders.values())
+        "customer_code": customer_code,
+        "total_items": len(items),
+        "items": items
     })
@@ -2,7 +2,7 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.db.models import Prefetch
 import jwt
-from django.conf import settings
+from app1.auth import authenticate
 from app1.models import AccDepartments
 
 from app1.models import (
@@ -29,10 +29,8 @@ def get_product_details(request):
             status=401
         )
 
-    token = auth_header.split(" ")[1]
-
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+        payload = authenticate(request).claims
         client_id = payload.get("client_id")
         if not client_id:
             return Response(
@@ -44,6 +42,20 @@ def get_product_details(request):
     except jwt.InvalidTokenError:
         return Response({"success": False, "error": "Invalid token"}, status=401)
 
+    result = product_catalog(client_id)
+
+    return Response(
+        {
+            "success": True,
+            "total": len(result),
+            "products": result,
+        },
+        status=200
+    )
+
+
+def product_catalog(client_id):
+    """Every active product of the tenant with batches, prices, photos and stock"""
     # ---------------- PRICE CODES ----------------
     price_codes = dict(
         AccPriceCode.objects.filter(client_id=client_id)
@@ -154,12 +166,4 @@ def get_product_details(request):
 
         result.append(pdata)
 
-    return Response(
-        {
-            "success": True,
-            "total": len(result),
-            "products": result,
-        },
-        status=200
-    )
-
+    return result
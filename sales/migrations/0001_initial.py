@@ -0,0 +1,45 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_id', models.CharField(editable=False, max_length=50)),
+                ('customer_name', models.CharField(max_length=200)),
+                ('customer_code', models.CharField(max_length=100)),
+                ('area', models.CharField(max_length=200)),
+                ('product_name', models.CharField(max_length=200)),
+                ('item_code', models.CharField(max_length=100)),
+                ('barcode', models.CharField(max_length=100)),
+                ('payment_type', models.CharField(max_length=50)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('client_id', models.CharField(max_length=100)),
+                ('username', models.CharField(max_length=100)),
+                ('remark', models.TextField(blank=True, null=True)),
+                ('device_id', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('uploaded to server', 'Uploaded to Server'), ('completed', 'Completed')], default='uploaded to server', max_length=30)),
+                ('status_changed_date', models.DateField(blank=True, null=True)),
+                ('status_changed_time', models.TimeField(blank=True, null=True)),
+                ('status_changed_by', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_date', models.DateField(auto_now_add=True)),
+                ('created_time', models.TimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sales',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 import uuid
 
-class Sales(models.Model):
+class SalesHeader(models.Model):
 
     STATUS_CHOICES = [
         ('uploaded to server', 'Uploaded to Server'),
@@ -14,23 +14,15 @@ class Sales(models.Model):
     customer_code = models.CharField(max_length=100)
     area = models.CharField(max_length=200)
 
-    product_name = models.CharField(max_length=200)
-    item_code = models.CharField(max_length=100)
-    barcode = models.CharField(max_length=100)
-
     payment_type = models.CharField(max_length=50)
-    price = models.DecimalField(max_digits=10, decimal_places=2)
-    quantity = models.DecimalField(
-        max_digits=10,
-        decimal_places=2
-    )
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
 
     client_id = models.CharField(max_length=100)
     username = models.CharField(max_length=100)
     remark = models.TextField(blank=True, null=True)
 
     device_id = models.CharField(max_length=100)
+    # ✅ Sent by the app; a retry with the same uuid returns the stored document
+    request_uuid = models.CharField(max_length=64, blank=True, null=True)
 
     # ✅ SAME AS ITEM_ORDERS
     status = models.CharField(
@@ -51,6 +43,50 @@ class Sales(models.Model):
             self.sales_id = f"SAL-{uuid.uuid4().hex[:10].upper()}"
         super().save(*args, **kwargs)
 
+    class Meta:
+        db_table = "sales_headers"
+        ordering = ['-id']
+        constraints = [
+            models.UniqueConstraint(fields=["client_id", "sales_id"], name="uniq_sales_header"),
+            models.UniqueConstraint(
+                fields=["client_id", "device_id", "request_uuid"],
+                condition=models.Q(request_uuid__isnull=False),
+                name="uniq_sales_request",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["client_id", "-id"], name="idx_sales_hdr_client"),
+            # Pending documents are what the back office lists all day
+            models.Index(
+                fields=["client_id", "-id"],
+                condition=models.Q(status="uploaded to server"),
+                name="idx_sales_hdr_pending",
+            ),
+        ]
+
+
+class Sales(models.Model):
+    """One line of a sale; the shared fields live on the header"""
+
+    header = models.ForeignKey(
+        SalesHeader,
+        on_delete=models.CASCADE,
+        related_name="lines"
+    )
+
+    product_name = models.CharField(max_length=200)
+    item_code = models.CharField(max_length=100)
+    barcode = models.CharField(max_length=100)
+
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.DecimalField(
+        max_digits=10,
+        decimal_places=2
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    client_id = models.CharField(max_length=100)
+
     class Meta:
         db_table = "sales"
         ordering = ['-id']
@@ -1,3 +1,59 @@
+import json
+from datetime import datetime, timedelta
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+
+CLIENT_ID = "test-client"
+
+
+def make_token(username="alice", role="User", client_id=CLIENT_ID):
+    return jwt.encode({
+        "user_id": username,
+        "username": username,
+        "client_id": client_id,
+        "role": role,
+        "accountcode": "",
+        "exp": datetime.utcnow() + timedelta(hours=1),
+        "iat": datetime.utcnow(),
+    }, settings.SECRET_KEY, algorithm="HS256")
+
+
+class SalesListTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {make_token()}"}
+
+    def create_sale(self):
+        body = {
+            "device_id": "device-1",
+            "customer_code": "C001",
+            "customer_name": "Corner Shop",
+            "username": "alice",
+            "area": "NORTH",
+            "payment_type": "Cash",
+            "items": [
+                {"product_name": "Soap", "item_code": "P001", "barcode": "B001",
+                 "price": "10.00", "quantity": "2", "amount": "20.00"},
+            ],
+        }
+        response = self.client.post(
+            "/api/sales/create", json.dumps(body), content_type="application/json", **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_keeps_the_decimal_quantity_and_the_full_total(self):
+        for _ in range(3):
+            self.create_sale()
+
+        body = self.client.get("/api/sales/list?limit=1&with_total=1", **self.auth).json()
+
+        self.assertEqual(body["total_sales"], 3)
+        self.assertEqual(body["page_count"], 1)
+        item = body["sales"][0]["items"][0]
+        self.assertEqual(item["quantity"], "2.00")
+        self.assertEqual(item["amount"], 20.0)
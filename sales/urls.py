@@ -6,4 +6,5 @@ urlpatterns = [
     path("list", views.sales_list, name="sales_list"),
     path("list-all", views.sales_list_all, name="sales_list_all"),
     path("status-change", views.change_sales_status, name="change_sales_status"),
+    path("status-change/bulk", views.change_sales_status_bulk, name="change_sales_status_bulk"),
 ]
@@ -1,56 +1,38 @@
 import json
-import jwt
-from django.conf import settings
+from app1.auth import token_claims
 from django.http import JsonResponse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from rest_framework.response import Response
-from .models import Sales
+from .models import Sales, SalesHeader
+from app1.documents import (
+    DOCUMENT_STATUSES, DocumentValidationError, new_document_id,
+    parse_bulk_keys, set_document_status, write_document
+)
+from app1.document_lists import document_count, document_filters, document_page
+from app1.order_checks import OrderLineCheck
 
 
 # --------------------------------------------------
-# TOKEN VALIDATION
+# CREATE SALES (POST)
 # --------------------------------------------------
-import jwt
-from django.conf import settings
-
-
-def get_client_from_token(request):
-    auth_header = request.META.get('HTTP_AUTHORIZATION')
-
-    if not auth_header:
-        return None, "Authorization header missing"
-
-    if not auth_header.startswith("Bearer "):
-        return None, "Invalid authorization format"
-
-    token = auth_header.split(" ", 1)[1]
-
-    try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=["HS256"]
-        )
-        return payload, None
-
-    except jwt.ExpiredSignatureError:
-        return None, "Token expired"
+# model field -> key in each item sent by the app
+SALES_LINE_FIELDS = {
+    "product_name": "product_name",
+    "item_code": "item_code",
+    "barcode": "barcode",
+    "price": "price",
+    "quantity": "quantity",
+    "amount": "amount",
+}
 
-    except jwt.InvalidTokenError:
-        return None, "Invalid token"
 
-
-
-# --------------------------------------------------
-# CREATE SALES (POST)
-# --------------------------------------------------
 @csrf_exempt
 @require_http_methods(["POST"])
 def create_sales(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
-        return error
+        return JsonResponse({"success": False, "error": error}, status=401)
 
     try:
         data = json.loads(request.body)
@@ -62,56 +44,66 @@ def create_sales(request):
             }, status=400)
 
         items = data.get("items", [])
-        if not items:
+        if not items or not isinstance(items, list):
             return JsonResponse({
                 "success": False,
                 "error": "items list is required"
             }, status=400)
 
-        # ✅ Generate ONE sales_id
-        import uuid
-        sales_id = f"SAL-{uuid.uuid4().hex[:10].upper()}"
-
-        created_items = []
-
-        for item in items:
-            sale = Sales.objects.create(
-                sales_id=sales_id,
-
-                customer_name=data.get("customer_name"),
-                customer_code=data.get("customer_code"),
-                area=data.get("area"),
-
-                product_name=item.get("product_name"),
-                item_code=item.get("item_code"),
-                barcode=item.get("barcode"),
-
-                payment_type=data.get("payment_type"),
-                price=item.get("price"),
-                quantity=item.get("quantity"),
-                amount=item.get("amount"),
-
-                client_id=payload.get("client_id"),
-                username=data.get("username"),
-                remark=data.get("remark"),
-
-                device_id=data.get("device_id")
-            )
+        # ✅ Generate ONE sales_id (a retried request_uuid keeps the stored one)
+        sales_id = new_document_id("SAL")
+
+        # ✅ Prices checked against the batch prices, stock against pending orders (warnings only)
+        line_check = OrderLineCheck(payload.get("client_id"), payload.get("username"))
+
+        # ✅ Everything validated first, then header + lines stored in one transaction
+        header, sales, created = write_document(
+            SalesHeader,
+            Sales,
+            header={
+                "sales_id": sales_id,
+                "customer_name": data.get("customer_name"),
+                "customer_code": data.get("customer_code"),
+                "area": data.get("area"),
+                "payment_type": data.get("payment_type"),
+                "client_id": payload.get("client_id"),
+                "username": data.get("username"),
+                "remark": data.get("remark"),
+                "device_id": data.get("device_id"),
+                "request_uuid": data.get("request_uuid"),
+            },
+            lines=items,
+            line_fields=SALES_LINE_FIELDS,
+            check=line_check,
+        )
 
-            created_items.append({
+        created_items = [
+            {
                 "product_name": sale.product_name,
                 "item_code": sale.item_code,
-                "quantity": sale.quantity,
+                "quantity": float(sale.quantity),
                 "amount": float(sale.amount)
-            })
+            }
+            for sale in sales
+        ]
 
         return JsonResponse({
             "success": True,
             "message": "Sales created successfully",
-            "sales_id": sales_id,
+            "sales_id": header.sales_id,
+            "replayed": not created,
+            "price_warnings": line_check.price_warnings,
+            "stock_warnings": line_check.stock_warnings,
             "items": created_items
         })
 
+    except DocumentValidationError as e:
+        return JsonResponse({
+            "success": False,
+            "error": "Invalid sales items",
+            "details": e.errors
+        }, status=400)
+
     except Exception as e:
         return JsonResponse({
             "success": False,
@@ -119,72 +111,70 @@ def create_sales(request):
         }, status=400)
 
 
-
-
-
 # --------------------------------------------------
 # LIST SALES (GET)
 # --------------------------------------------------
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+
+# Columns of the list responses (item key -> line column)
+SALES_COLUMNS = ["sales_id", "customer_name", "customer_code", "area", "payment_type", "username", "remark"]
+SALES_ITEM_COLUMNS = {
+    "product_name": "product_name",
+    "item_code": "item_code",
+    "barcode": "barcode",
+    "price": "price",
+    "quantity": "quantity",
+    "amount": "amount",
+}
 
 @require_http_methods(["GET"])
 def sales_list(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
         return JsonResponse({"success": False, "error": error}, status=401)
 
-    client_id = payload.get("client_id")
+    try:
+        filters = document_filters(request)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
 
     # ✅ SHOW ONLY "uploaded to server"
-    sales = Sales.objects.filter(
-        client_id=client_id,
-        status="uploaded to server"
-    ).order_by('-id')
-
-    grouped_sales = {}
-
-    for s in sales:
-        if s.sales_id not in grouped_sales:
-            grouped_sales[s.sales_id] = {
-                "sales_id": s.sales_id,
-                "customer_name": s.customer_name,
-                "customer_code": s.customer_code,
-                "area": s.area,
-                "payment_type": s.payment_type,
-                "username": s.username,
-                "remark": s.remark,
-                "created_date": s.created_date.strftime('%Y-%m-%d'),
-                "created_time": s.created_time.strftime('%H:%M:%S'),
-                "items": []
-            }
-
-        grouped_sales[s.sales_id]["items"].append({
-            "product_name": s.product_name,
-            "item_code": s.item_code,
-            "barcode": s.barcode,
-            "price": float(s.price),
-            "quantity": s.quantity,
-            "amount": float(s.amount)
-        })
+    filters["status"] = "uploaded to server"
+
+    # ✅ Grouped and paginated in SQL (keyset on header id)
+    sales, next_cursor = document_page(
+        SalesHeader,
+        Sales,
+        payload.get("client_id"),
+        filters,
+        SALES_COLUMNS,
+        SALES_ITEM_COLUMNS,
+    )
 
     return JsonResponse({
         "success": True,
-        "total_sales": len(grouped_sales),
-        "sales": list(grouped_sales.values())
+        "total_sales": document_count(SalesHeader, payload.get("client_id"), filters),
+        "page_count": len(sales),
+        "sales": sales,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     })
 
 
-from django.utils import timezone
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-import json
-from django.http import JsonResponse
-from .models import Sales
+def _status_assignments(payload, status_value):
+    """Header columns written by a status change (same audit fields as before)"""
+    now = timezone.localtime()
+    return {
+        "status": status_value,
+        "status_changed_date": now.date(),
+        "status_changed_time": now.time(),
+        "status_changed_by": payload.get("username") or payload.get("user") or "system",
+    }
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def change_sales_status(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
         return JsonResponse({"success": False, "error": error}, status=401)
 
@@ -196,95 +186,117 @@ def change_sales_status(request):
     sales_id = data.get("sales_id")
     status_value = data.get("status")
 
-    ALLOWED_STATUSES = ["uploaded to server", "completed"]
-
     if not sales_id or not status_value:
         return JsonResponse({
             "success": False,
             "error": "sales_id and status are required"
         }, status=400)
 
-    if status_value not in ALLOWED_STATUSES:
+    if status_value not in DOCUMENT_STATUSES:
         return JsonResponse({
             "success": False,
-            "error": f"Invalid status. Allowed: {ALLOWED_STATUSES}"
+            "error": f"Invalid status. Allowed: {DOCUMENT_STATUSES}"
         }, status=400)
 
-    sales = Sales.objects.filter(
-        sales_id=sales_id,
-        client_id=payload.get("client_id")
+    # ✅ One UPDATE on the header row, line count from RETURNING
+    updated = set_document_status(
+        SalesHeader, Sales, "sales_id",
+        payload.get("client_id"), [str(sales_id)],
+        _status_assignments(payload, status_value)
     )
 
-    if not sales.exists():
+    if str(sales_id) not in updated:
         return JsonResponse({
             "success": False,
             "error": "Sales not found"
         }, status=404)
 
-    now = timezone.localtime()
-
-    sales.update(
-        status=status_value,
-        status_changed_date=now.date(),
-        status_changed_time=now.time(),
-        status_changed_by=payload.get("username") or payload.get("user") or "system"
-    )
-
     return JsonResponse({
         "success": True,
         "message": "Sales status updated successfully",
         "sales_id": sales_id,
-        "total_items_updated": sales.count(),
+        "total_items_updated": updated[str(sales_id)],
         "status": status_value
     })
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def change_sales_status_bulk(request):
+    """
+    Set one status on many sales:
+    { "sales_ids": ["…", "…"], "status": "completed" }
+    Returns one result per id, in request order.
+    """
+    payload, error = token_claims(request)
+    if error:
+        return JsonResponse({"success": False, "error": error}, status=401)
+
+    try:
+        data = json.loads(request.body)
+    except Exception:
+        return JsonResponse({"success": False, "error": "Invalid JSON"}, status=400)
+
+    try:
+        keys = parse_bulk_keys(data, "sales_ids")
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    status_value = data.get("status")
+    if status_value not in DOCUMENT_STATUSES:
+        return JsonResponse({
+            "success": False,
+            "error": f"Invalid status. Allowed: {DOCUMENT_STATUSES}"
+        }, status=400)
+
+    updated = set_document_status(
+        SalesHeader, Sales, "sales_id",
+        payload.get("client_id"), keys,
+        _status_assignments(payload, status_value)
+    )
+
+    results = [
+        {"sales_id": key, "updated": True, "total_items_updated": updated[key]}
+        if key in updated else
+        {"sales_id": key, "updated": False, "error": "Sales not found"}
+        for key in keys
+    ]
+
+    return JsonResponse({
+        "success": True,
+        "status": status_value,
+        "total_updated": len(updated),
+        "results": results
+    })
 
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
 
 @require_http_methods(["GET"])
 def sales_list_all(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
         return JsonResponse({"success": False, "error": error}, status=401)
 
-    client_id = payload.get("client_id")
-
-    # ✅ NO status filter → show ALL
-    sales = Sales.objects.filter(
-        client_id=client_id
-    ).order_by('-id')
-
-    grouped_sales = {}
-
-    for s in sales:
-        if s.sales_id not in grouped_sales:
-            grouped_sales[s.sales_id] = {
-                "sales_id": s.sales_id,
-                "customer_name": s.customer_name,
-                "customer_code": s.customer_code,
-                "area": s.area,
-                "payment_type": s.payment_type,
-                "username": s.username,
-                "remark": s.remark,
-                "status": s.status,  # ✅ include status
-                "created_date": s.created_date.strftime('%Y-%m-%d'),
-                "created_time": s.created_time.strftime('%H:%M:%S'),
-                "items": []
-            }
-
-        grouped_sales[s.sales_id]["items"].append({
-            "product_name": s.product_name,
-            "item_code": s.item_code,
-            "barcode": s.barcode,
-            "price": float(s.price),
-            "quantity": s.quantity,
-            "amount": float(s.amount)
-        })
+    try:
+        filters = document_filters(request)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    # ✅ NO status filter → show ALL (unless ?status= is given)
+    # ✅ Grouped and paginated in SQL (keyset on header id)
+    sales, next_cursor = document_page(
+        SalesHeader,
+        Sales,
+        payload.get("client_id"),
+        filters,
+        SALES_COLUMNS + ["status"],
+        SALES_ITEM_COLUMNS,
+    )
 
     return JsonResponse({
         "success": True,
-        "total_sales": len(grouped_sales),
-        "sales": list(grouped_sales.values())
+        "total_sales": document_count(SalesHeader, payload.get("client_id"), filters),
+        "page_count": len(sales),
+        "sales": sales,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     })
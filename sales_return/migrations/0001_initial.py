@@ -0,0 +1,40 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesReturn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(editable=False, max_length=50)),
+                ('customer_name', models.CharField(max_length=200)),
+                ('customer_code', models.CharField(max_length=100)),
+                ('area', models.CharField(max_length=200)),
+                ('product_name', models.CharField(max_length=200)),
+                ('item_code', models.CharField(max_length=100)),
+                ('barcode', models.CharField(max_length=100)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('product_remark', models.TextField(blank=True, null=True)),
+                ('client_id', models.CharField(max_length=100)),
+                ('username', models.CharField(max_length=100)),
+                ('device_id', models.CharField(max_length=100)),
+                ('status', models.CharField(default='uploaded to server', max_length=30)),
+                ('created_date', models.DateField(auto_now_add=True)),
+                ('created_time', models.TimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sales_return',
+            },
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+HEADER_COLUMNS = [
+    "order_id", "customer_name", "customer_code", "area",
+    "client_id", "username", "device_id", "status",
+    "created_date", "created_time",
+]
+
+# One header per (client_id, order_id), taken from the return's first line
+BACKFILL_HEADERS = f"""
+INSERT INTO sales_return_headers ({", ".join(HEADER_COLUMNS)})
+SELECT DISTINCT ON (client_id, order_id) {", ".join(HEADER_COLUMNS)}
+FROM sales_return
+ORDER BY client_id, order_id, id;
+
+UPDATE sales_return l
+SET header_id = h.id
+FROM sales_return_headers h
+WHERE h.client_id = l.client_id AND h.order_id = l.order_id;
+
+SET CONSTRAINTS ALL IMMEDIATE;
+"""
+
+# Header columns dropped from the lines: (name, type, nullable)
+LINE_COLUMNS = [
+    ("order_id", "varchar(50)", False),
+    ("customer_name", "varchar(200)", False),
+    ("customer_code", "varchar(100)", False),
+    ("area", "varchar(200)", False),
+    ("username", "varchar(100)", False),
+    ("device_id", "varchar(100)", False),
+    ("status", "varchar(30)", False),
+    ("created_date", "date", False),
+    ("created_time", "time", False),
+]
+
+DROP_LINE_COLUMNS = "ALTER TABLE sales_return " + ", ".join(
+    f"DROP COLUMN {name}" for name, _, _ in LINE_COLUMNS
+)
+
+# Reverse: re-added as NULL, filled by RESTORE_LINE_COLUMNS, then tightened
+ADD_LINE_COLUMNS = "ALTER TABLE sales_return " + ", ".join(
+    f"ADD COLUMN {name} {sql_type} NULL" for name, sql_type, _ in LINE_COLUMNS
+)
+
+# Reverse: copy the header fields back onto every line
+RESTORE_LINE_COLUMNS = f"""
+UPDATE sales_return l
+SET {", ".join(f"{c} = h.{c}" for c in HEADER_COLUMNS)}
+FROM sales_return_headers h
+WHERE h.id = l.header_id;
+
+SET CONSTRAINTS ALL IMMEDIATE;
+""" + "ALTER TABLE sales_return " + ", ".join(
+    f"ALTER COLUMN {name} SET NOT NULL" for name, _, nullable in LINE_COLUMNS if not nullable
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_return', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesReturnHeader',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(editable=False, max_length=50)),
+                ('customer_name', models.CharField(max_length=200)),
+                ('customer_code', models.CharField(max_length=100)),
+                ('area', models.CharField(max_length=200)),
+                ('client_id', models.CharField(max_length=100)),
+                ('username', models.CharField(max_length=100)),
+                ('device_id', models.CharField(max_length=100)),
+                ('status', models.CharField(default='uploaded to server', max_length=30)),
+                ('created_date', models.DateField(auto_now_add=True)),
+                ('created_time', models.TimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sales_return_headers',
+                'indexes': [models.Index(fields=['client_id', '-id'], name='idx_sales_return_hdr_client')],
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'order_id'), name='uniq_sales_return_header')],
+            },
+        ),
+        migrations.AddField(
+            model_name='salesreturn',
+            name='header',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='sales_return.salesreturnheader'),
+        ),
+        migrations.RunSQL(BACKFILL_HEADERS, RESTORE_LINE_COLUMNS),
+        migrations.AlterField(
+            model_name='salesreturn',
+            name='header',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='sales_return.salesreturnheader'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(DROP_LINE_COLUMNS, ADD_LINE_COLUMNS),
+            ],
+            state_operations=[
+                migrations.RemoveField(model_name='salesreturn', name='order_id'),
+                migrations.RemoveField(model_name='salesreturn', name='customer_name'),
+                migrations.RemoveField(model_name='salesreturn', name='customer_code'),
+                migrations.RemoveField(model_name='salesreturn', name='area'),
+                migrations.RemoveField(model_name='salesreturn', name='username'),
+                migrations.RemoveField(model_name='salesreturn', name='device_id'),
+                migrations.RemoveField(model_name='salesreturn', name='status'),
+                migrations.RemoveField(model_name='salesreturn', name='created_date'),
+                migrations.RemoveField(model_name='salesreturn', name='created_time'),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_return', '0003_salesreturnheader_request_uuid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesreturnheader',
+            index=models.Index(condition=models.Q(('status', 'uploaded to server')), fields=['client_id', '-id'], name='idx_sales_return_hdr_pending'),
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 import uuid
 
-class SalesReturn(models.Model):
+class SalesReturnHeader(models.Model):
 
     order_id = models.CharField(max_length=50, editable=False)
 
@@ -9,6 +9,50 @@ class SalesReturn(models.Model):
     customer_code = models.CharField(max_length=100)
     area = models.CharField(max_length=200)
 
+    client_id = models.CharField(max_length=100)
+    username = models.CharField(max_length=100)
+    device_id = models.CharField(max_length=100)
+    # ✅ Sent by the app; a retry with the same uuid returns the stored document
+    request_uuid = models.CharField(max_length=64, blank=True, null=True)
+
+    status = models.CharField(
+        max_length=30,
+        default="uploaded to server"
+    )
+
+    created_date = models.DateField(auto_now_add=True)
+    created_time = models.TimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "sales_return_headers"
+        constraints = [
+            models.UniqueConstraint(fields=["client_id", "order_id"], name="uniq_sales_return_header"),
+            models.UniqueConstraint(
+                fields=["client_id", "device_id", "request_uuid"],
+                condition=models.Q(request_uuid__isnull=False),
+                name="uniq_sales_return_request",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["client_id", "-id"], name="idx_sales_return_hdr_client"),
+            # Pending documents are what the back office lists all day
+            models.Index(
+                fields=["client_id", "-id"],
+                condition=models.Q(status="uploaded to server"),
+                name="idx_sales_return_hdr_pending",
+            ),
+        ]
+
+
+class SalesReturn(models.Model):
+    """One returned line; the shared fields live on the header"""
+
+    header = models.ForeignKey(
+        SalesReturnHeader,
+        on_delete=models.CASCADE,
+        related_name="lines"
+    )
+
     product_name = models.CharField(max_length=200)
     item_code = models.CharField(max_length=100)
     barcode = models.CharField(max_length=100)
@@ -23,17 +67,6 @@ class SalesReturn(models.Model):
     product_remark = models.TextField(blank=True, null=True)  # ✅ NEW
 
     client_id = models.CharField(max_length=100)
-    username = models.CharField(max_length=100)
-    device_id = models.CharField(max_length=100)
-
-    status = models.CharField(
-        max_length=30,
-        default="uploaded to server"
-    )
-
-    created_date = models.DateField(auto_now_add=True)
-    created_time = models.TimeField(auto_now_add=True)
 
     class Meta:
         db_table = "sales_return"
-
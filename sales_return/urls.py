@@ -6,4 +6,5 @@ urlpatterns = [
     path("list", views.sales_return_list),
     path("list-all", views.sales_return_list_all),
     path("status-change", views.sales_return_status_change),
+    path("status-change/bulk", views.sales_return_status_change_bulk),
 ]
\ No newline at end of file
@@ -1,38 +1,33 @@
 import json
-import jwt
-import uuid
-from django.conf import settings
+from app1.auth import token_claims
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.utils import timezone
 
-from .models import SalesReturn
-
-
-# ---------------- TOKEN ----------------
-def get_client_from_token(request):
-    auth_header = request.META.get('HTTP_AUTHORIZATION')
-
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return None, "Invalid authorization header"
-
-    token = auth_header.split(" ", 1)[1]
-
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        return payload, None
-    except jwt.ExpiredSignatureError:
-        return None, "Token expired"
-    except jwt.InvalidTokenError:
-        return None, "Invalid token"
+from .models import SalesReturn, SalesReturnHeader
+from app1.documents import (
+    DOCUMENT_STATUSES, DocumentValidationError, new_document_id,
+    parse_bulk_keys, set_document_status, write_document
+)
+from app1.document_lists import document_count, document_filters, document_page
 
 
 # ---------------- CREATE SALES RETURN ----------------
+# model field -> key in each item sent by the app
+RETURN_LINE_FIELDS = {
+    "product_name": "product_name",
+    "item_code": "item_code",
+    "barcode": "barcode",
+    "price": "price",
+    "quantity": "quantity",
+    "amount": "amount",
+    "product_remark": "remark",  # ✅ ITEM-LEVEL REMARK
+}
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def create_sales_return(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
         return JsonResponse({"success": False, "error": error}, status=401)
 
@@ -42,139 +37,141 @@ def create_sales_return(request):
         return JsonResponse({"success": False, "error": "Invalid JSON"}, status=400)
 
     items = data.get("items", [])
-    if not items:
+    if not items or not isinstance(items, list):
         return JsonResponse({"success": False, "error": "items required"}, status=400)
 
-    order_id = f"SR-{uuid.uuid4().hex[:10].upper()}"
+    # a retried request_uuid keeps the stored order_id
+    order_id = new_document_id("SR")
 
-    created_items = []
-
-    for item in items:
-        sr = SalesReturn.objects.create(
-            order_id=order_id,
-
-            customer_name=data.get("customer_name"),
-            customer_code=data.get("customer_code"),
-            area=data.get("area"),
-
-            product_name=item.get("product_name"),
-            item_code=item.get("item_code"),
-            barcode=item.get("barcode"),
-
-            price=item.get("price"),
-            quantity=item.get("quantity"),
-            amount=item.get("amount"),
-
-            # ✅ ITEM-LEVEL REMARK
-            product_remark=item.get("remark"),
-
-            client_id=payload.get("client_id"),
-            username=data.get("username"),
-            device_id=data.get("device_id")
+    # ✅ Everything validated first, then header + lines stored in one transaction
+    try:
+        header, returns, created = write_document(
+            SalesReturnHeader,
+            SalesReturn,
+            header={
+                "order_id": order_id,
+                "customer_name": data.get("customer_name"),
+                "customer_code": data.get("customer_code"),
+                "area": data.get("area"),
+                "client_id": payload.get("client_id"),
+                "username": data.get("username"),
+                "device_id": data.get("device_id"),
+                "request_uuid": data.get("request_uuid"),
+            },
+            lines=items,
+            line_fields=RETURN_LINE_FIELDS,
         )
+    except DocumentValidationError as e:
+        return JsonResponse({
+            "success": False,
+            "error": "Invalid return items",
+            "details": e.errors
+        }, status=400)
 
-        created_items.append({
+    created_items = [
+        {
             "product_name": sr.product_name,
             "item_code": sr.item_code,
-            "quantity": sr.quantity,
+            "quantity": float(sr.quantity),
             "amount": float(sr.amount),
             "remark": sr.product_remark
-        })
+        }
+        for sr in returns
+    ]
 
     return JsonResponse({
         "success": True,
-        "order_id": order_id,
+        "order_id": header.order_id,
+        "replayed": not created,
         "items": created_items
     })
 
 
 # ---------------- LIST (UPLOADED ONLY) ----------------
+# Columns of the list responses (item key -> line column)
+RETURN_COLUMNS = ["order_id", "customer_name", "customer_code", "area", "username", "status"]
+RETURN_ITEM_COLUMNS = {
+    "product_name": "product_name",
+    "item_code": "item_code",
+    "barcode": "barcode",
+    "price": "price",
+    "quantity": "quantity",
+    "amount": "amount",
+    "remark": "product_remark",  # ✅ SHOW ITEM REMARK
+}
+
+
 @require_http_methods(["GET"])
 def sales_return_list(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
         return JsonResponse({"success": False, "error": error}, status=401)
 
-    returns = SalesReturn.objects.filter(
-        client_id=payload.get("client_id"),
-        status="uploaded to server"
-    ).order_by('-id')
-
-    grouped = {}
-
-    for r in returns:
-        grouped.setdefault(r.order_id, {
-            "order_id": r.order_id,
-            "customer_name": r.customer_name,
-            "customer_code": r.customer_code,
-            "area": r.area,
-            "username": r.username,
-            "status": r.status,
-            "created_date": r.created_date.strftime('%Y-%m-%d'),
-            "created_time": r.created_time.strftime('%H:%M:%S'),
-            "items": []
-        })["items"].append({
-            "product_name": r.product_name,
-            "item_code": r.item_code,
-            "barcode": r.barcode,
-            "price": float(r.price),
-            "quantity": r.quantity,
-            "amount": float(r.amount),
-            "remark": r.product_remark   # ✅ SHOW ITEM REMARK
-        })
+    try:
+        filters = document_filters(request)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    # SHOW ONLY "uploaded to server"
+    filters["status"] = "uploaded to server"
+
+    # ✅ Grouped and paginated in SQL (keyset on header id)
+    returns, next_cursor = document_page(
+        SalesReturnHeader,
+        SalesReturn,
+        payload.get("client_id"),
+        filters,
+        RETURN_COLUMNS,
+        RETURN_ITEM_COLUMNS,
+    )
 
     return JsonResponse({
         "success": True,
-        "total": len(grouped),
-        "returns": list(grouped.values())
+        "total": document_count(SalesReturnHeader, payload.get("client_id"), filters),
+        "page_count": len(returns),
+        "returns": returns,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     })
 
 
 
 @require_http_methods(["GET"])
 def sales_return_list_all(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
         return JsonResponse({"success": False, "error": error}, status=401)
 
-    returns = SalesReturn.objects.filter(
-        client_id=payload.get("client_id")
-    ).order_by('-id')
-
-    grouped = {}
-
-    for r in returns:
-        grouped.setdefault(r.order_id, {
-            "order_id": r.order_id,
-            "customer_name": r.customer_name,
-            "customer_code": r.customer_code,
-            "area": r.area,
-            "username": r.username,
-            "status": r.status,
-            "created_date": r.created_date.strftime('%Y-%m-%d'),
-            "created_time": r.created_time.strftime('%H:%M:%S'),
-            "items": []
-        })["items"].append({
-            "product_name": r.product_name,
-            "item_code": r.item_code,
-            "barcode": r.barcode,
-            "price": float(r.price),
-            "quantity": r.quantity,
-            "amount": float(r.amount),
-            "remark": r.product_remark
-        })
+    try:
+        filters = document_filters(request)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    # ✅ NO status filter → show ALL (unless ?status= is given)
+    # ✅ Grouped and paginated in SQL (keyset on header id)
+    returns, next_cursor = document_page(
+        SalesReturnHeader,
+        SalesReturn,
+        payload.get("client_id"),
+        filters,
+        RETURN_COLUMNS,
+        RETURN_ITEM_COLUMNS,
+    )
 
     return JsonResponse({
         "success": True,
-        "total": len(grouped),
-        "returns": list(grouped.values())
+        "total": document_count(SalesReturnHeader, payload.get("client_id"), filters),
+        "page_count": len(returns),
+        "returns": returns,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     })
 
 # ---------------- STATUS CHANGE ----------------
 @csrf_exempt
 @require_http_methods(["POST"])
 def sales_return_status_change(request):
-    payload, error = get_client_from_token(request)
+    payload, error = token_claims(request)
     if error:
         return JsonResponse({"success": False, "error": error}, status=401)
 
@@ -186,40 +183,84 @@ def sales_return_status_change(request):
     order_id = data.get("order_id")
     status_value = data.get("status")
 
-    ALLOWED_STATUSES = ["uploaded to server", "completed"]
-
     if not order_id or not status_value:
         return JsonResponse({
             "success": False,
             "error": "order_id and status are required"
         }, status=400)
 
-    if status_value not in ALLOWED_STATUSES:
+    if status_value not in DOCUMENT_STATUSES:
         return JsonResponse({
             "success": False,
-            "error": f"Invalid status. Allowed: {ALLOWED_STATUSES}"
+            "error": f"Invalid status. Allowed: {DOCUMENT_STATUSES}"
         }, status=400)
 
-    qs = SalesReturn.objects.filter(
-        order_id=order_id,
-        client_id=payload.get("client_id")
+    # ✅ One UPDATE on the header row
+    updated = set_document_status(
+        SalesReturnHeader, SalesReturn, "order_id",
+        payload.get("client_id"), [str(order_id)],
+        {"status": status_value}
     )
 
-    if not qs.exists():
+    if str(order_id) not in updated:
         return JsonResponse({
             "success": False,
             "error": "Invalid order_id"
         }, status=404)
 
-    now = timezone.localtime()
-
-    qs.update(
-        status=status_value
-    )
-
     return JsonResponse({
         "success": True,
         "message": "Status updated successfully",
         "order_id": order_id,
         "status": status_value
     })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def sales_return_status_change_bulk(request):
+    """
+    Set one status on many returns:
+    { "order_ids": ["…", "…"], "status": "completed" }
+    Returns one result per id, in request order.
+    """
+    payload, error = token_claims(request)
+    if error:
+        return JsonResponse({"success": False, "error": error}, status=401)
+
+    try:
+        data = json.loads(request.body)
+    except Exception:
+        return JsonResponse({"success": False, "error": "Invalid JSON"}, status=400)
+
+    try:
+        keys = parse_bulk_keys(data, "order_ids")
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    status_value = data.get("status")
+    if status_value not in DOCUMENT_STATUSES:
+        return JsonResponse({
+            "success": False,
+            "error": f"Invalid status. Allowed: {DOCUMENT_STATUSES}"
+        }, status=400)
+
+    updated = set_document_status(
+        SalesReturnHeader, SalesReturn, "order_id",
+        payload.get("client_id"), keys,
+        {"status": status_value}
+    )
+
+    results = [
+        {"order_id": key, "updated": True, "total_items_updated": updated[key]}
+        if key in updated else
+        {"order_id": key, "updated": False, "error": "Invalid order_id"}
+        for key in keys
+    ]
+
+    return JsonResponse({
+        "success": True,
+        "status": status_value,
+        "total_updated": len(updated),
+        "results": results
+    })
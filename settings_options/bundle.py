@@ -0,0 +1,150 @@
+"""
+The settings bundle every device fetches: the tenant's options plus price
+codes, users and sales types.
+
+Assembling it costs four queries, so it is cached per tenant under its
+settings_version. The version is bumped whenever something in the bundle
+changes - settings / logo / bank QR saves in this app, and rows of
+acc_users, acc_pricecode or acc_sales_types written by the ERP sync
+(triggers, see migration 0003) - so a cached bundle is never stale and
+never needs deleting. The version is also the ETag: a device sending it
+back in If-None-Match gets 304 after one indexed lookup.
+
+A query that fails leaves its list empty. Such a bundle is still
+returned, but it is neither cached nor given the version's ETag: the
+next request builds it again instead of serving the gap for a day.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+
+from .models import SettingsOptions
+
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_TIMEOUT = 24 * 60 * 60  # seconds; a newer version uses a new key anyway
+
+
+def settings_version(client_id):
+    """The tenant's current settings version (creates the options row)"""
+    version = SettingsOptions.objects.filter(client_id=client_id).values_list(
+        "settings_version", flat=True
+    ).first()
+    if version is None:
+        options, _ = SettingsOptions.objects.get_or_create(client_id=client_id)
+        version = options.settings_version
+    return version
+
+
+def next_version(options):
+    """Make options.save() bump the version in the same UPDATE"""
+    options.settings_version = F("settings_version") + 1
+
+
+def bundle_etag(client_id, version):
+    return f'"settings-{client_id}-{version}"'
+
+
+def _rows(sql_query, client_id, label, failed):
+    """The query's rows; on error [] and label is added to failed"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql_query, [client_id])
+            return cursor.fetchall()
+    except Exception:
+        logger.exception("settings bundle: %s query failed for %s", label, client_id)
+        failed.append(label)
+        return []
+
+
+def build_settings_bundle(client_id):
+    """(bundle, labels of the queries that failed)"""
+    options, _ = SettingsOptions.objects.get_or_create(client_id=client_id)
+    failed = []
+
+    # -------- PRICE CODES --------
+    price_codes = [
+        {"code": code, "name": name}
+        for code, name in _rows("""
+            SELECT code, name
+            FROM acc_pricecode
+            WHERE client_id = %s
+            ORDER BY name
+        """, client_id, "price codes", failed)
+    ]
+
+    # -------- USERS (id = username, include role) --------
+    remote_allowed = options.remote_punchin_users or []
+    users = [
+        {
+            "id": user_id,
+            "username": user_id,
+            "role": role,
+            "remote_punchin_allow": user_id in remote_allowed
+        }
+        for user_id, role in _rows("""
+            SELECT id, role
+            FROM acc_users
+            WHERE client_id = %s
+            ORDER BY id
+        """, client_id, "users", failed)
+    ]
+
+    # -------- USER TYPES --------
+    # If a specific type is selected, output just that one. Otherwise, output all.
+    if options.user_type and options.user_type != "All":
+        user_types = [options.user_type]
+    else:
+        user_types = [
+            name for (name,) in _rows("""
+                SELECT DISTINCT name
+                FROM acc_sales_types
+                WHERE client_id = %s
+                AND name IS NOT NULL
+                AND TRIM(name) != ''
+                ORDER BY name
+            """, client_id, "user types", failed)
+        ]
+
+    bundle = {
+        "client_id": client_id,
+        "order_rate_editable": options.order_rate_editable,
+        "read_price_category": options.read_price_category,
+        "barcode_based_list": options.barcode_based_list,
+        "default_price_code": options.default_price_code,
+        "protected_price_users": options.protected_price_users,
+        "remote_punchin_users": options.remote_punchin_users,
+
+        "default_print_form": options.default_print_form,
+        "tax_type": options.tax_type,
+        "user_type": options.user_type,
+
+        "price_codes": price_codes,
+        "users": users,
+        "user_types": user_types,
+        "settings_version": options.settings_version
+    }
+    return bundle, failed
+
+
+def get_settings_bundle(client_id, version):
+    """
+    (bundle, complete) for this version, from the cache or freshly built.
+    An incomplete bundle (a query failed) is not cached.
+    """
+    key = f"settings_bundle:{client_id}:{version}"
+    bundle = cache.get(key)
+    if bundle is not None:
+        return bundle, True
+
+    bundle, failed = build_settings_bundle(client_id)
+    if failed:
+        return bundle, False
+    # A bump between reading the version and building: cache under
+    # the version actually built, so no key holds older data
+    key = f"settings_bundle:{client_id}:{bundle['settings_version']}"
+    cache.set(key, bundle, BUNDLE_TIMEOUT)
+    return bundle, True
@@ -0,0 +1,36 @@
+"""
+Run the developer-options purges queued by the API (settings_options.purge).
+
+    python manage.py run_purges             # pending jobs, then exit (cron)
+    python manage.py run_purges --loop      # keep polling (a service)
+
+Jobs left running by a crashed or restarted runner are resumed once they
+have not moved for PURGE_STALE_AFTER. Several runners may be started;
+each job is worked on by one of them at a time.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from settings_options.models import PurgeJob
+from settings_options.purge import run_pending_purges
+
+
+class Command(BaseCommand):
+    help = "Run the queued developer-options purges"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            for job in PurgeJob.objects.filter(id__in=run_pending_purges()).order_by('id'):
+                self.stdout.write(
+                    f"purge job {job.id} ({job.client_id} {job.action}): {job.status}, {job.deleted} rows"
+                )
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
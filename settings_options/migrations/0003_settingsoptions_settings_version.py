@@ -0,0 +1,73 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:50
+
+from django.db import migrations, models
+
+
+# ERP-synced tables whose rows are part of the settings bundle
+BUNDLE_SOURCE_TABLES = ["acc_users", "acc_pricecode", "acc_sales_types"]
+
+BUMP_FUNCTION = """
+CREATE OR REPLACE FUNCTION bump_settings_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE settings_options s
+    SET settings_version = s.settings_version + 1
+    WHERE s.client_id IN (SELECT DISTINCT client_id FROM changed_rows);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# Statement-level, one trigger per event (transition tables need that).
+# The tables are created by the ERP sync, so they may not exist yet.
+CREATE_TRIGGERS = "\n".join(
+    f"""
+DO $$
+BEGIN
+    IF to_regclass('{table}') IS NOT NULL THEN
+        CREATE TRIGGER {table}_settings_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_settings_version();
+        CREATE TRIGGER {table}_settings_update AFTER UPDATE ON {table}
+            REFERENCING NEW TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_settings_version();
+        CREATE TRIGGER {table}_settings_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_settings_version();
+    END IF;
+END
+$$;
+"""
+    for table in BUNDLE_SOURCE_TABLES
+)
+
+DROP_TRIGGERS = "\n".join(
+    f"""
+DO $$
+BEGIN
+    IF to_regclass('{table}') IS NOT NULL THEN
+        DROP TRIGGER IF EXISTS {table}_settings_insert ON {table};
+        DROP TRIGGER IF EXISTS {table}_settings_update ON {table};
+        DROP TRIGGER IF EXISTS {table}_settings_delete ON {table};
+    END IF;
+END
+$$;
+"""
+    for table in BUNDLE_SOURCE_TABLES
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings_options', '0002_remove_settingsoptions_default_price_codes_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='settingsoptions',
+            name='settings_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunSQL(BUMP_FUNCTION, "DROP FUNCTION IF EXISTS bump_settings_version();"),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
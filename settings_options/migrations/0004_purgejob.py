@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings_options', '0003_settingsoptions_settings_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurgeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=100)),
+                ('action', models.CharField(max_length=40)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('requested_by', models.CharField(blank=True, max_length=100, null=True)),
+                ('deleted', models.BigIntegerField(default=0)),
+                ('batches', models.IntegerField(default=0)),
+                ('last_key', models.CharField(blank=True, max_length=100, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'settings_purge_jobs',
+                'indexes': [models.Index(fields=['client_id', '-id'], name='idx_purge_job_client')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('client_id', 'action'), name='uniq_purge_job_active')],
+            },
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.0.2 on 2026-10-19 19:10
+
+from django.db import migrations, models
+
+
+# The fields were added to the model without a migration; databases set up
+# by hand may have the columns already, so they are only added when missing.
+ADD_COLUMNS = """
+ALTER TABLE settings_options
+    ADD COLUMN IF NOT EXISTS remote_punchin_users jsonb NULL,
+    ADD COLUMN IF NOT EXISTS logo varchar(100) NULL,
+    ADD COLUMN IF NOT EXISTS bank_qr varchar(100) NULL,
+    ADD COLUMN IF NOT EXISTS read_price_category boolean NOT NULL DEFAULT false,
+    ADD COLUMN IF NOT EXISTS barcode_based_list boolean NOT NULL DEFAULT false,
+    ADD COLUMN IF NOT EXISTS default_print_form varchar(20) NOT NULL DEFAULT 'form1',
+    ADD COLUMN IF NOT EXISTS tax_type varchar(20) NOT NULL DEFAULT 'no_tax',
+    ADD COLUMN IF NOT EXISTS user_type jsonb NULL,
+    ADD COLUMN IF NOT EXISTS created_at timestamp with time zone NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS updated_at timestamp with time zone NOT NULL DEFAULT now();
+ALTER TABLE settings_options
+    ALTER COLUMN read_price_category DROP DEFAULT,
+    ALTER COLUMN barcode_based_list DROP DEFAULT,
+    ALTER COLUMN default_print_form DROP DEFAULT,
+    ALTER COLUMN tax_type DROP DEFAULT,
+    ALTER COLUMN created_at DROP DEFAULT,
+    ALTER COLUMN updated_at DROP DEFAULT;
+"""
+
+DROP_COLUMNS = """
+ALTER TABLE settings_options
+    DROP COLUMN IF EXISTS remote_punchin_users,
+    DROP COLUMN IF EXISTS logo,
+    DROP COLUMN IF EXISTS bank_qr,
+    DROP COLUMN IF EXISTS read_price_category,
+    DROP COLUMN IF EXISTS barcode_based_list,
+    DROP COLUMN IF EXISTS default_print_form,
+    DROP COLUMN IF EXISTS tax_type,
+    DROP COLUMN IF EXISTS user_type,
+    DROP COLUMN IF EXISTS created_at,
+    DROP COLUMN IF EXISTS updated_at;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings_options', '0004_purgejob'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(ADD_COLUMNS, DROP_COLUMNS)],
+            state_operations=[
+                migrations.AddField(
+                    model_name='settingsoptions',
+                    name='remote_punchin_users',
+                    field=models.JSONField(blank=True, default=list, null=True),
+                ),
+                migrations.AddField(
+                    model_name='settingsoptions',
+                    name='logo',
+                    field=models.ImageField(blank=True, null=True, upload_to='client_logos/'),
+                ),
+                migrations.AddField(
+                    model_name='settingsoptions',
+                    name='bank_qr',
+                    field=models.ImageField(blank=True, null=True, upload_to='bank_qrs/'),
+                ),
+                migrations.AddField(
+                    model_name='settingsoptions',
+                    name='read_price_category',
+                    field=models.BooleanField(default=False),
+                ),
+                migrations.AddField(
+                    model_name='settingsoptions',
+                    name='barcode_based_list',
+                    field=models.BooleanField(default=False),
+                ),
+                migrations.AddField(
+                    model_name='settingsoptions',
+                    name='default_print_form',
+                    field=models.CharField(default='form1', max_length=20),
+                ),
+                migrations.AddField(
+                    model_name='settingsoptions',
+                    name='tax_type',
+                    field=models.CharField(default='no_tax', max_length=20),
+                ),
+                migrations.AddField(
+                    model_name='settingsoptions',
+                    name='user_type',
+                    field=models.JSONField(blank=True, default=dict, null=True),
+                ),
+                migrations.AddField(
+                    model_name='settingsoptions',
+                    name='created_at',
+                    field=models.DateTimeField(auto_now_add=True, default=None),
+                    preserve_default=False,
+                ),
+                migrations.AddField(
+                    model_name='settingsoptions',
+                    name='updated_at',
+                    field=models.DateTimeField(auto_now=True),
+                ),
+            ],
+        ),
+    ]
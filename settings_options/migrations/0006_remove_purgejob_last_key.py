@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-19 19:11
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings_options', '0005_settingsoptions_unmigrated_fields'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='purgejob',
+            name='last_key',
+        ),
+    ]
@@ -38,8 +38,55 @@ class SettingsOptions(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # ✅ Bumped on every change of the settings bundle (see settings_options.bundle)
+    settings_version = models.PositiveIntegerField(default=1)
+
     class Meta:
         db_table = "settings_options"
 
     def __str__(self):
         return self.client_id
+
+
+class PurgeJob(models.Model):
+    """
+    A developer-options purge of one ERP table for a tenant, run in
+    batches by the run_purges command (settings_options.purge).
+    """
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+    ACTIVE_STATUSES = ("queued", "running")
+
+    client_id = models.CharField(max_length=100)
+    action = models.CharField(max_length=40)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    requested_by = models.CharField(max_length=100, null=True, blank=True)
+
+    deleted = models.BigIntegerField(default=0)
+    batches = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "settings_purge_jobs"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["client_id", "action"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="uniq_purge_job_active",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["client_id", "-id"], name="idx_purge_job_client"),
+        ]
+
+    def __str__(self):
+        return f"{self.client_id} {self.action} ({self.status})"
@@ -0,0 +1,162 @@
+"""
+Purges for the developer options.
+
+Clearing a big tenant's acc_master / acc_product / acc_productbatch used
+to be one QuerySet.delete() in the request: every row went through the
+delete collector, the locks were held until the end, and large tenants
+hit statement_timeout. Now the request only records a queued PurgeJob,
+and the run_purges management command (cron, or a service with --loop)
+deletes the rows:
+
+    - in batches of PURGE_BATCH_SIZE picked by ctid (DELETE ... WHERE
+      ctid = ANY(ARRAY(SELECT ctid ... LIMIT n))), so no primary key is
+      needed: the ERP tables are unmanaged and their keys are not
+      guaranteed. Each batch runs in its own short transaction that also
+      records the progress;
+    - with a pause between batches, and one job at a time per runner, so
+      the shared tables stay responsive for the other tenants (only the
+      tenant's own rows are ever locked).
+
+Every batch deletes whatever rows the tenant still has, so a job resumes
+by simply running again. A running job that has not moved for
+PURGE_STALE_AFTER lost its runner (a restart, a crash) and is picked up
+by the next run_purges.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app1.models import AccMaster, AccProduct, AccProductBatch
+from .models import PurgeJob
+
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = 5000
+PURGE_PAUSE = 0.05  # seconds between batches
+PURGE_STALE_AFTER = timedelta(minutes=5)
+
+# action -> model; the tables' triggers bump the tenant's data versions
+PURGE_ACTIONS = {
+    "clear_acc_master": AccMaster,
+    "clear_acc_product": AccProduct,
+    "clear_acc_productbatch": AccProductBatch,
+}
+
+
+def _delete_batch(model, client_id):
+    """Delete up to PURGE_BATCH_SIZE of the tenant's rows; returns the count"""
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        # client_id is checked again: a ctid may have been reused by a
+        # row written after the batch was picked
+        cursor.execute(f"""
+            DELETE FROM {table}
+            WHERE ctid = ANY(ARRAY(
+                SELECT ctid FROM {table} WHERE client_id = %s LIMIT %s
+            ))
+              AND client_id = %s
+        """, [client_id, PURGE_BATCH_SIZE, client_id])
+        return cursor.rowcount
+
+
+def run_purge(job_id):
+    """
+    Run (or resume) a purge job to the end; returns False if another
+    runner is working on it
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext('purge'), %s::int)", [job_id])
+        if not cursor.fetchone()[0]:
+            return False
+
+    try:
+        job = PurgeJob.objects.get(id=job_id)
+        if job.status not in PurgeJob.ACTIVE_STATUSES:
+            return True
+        model = PURGE_ACTIONS[job.action]
+        PurgeJob.objects.filter(id=job_id).update(status="running", updated_at=timezone.now())
+
+        while True:
+            with transaction.atomic():
+                count = _delete_batch(model, job.client_id)
+                if not count:
+                    break
+                PurgeJob.objects.filter(id=job_id).update(
+                    deleted=F("deleted") + count, batches=F("batches") + 1, updated_at=timezone.now(),
+                )
+            time.sleep(PURGE_PAUSE)
+
+        PurgeJob.objects.filter(id=job_id).update(
+            status="completed", finished_at=timezone.now(), updated_at=timezone.now()
+        )
+    except Exception as e:
+        logger.exception("purge job %s failed", job_id)
+        PurgeJob.objects.filter(id=job_id).update(
+            status="failed", error=str(e), finished_at=timezone.now(), updated_at=timezone.now()
+        )
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext('purge'), %s::int)", [job_id])
+    return True
+
+
+def pending_jobs():
+    """Queued jobs, and running ones whose runner went away, oldest first"""
+    stale = timezone.now() - PURGE_STALE_AFTER
+    return PurgeJob.objects.filter(
+        Q(status="queued") | Q(status="running", updated_at__lt=stale)
+    ).order_by("id")
+
+
+def run_pending_purges():
+    """Run every pending job, one after another; returns the ids run"""
+    done = []
+    for job in pending_jobs():
+        if job.status == "running":
+            logger.warning("resuming stale purge job %s", job.id)
+        if run_purge(job.id):
+            done.append(job.id)
+    return done
+
+
+def start_purge(client_id, action, requested_by=None):
+    """
+    Queue a purge of the tenant's rows for action (a PURGE_ACTIONS key)
+    for run_purges. Returns (job, created); an active job for the same
+    purge is returned instead of queueing a second one.
+    """
+    active = PurgeJob.objects.filter(
+        client_id=client_id, action=action, status__in=PurgeJob.ACTIVE_STATUSES
+    ).first()
+    if active is not None:
+        return active, False
+    try:
+        with transaction.atomic():
+            job = PurgeJob.objects.create(client_id=client_id, action=action, requested_by=requested_by)
+        return job, True
+    except IntegrityError:
+        # Requested twice at once; the other request queued it
+        return PurgeJob.objects.get(
+            client_id=client_id, action=action, status__in=PurgeJob.ACTIVE_STATUSES
+        ), False
+
+
+def job_status(job):
+    return {
+        "job_id": job.id,
+        "action": job.action,
+        "status": job.status,
+        "deleted": job.deleted,
+        "batches": job.batches,
+        "error": job.error,
+        "requested_by": job.requested_by,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
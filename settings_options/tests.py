@@ -1,3 +1,159 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from app1.models import AccMaster, AccPriceCode, AccUser
+from app1.versions import get_version
+from .bundle import settings_version
+from .models import PurgeJob
+from .purge import PURGE_STALE_AFTER, run_pending_purges
+
+
+CLIENT_ID = "test-client"
+
+
+def make_token(username="alice", role="User", client_id=CLIENT_ID):
+    return jwt.encode({
+        "user_id": username,
+        "username": username,
+        "client_id": client_id,
+        "role": role,
+        "accountcode": "",
+        "exp": datetime.utcnow() + timedelta(hours=1),
+        "iat": datetime.utcnow(),
+    }, settings.SECRET_KEY, algorithm="HS256")
+
+
+def fail_on(table):
+    """execute_wrapper failing every query that reads table"""
+    def wrapper(execute, sql, params, many, context):
+        if table in sql:
+            raise DatabaseError(f"{table} is unavailable")
+        return execute(sql, params, many, context)
+    return wrapper
+
+
+class SettingsBundleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token()}")
+        AccPriceCode.objects.create(code="S1", name="Retail", client_id=CLIENT_ID)
+
+    def get_bundle(self, **headers):
+        return self.api.get("/api/settings/options/", **headers)
+
+    def test_erp_writes_bump_the_settings_version(self):
+        version = settings_version(CLIENT_ID)
+
+        AccUser.objects.create(id="bob", password="x", role="User", client_id=CLIENT_ID)
+        AccPriceCode.objects.filter(client_id=CLIENT_ID).update(name="Retail price")
+
+        self.assertEqual(settings_version(CLIENT_ID), version + 2)
+        body = self.get_bundle().json()
+        self.assertEqual([u["id"] for u in body["users"]], ["bob"])
+        self.assertEqual(body["price_codes"], [{"code": "S1", "name": "Retail price"}])
+
+    def test_unchanged_bundle_is_not_modified(self):
+        etag = self.get_bundle()["ETag"]
+
+        response = self.get_bundle(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        AccUser.objects.create(id="bob", password="x", client_id=CLIENT_ID)
+        self.assertEqual(self.get_bundle(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bundle_with_a_failed_query_is_neither_cached_nor_tagged(self):
+        with self.assertLogs("settings_options.bundle", "ERROR"), \
+                connection.execute_wrapper(fail_on("acc_pricecode")):
+            response = self.get_bundle()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["price_codes"], [])
+        self.assertNotIn("ETag", response)
+        self.assertEqual(response["Cache-Control"], "no-store")
+
+        # The same version is built again once the query works
+        response = self.get_bundle()
+        self.assertEqual(response.json()["price_codes"], [{"code": "S1", "name": "Retail"}])
+        self.assertIn("ETag", response)
+
+
+@mock.patch("settings_options.purge.PURGE_PAUSE", 0)
+@mock.patch("settings_options.purge.PURGE_BATCH_SIZE", 2)
+class DeveloperOptionsPurgeTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token('boss', role='Admin')}")
+        for code in ("F001", "F002", "F003"):
+            AccMaster.objects.create(code=code, name=code, client_id=CLIENT_ID)
+        AccMaster.objects.create(code="X001", name="X001", client_id="other-client")
+
+    def purge(self):
+        return self.api.post("/api/settings/developer-options/", {"action": "clear_acc_master"}, format="json")
+
+    def test_purge_deletes_the_tenants_rows_in_batches(self):
+        version = get_version(CLIENT_ID, "acc_master")
+
+        response = self.purge()
+
+        self.assertEqual(response.status_code, 202)
+        job = PurgeJob.objects.get(id=response.json()["job_id"])
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(AccMaster.objects.filter(client_id=CLIENT_ID).count(), 3)
+
+        out = StringIO()
+        call_command("run_purges", stdout=out)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.deleted, job.batches), ("completed", 3, 2))
+        self.assertIn(f"purge job {job.id}", out.getvalue())
+        self.assertFalse(AccMaster.objects.filter(client_id=CLIENT_ID).exists())
+        self.assertTrue(AccMaster.objects.filter(client_id="other-client").exists())
+        self.assertGreater(get_version(CLIENT_ID, "acc_master"), version)
+
+        status = self.api.get(f"/api/settings/developer-options/status/?job_id={job.id}").json()
+        self.assertEqual(status["status"], "completed")
+
+    def test_active_purge_is_not_started_twice(self):
+        first = self.purge()
+
+        second = self.purge()
+
+        self.assertEqual(second.json()["job_id"], first.json()["job_id"])
+        self.assertEqual(second.json()["message"], "clear_acc_master is already running.")
+        self.assertEqual(run_pending_purges(), [first.json()["job_id"]])
+        self.assertEqual(run_pending_purges(), [])
+
+    def test_stale_running_job_is_resumed(self):
+        AccMaster.objects.filter(client_id=CLIENT_ID, code="F001").delete()  # deleted before the crash
+        job = PurgeJob.objects.create(client_id=CLIENT_ID, action="clear_acc_master", status="running", deleted=1)
+        PurgeJob.objects.filter(id=job.id).update(updated_at=job.updated_at - PURGE_STALE_AFTER * 2)
+
+        with self.assertLogs("settings_options.purge", "WARNING"):
+            self.assertEqual(run_pending_purges(), [job.id])
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.deleted), ("completed", 3))
+        self.assertFalse(AccMaster.objects.filter(client_id=CLIENT_ID).exists())
+
+    def test_running_job_of_a_live_runner_is_left_alone(self):
+        PurgeJob.objects.create(client_id=CLIENT_ID, action="clear_acc_master", status="running")
+
+        self.assertEqual(run_pending_purges(), [])
+        self.assertEqual(AccMaster.objects.filter(client_id=CLIENT_ID).count(), 3)
+
+    def test_only_admins_may_purge(self):
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token()}")
 
-# Create your tests here.
+        self.assertEqual(self.purge().status_code, 403)
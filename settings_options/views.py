@@ -1,36 +1,22 @@
-from django.conf import settings
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-import jwt
+from app1.auth import token_claims
+import logging
 
-from django.db import connection
-from .models import SettingsOptions
-from app1.models import AccMaster, AccProduct, AccProductBatch
+from .bundle import bundle_etag, get_settings_bundle, next_version, settings_version
+from .models import PurgeJob, SettingsOptions
+from .purge import PURGE_ACTIONS, job_status, start_purge
 
-# =========================
-# Decode JWT
-# =========================
-def decode_jwt_token(request):
-    auth_header = request.META.get("HTTP_AUTHORIZATION")
-
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return None
-
-    token = auth_header.split(" ")[1]
-
-    try:
-        return jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-    except Exception as e:
-        print("JWT ERROR:", e)
-        return None
+logger = logging.getLogger(__name__)
 
+PURGE_JOBS_LISTED = 20
 
 # =========================
 # Settings Options API
 # =========================
 @api_view(["GET", "POST"])
 def settings_options_api(request):
-    payload = decode_jwt_token(request)
+    payload, _ = token_claims(request)
     if not payload:
         return Response({"error": "Unauthorized"}, status=401)
 
@@ -38,103 +24,27 @@ def settings_options_api(request):
     if not client_id:
         return Response({"error": "Invalid token"}, status=401)
 
-    options, _ = SettingsOptions.objects.get_or_create(client_id=client_id)
-
     # =====================
-    # GET
+    # GET (cached per settings version, ETag / 304)
     # =====================
     if request.method == "GET":
-
-        # -------- PRICE CODES --------
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT code, name
-                    FROM acc_pricecode
-                    WHERE client_id = %s
-                    ORDER BY name
-                """, [client_id])
-
-                price_codes = [
-                    {"code": row[0], "name": row[1]}
-                    for row in cursor.fetchall()
-                ]
-        except Exception as e:
-            print("PRICE CODE ERROR:", e)
-            price_codes = []
-
-        # -------- USERS (id = username, include role) --------
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT id, role
-                    FROM acc_users
-                    WHERE client_id = %s
-                    ORDER BY id
-                """, [client_id])
-
-                remote_allowed = options.remote_punchin_users or []
-                users = [
-                    {
-                        "id": row[0],
-                        "username": row[0],
-                        "role": row[1],
-                        "remote_punchin_allow": True if row[0] in remote_allowed else False
-                    }
-                    for row in cursor.fetchall()
-                ]
-        except Exception as e:
-            print("USER ERROR:", e)
-            users = []
-
-        # -------- USER TYPES --------
-        # -------- USER TYPES --------
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT DISTINCT name
-                    FROM acc_sales_types
-                    WHERE client_id = %s
-                    AND name IS NOT NULL
-                    AND TRIM(name) != ''
-                    ORDER BY name
-                """, [client_id])
-
-                user_types = [row[0] for row in cursor.fetchall()]
-
-                print("LOGGED CLIENT:", client_id)
-                print("USER TYPES:", user_types)
-
-        except Exception as e:
-            print("USER TYPES ERROR:", e)
-            user_types = []
-
-        # Logic for "user_types" array output
-        # If a specific type is selected, output just that one. Otherwise, output all.
-        final_user_types = []
-        if options.user_type and options.user_type != "All":
-            final_user_types = [options.user_type]
+        version = settings_version(client_id)
+        etag = bundle_etag(client_id, version)
+        if etag in request.META.get("HTTP_IF_NONE_MATCH", ""):
+            response = Response(status=304)
         else:
-            final_user_types = user_types
+            bundle, complete = get_settings_bundle(client_id, version)
+            response = Response(bundle)
+            if not complete:
+                # No ETag: the device must not revalidate a bundle with gaps
+                response["Cache-Control"] = "no-store"
+                return response
+            etag = bundle_etag(client_id, bundle["settings_version"])
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
-        return Response({
-            "client_id": client_id,
-            "order_rate_editable": options.order_rate_editable,
-            "read_price_category": options.read_price_category,
-            "barcode_based_list": options.barcode_based_list,
-            "default_price_code": options.default_price_code,
-            "protected_price_users": options.protected_price_users,
-            "remote_punchin_users": options.remote_punchin_users,
-
-            # ✅ NEW OPTIONS
-            "default_print_form": options.default_print_form,
-            "tax_type": options.tax_type,
-            "user_type": options.user_type,
-
-            "price_codes": price_codes,
-            "users": users,
-            "user_types": final_user_types
-        })
+    options, _ = SettingsOptions.objects.get_or_create(client_id=client_id)
 
     # =====================
     # POST
@@ -186,6 +96,7 @@ def settings_options_api(request):
             options.user_type
         )
 
+        next_version(options)
         options.save()
 
         return Response({
@@ -193,8 +104,8 @@ def settings_options_api(request):
             "message": "Settings saved successfully"
         })
 
-    except Exception as e:
-        print("SAVE ERROR:", e)
+    except Exception:
+        logger.exception("settings save failed for %s", client_id)
         return Response(
             {"error": "Failed to save settings"},
             status=500
@@ -212,8 +123,12 @@ def developer_options_api(request):
     1. clear_acc_master
     2. clear_acc_product
     3. clear_acc_productbatch
+
+    The request queues a job that the run_purges command deletes the rows
+    for (settings_options.purge); the response has its job_id, see
+    developer_options_status_api.
     """
-    payload = decode_jwt_token(request)
+    payload, _ = token_claims(request)
     if not payload:
         return Response({"error": "Unauthorized"}, status=401)
     
@@ -234,33 +149,62 @@ def developer_options_api(request):
     if not action:
          return Response({"error": "Action required"}, status=400)
 
-    try:
-        if action == "clear_acc_master":
-            count, _ = AccMaster.objects.filter(client_id=client_id).delete()
-            return Response({"success": True, "message": f"AccMaster cleared. {count} records deleted."})
-        
-        elif action == "clear_acc_product":
-            count, _ = AccProduct.objects.filter(client_id=client_id).delete()
-            return Response({"success": True, "message": f"AccProduct cleared. {count} records deleted."})
-        
-        elif action == "clear_acc_productbatch":
-            count, _ = AccProductBatch.objects.filter(client_id=client_id).delete()
-            return Response({"success": True, "message": f"AccProductBatch cleared. {count} records deleted."})
-        
-        else:
-            return Response({"error": "Invalid action"}, status=400)
+    if action not in PURGE_ACTIONS:
+        return Response({"error": "Invalid action"}, status=400)
 
+    try:
+        job, created = start_purge(client_id, action, requested_by=payload.get("username"))
     except Exception as e:
-        print(f"DEVELOPER OPTION ERROR ({action}):", e)
+        logger.exception("DEVELOPER OPTION ERROR (%s)", action)
         return Response({"error": f"Failed to execute {action}: {str(e)}"}, status=500)
 
+    message = f"{action} queued." if created else f"{action} is already running."
+    return Response({"success": True, "message": message, **job_status(job)}, status=202)
+
+
+# =========================
+# Developer Options Status API
+# =========================
+@api_view(["GET"])
+def developer_options_status_api(request):
+    """
+    Progress of the tenant's purges: ?job_id=<id> for one job, otherwise
+    the latest PURGE_JOBS_LISTED jobs, newest first.
+    """
+    payload, _ = token_claims(request)
+    if not payload:
+        return Response({"error": "Unauthorized"}, status=401)
+
+    client_id = payload.get("client_id")
+    if not client_id:
+        return Response({"error": "Invalid token"}, status=401)
+
+    if payload.get("role") != "Admin":
+        return Response({"error": "Permission denied. Level 3 access required."}, status=403)
+
+    jobs = PurgeJob.objects.filter(client_id=client_id)
+
+    job_id = request.GET.get("job_id")
+    if job_id:
+        if not job_id.isdigit():
+            return Response({"error": "Invalid job_id"}, status=400)
+        job = jobs.filter(id=job_id).first()
+        if job is None:
+            return Response({"error": "Job not found"}, status=404)
+        return Response({"success": True, **job_status(job)})
+
+    return Response({
+        "success": True,
+        "jobs": [job_status(job) for job in jobs.order_by("-id")[:PURGE_JOBS_LISTED]],
+    })
+
 
 # =========================
 # Logo Upload API
 # =========================
 @api_view(["GET", "POST"])
 def logo_api(request):
-    payload = decode_jwt_token(request)
+    payload, _ = token_claims(request)
     if not payload:
         return Response({"error": "Unauthorized"}, status=401)
 
@@ -295,6 +239,7 @@ def logo_api(request):
         return Response({"error": f"File type '.{ext}' not allowed. Use JPG, PNG, GIF, SVG, or WebP."}, status=400)
 
     options.logo = image_file
+    next_version(options)
     options.save()
 
     return Response({
@@ -309,7 +254,7 @@ def logo_api(request):
 # =========================
 @api_view(["GET", "POST"])
 def bank_qr_api(request):
-    payload = decode_jwt_token(request)
+    payload, _ = token_claims(request)
     if not payload:
         return Response({"error": "Unauthorized"}, status=401)
 
@@ -344,6 +289,7 @@ def bank_qr_api(request):
         return Response({"error": f"File type '.{ext}' not allowed. Use JPG, PNG, GIF, SVG, or WebP."}, status=400)
 
     options.bank_qr = image_file
+    next_version(options)
     options.save()
 
     return Response({
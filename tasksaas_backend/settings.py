@@ -102,7 +102,9 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
 }
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'app1.auth.JWTAuthentication',  # request.user = TokenUser of the Bearer token
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Allow all by default
     ],
@@ -115,6 +117,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app1.auth.JWTAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -140,6 +143,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'tasksaas_backend.wsgi.application'
 
+# Also creates the ERP-owned (unmanaged) tables in the test database
+TEST_RUNNER = 'tasksaas_backend.test_runner.ERPTablesTestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -162,6 +168,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Local memory by default; point CACHE_BACKEND / CACHE_LOCATION at a shared
+# cache (e.g. django.core.cache.backends.redis.RedisCache) when running
+# several workers so invalidations reach every process.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='tasksaas-default'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 